@@ -6,12 +6,14 @@ from gui.handlers import (
     init_handlers, add_btn_clicked, edit_btn_clicked, del_btn_clicked,
     save_btn_clicked, on_import_json_clicked, on_refresh_api_clicked,
     on_selection_change, start_polling, open_device_snapshot, open_settings,
-    on_notebook_tab_changed
+    on_notebook_tab_changed, sort_by_column
 )
 
 
 
 from gui import handlers
+from gui.virtual_table import VirtualTreeview
+from app_config import POLL_INTERVAL_MS
 
 try:
     from tkintermapview import TkinterMapView
@@ -64,9 +66,50 @@ def main():
     list_tab = ttk.Frame(notebook)
     notebook.add(list_tab, text="List")
 
+    # Filter bar: every change re-queries the device indexes (handlers.apply_filter)
+    filterbar = ttk.Frame(list_tab); filterbar.pack(fill=tk.X, padx=6, pady=(6, 0))
+    search_var = tk.StringVar()
+    ttk.Label(filterbar, text="Search").pack(side=tk.LEFT)
+    ttk.Entry(filterbar, textvariable=search_var, width=20).pack(side=tk.LEFT, padx=(4, 10))
+    facet_vars = {}
+    for field, label in [
+        ("kit_id", "Op"),
+        ("device_type", "Type"),
+        ("model", "Model"),
+        ("connectivity", "Status"),
+        ("tamper_status", "Tamper"),
+    ]:
+        ttk.Label(filterbar, text=label).pack(side=tk.LEFT)
+        var = tk.StringVar()
+        combo = ttk.Combobox(filterbar, textvariable=var, width=10)
+        combo.configure(postcommand=lambda c=combo, f=field: c.configure(values=[""] + handlers.filter_values(f)))
+        combo.pack(side=tk.LEFT, padx=(4, 10))
+        facet_vars[field] = var
+    batt_min_var, batt_max_var = tk.StringVar(), tk.StringVar()
+    ttk.Label(filterbar, text="Battery").pack(side=tk.LEFT)
+    ttk.Spinbox(filterbar, from_=0, to=100, width=4, textvariable=batt_min_var).pack(side=tk.LEFT, padx=(4, 0))
+    ttk.Label(filterbar, text="–").pack(side=tk.LEFT)
+    ttk.Spinbox(filterbar, from_=0, to=100, width=4, textvariable=batt_max_var).pack(side=tk.LEFT)
+
+    def on_filter_changed(*_):
+        handlers.apply_filter(
+            text=search_var.get(), battery_min=batt_min_var.get(), battery_max=batt_max_var.get(),
+            **{f: v.get() for f, v in facet_vars.items()}
+        )
+
+    def clear_filter():
+        for v in (search_var, batt_min_var, batt_max_var, *facet_vars.values()):
+            v.set("")
+        handlers.clear_geo_query()
+
+    ttk.Button(filterbar, text="Clear", command=clear_filter, cursor="hand2").pack(side=tk.LEFT, padx=(10, 0))
+    for v in (search_var, batt_min_var, batt_max_var, *facet_vars.values()):
+        v.trace_add("write", on_filter_changed)
+
     tablearea = ttk.Frame(list_tab); tablearea.pack(fill=tk.BOTH, expand=True)
     columns = ("name", "type", "battery", "tamper", "status", "last_seen")
-    tatree = ttk.Treeview(tablearea, columns=columns, show="headings")
+    # only the rows around the viewport become Tk items (see gui/virtual_table.py)
+    tatree = VirtualTreeview(ttk.Treeview(tablearea, columns=columns, show="headings"))
     for col, text, width, anchor in [
         ("name","Name",220,"w"),
         ("type","Type",120,"w"),
@@ -75,7 +118,7 @@ def main():
         ("status","Status",100,"center"),
         ("last_seen","Last Seen",160,"w"),
     ]:
-        tatree.heading(col, text=text)
+        tatree.heading(col, text=text, command=lambda c=col: sort_by_column(c))
         tatree.column(col, width=width, anchor=getattr(tk, anchor.upper()), stretch=(col=="name"))
     scrollbar = ttk.Scrollbar(tablearea, orient="vertical", command=tatree.yview)
     tatree.configure(yscrollcommand=scrollbar.set)
@@ -109,9 +152,13 @@ def main():
     details_text = tk.Text(details, height=6, wrap="word", borderwidth=0)
     details_text.configure(state="disabled", font=tkfont.Font(family="Segoe UI", size=10))
     details_text.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=8, pady=6)
+    # latest cached image of the selected device; click for full size
+    preview_label = ttk.Label(details, text="No image", anchor="center", cursor="hand2")
+    preview_label.bind("<Button-1>", handlers.open_preview_image)
     details_scroll = ttk.Scrollbar(details, orient="vertical", command=details_text.yview)
     details_text.configure(yscrollcommand=details_scroll.set)
     details_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+    preview_label.pack(side=tk.RIGHT, padx=8, pady=6)
     
     # Alerts Panel
     alerts_frame = ttk.LabelFrame(root, text="Alerts")
@@ -124,8 +171,10 @@ def main():
     alerts_list.configure(yscrollcommand=alerts_scroll.set)
     alerts_scroll.pack(side=tk.RIGHT, fill=tk.Y)
 
+    alerts_list.bind("<Double-Button-1>", handlers.on_alert_double_click)
+
     # Optional: clear button
-    clear_btn = ttk.Button(alerts_frame, text="Clear Alerts", command=lambda: alerts_list.delete(0, tk.END))
+    clear_btn = ttk.Button(alerts_frame, text="Clear Alerts", command=handlers.clear_alerts)
     clear_btn.pack(side=tk.BOTTOM, pady=4)
 
 
@@ -133,15 +182,18 @@ def main():
     statusbar = ttk.Frame(root); statusbar.pack(side=tk.BOTTOM, fill=tk.X)
     save_var = tk.StringVar(); ttk.Label(statusbar, textvariable=save_var, anchor="w").pack(side=tk.RIGHT, padx=8, pady=4)
     total_var = tk.StringVar(); ttk.Label(statusbar, textvariable=total_var, anchor="w").pack(side=tk.LEFT, padx=8, pady=4)
+    poll_var = tk.StringVar(); ttk.Label(statusbar, textvariable=poll_var, anchor="w").pack(side=tk.LEFT, padx=8, pady=4)
 
     # Init and wire selection
     init_handlers(
         root, tatree, details_text,
         img_btn, edit_btn, del_btn,
         save_btn_var := save_var, total_var,
-        poll_ms=2000,
+        poll_ms=POLL_INTERVAL_MS,
         _alerts_list=alerts_list,      
-        _map_widget=map_widget    
+        _map_widget=map_widget,
+        _preview_label=preview_label,
+        _poll_var=poll_var
     )
 
     tatree.bind("<<TreeviewSelect>>", on_selection_change)
@@ -152,7 +204,7 @@ def main():
     file_menu.add_separator()
     file_menu.add_command(label="Exit", command=root.destroy)
 
-    start_polling(10_000)
+    start_polling(POLL_INTERVAL_MS)
 
     root.mainloop()
 
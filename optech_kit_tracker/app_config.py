@@ -6,14 +6,58 @@ CONFIG_FILE = Path.home() / ".optechtracker.json"
 DEFAULTS = {
     "api_url": "https://kit-tracker.peacemosquitto.workers.dev/",
     "api_token": "Bearer 63T-nAch05-p3W5-lIn60t",
-    "media_base": ""                
+    "media_base": "",
+    "delta_fetch": False,           # ask the API only for payloads newer than the last one seen
+    "storage_backend": "json",      # "json" (devices.json + journal) or "sqlite" (devices.db)
+    "geofences": {},                # op area per kit_id: {"<kit_id>": [[lat, lon], ...]}
+    "endpoints": []                 # more tracker APIs polled alongside api_url:
+                                    # [{"name": "op-north", "url": "...", "token": "...", "timeout_s": 8}]
 }
 
-POLL_INTERVAL_MS = 2000
-ALERT_DEBOUNCE_MS = 800
+POLL_INTERVAL_MS = 10_000   # base API poll cadence, as before the scheduler (see services/poll_scheduler.py)
+POLL_FAST_MS = 5000         # only while devices are changing or alerts are live: 2x the base load, briefly
+POLL_IDLE_MAX_MS = 30_000   # longest gap once nothing has changed for a while
+POLL_ERROR_MAX_MS = 120_000 # longest backoff after failed polls
+POLL_ALERT_HOLD_S = 60      # stay fast this long after an alert
+ALERT_DEBOUNCE_MS = 30_000  # the same alert for the same device isn't raised again within this
+ALERT_HISTORY_MAX = 2000    # alerts kept (oldest dropped first); the Alerts panel shows the newest 300
+# Alert rules (services/alert_engine.py); "alert_rules" in the config file replaces them
+ALERT_RULES = [
+    {"name": "tamper", "field": "tamper_status", "equals": "TAMPERED", "message": "TAMPERED"},
+    {"name": "offline", "field": "connectivity", "equals": "OFFLINE", "message": "OFFLINE"},
+    {"name": "battery_low", "field": "battery_pct", "below": 15, "message": "battery {battery_pct}%"},
+    {"name": "stale", "field": "last_seen", "older_than_s": 1800, "message": "not seen since {last_seen}"},
+    {"name": "geofence_exit", "geofence": True, "message": "outside op area {kit_id}"},
+]
 MAP_KEEP_ALIVE_MS = 50
+EVENT_HISTORY_DEPTH = 50   # events kept per device (oldest dropped first)
+IMAGE_BUFFER_MAX_BYTES = 32 * 1024 * 1024   # fragment bytes buffered across partial images
+IMAGE_PARTIAL_TTL_S = 600                   # drop a partial image after this long without fragments
+CAPTURE_IDLE_TIMEOUT_S = 60                 # close a pooled RTSP capture after this long unused
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024   # snapshot/image cache on disk (LRU beyond this)
+IMAGE_CACHE_MEM_ITEMS = 64                  # thumbnails kept decoded in memory
+THUMBNAIL_SIZE = (240, 180)
+TRACK_RECENT_POINTS = 256   # full-resolution position samples kept per device
+TRACK_OLD_POINTS = 256      # older samples, thinned to one per TRACK_DOWNSAMPLE_S (and coarser as they age)
+TRACK_DOWNSAMPLE_S = 60
+IMPORT_WORKERS = 4           # files decoded in parallel by a bulk import
+IMPORT_BATCH_SIZE = 500      # payloads handed from a decoding worker to the importer at a time
+FETCH_WORKERS = 8            # endpoints fetched at once
+FETCH_BACKOFF_BASE_S = 2     # a failing endpoint sits out polls for 2s, 4s, 8s, ...
+FETCH_BACKOFF_MAX_S = 300
+SYNC_BATCH_SIZE = 1000      # streamed payloads upserted (and journalled) per batch during a poll
 
-def load_config() -> dict:
+# Parsed config, re-read only when the file's mtime changes. `version`
+# bumps on every reload/save so callers can cache things derived from it.
+_CACHE = {"mtime": None, "cfg": None, "version": 0}
+
+def _config_mtime():
+    try:
+        return CONFIG_FILE.stat().st_mtime_ns
+    except OSError:
+        return None
+
+def _read_config() -> dict:
     if CONFIG_FILE.exists():
         try:
             data = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
@@ -22,5 +66,17 @@ def load_config() -> dict:
             pass
     return DEFAULTS.copy()
 
+def load_config() -> dict:
+    mtime = _config_mtime()
+    if _CACHE["cfg"] is None or mtime != _CACHE["mtime"]:
+        _CACHE.update(cfg=_read_config(), mtime=mtime, version=_CACHE["version"] + 1)
+    return dict(_CACHE["cfg"])
+
+def config_version() -> int:
+    """Changes whenever the cached config is reloaded or saved."""
+    load_config()
+    return _CACHE["version"]
+
 def save_config(cfg: dict) -> None:
     CONFIG_FILE.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
+    _CACHE.update(cfg={**DEFAULTS, **cfg}, mtime=_config_mtime(), version=_CACHE["version"] + 1)
@@ -0,0 +1,82 @@
+# bench/fleet.py
+import random
+from datetime import datetime, timedelta, timezone
+
+# Shapes follow the samples in imports/ (uav.json, beacon.json, signal_collect.json)
+KINDS = [
+    ("uav", "AVENGER", "image_fragment"),
+    ("beacon", "BE300A", ""),
+    ("signal_collect", "SNOOPER", "signal_capture"),
+]
+OPS = ["TOUCHDOWN", "SNAKE_EATER", "NIGHTJAR", "KESTREL"]
+
+
+def make_fleet(n: int, seed: int = 1) -> list[dict]:
+    """n API payloads spread around a few ops, one per device."""
+    rnd = random.Random(seed)
+    start = datetime(2025, 8, 21, 14, 0, tzinfo=timezone.utc)
+    fleet = []
+    for i in range(n):
+        dtype, model, ptype = KINDS[i % len(KINDS)]
+        op = OPS[i % len(OPS)]
+        fleet.append({
+            "type": dtype,
+            "model": model,
+            "serial": f"{i:06d}",
+            "op": op,
+            "description": f"{dtype} on Op {op}",
+            "position": {
+                "lat": 44.0 + rnd.uniform(-2, 2),
+                "lon": 23.0 + rnd.uniform(-2, 2),
+                "alt": rnd.uniform(0, 3000) if dtype == "uav" else 0,
+                "spd": rnd.uniform(0, 30),
+            },
+            "timestamp": _iso(start),
+            "mobile": True,
+            "online": True,
+            "tampered": False,
+            "battery": rnd.randint(5, 100),
+            "payload": _inner_payload(rnd, ptype),
+        })
+    return fleet
+
+
+def advance(fleet: list[dict], step: int, change_ratio: float = 0.1, seed: int = 1) -> list[dict]:
+    """Next poll: a fresh snapshot where ~change_ratio of devices moved/changed."""
+    rnd = random.Random(seed * 1000 + step)
+    out = []
+    for p in fleet:
+        q = dict(p)
+        if rnd.random() < change_ratio:
+            pos = dict(p["position"])
+            pos["lat"] += rnd.uniform(-0.01, 0.01)
+            pos["lon"] += rnd.uniform(-0.01, 0.01)
+            q["position"] = pos
+            q["battery"] = max(0, p["battery"] - 1)
+            q["online"] = rnd.random() > 0.05
+            q["tampered"] = rnd.random() < 0.02
+            ts = datetime.fromisoformat(p["timestamp"].replace("Z", "+00:00")) + timedelta(seconds=10 * step)
+            q["timestamp"] = _iso(ts)
+            q["payload"] = _inner_payload(rnd, p["payload"].get("type", ""))
+        out.append(q)
+    return out
+
+
+def _inner_payload(rnd, ptype: str) -> dict:
+    if ptype == "image_fragment":
+        total = 10
+        return {"type": ptype, "id": _rid(rnd), "format": "bmp", "size_kb": rnd.randint(100, 400),
+                "fragment": rnd.randint(1, total), "total_fragments": total, "checksum": f"{rnd.getrandbits(32):08x}"}
+    if ptype == "signal_capture":
+        return {"type": ptype, "id": _rid(rnd), "frequency_mhz": f"{rnd.uniform(100, 3000):.2f}",
+                "bandwidth_khz": rnd.randint(10, 500), "snr_db": f"{rnd.uniform(0, 30):.1f}",
+                "samples": [f"{rnd.uniform(-1, 1):.3f}" for _ in range(5)]}
+    return {"type": ""}
+
+
+def _rid(rnd) -> str:
+    return "".join(rnd.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(8))
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
@@ -0,0 +1,285 @@
+# bench/run.py
+"""
+Sync pipeline / GUI refresh benchmark.
+
+    cd optech_kit_tracker
+    py -m bench.run                          # default sizes, JSON store, Tk stubs
+    py -m bench.run --sizes 100 5000 --backend sqlite
+    xvfb-run py -m bench.run --real-tk       # real ttk.Treeview
+
+For each fleet size it serves a synthetic fleet from a local stand-in API and
+runs a first (create-everything) poll, then steady-state polls where ~10% of
+devices change, then one unchanged (304) poll. Each poll goes through
+SyncWorker.sync_once (fetch, upsert, journal write, images and tracks as the
+app's worker thread runs them), then the Tk-side table/map refresh. Per stage
+it reports median/max latency, bytes written and peak Python memory. Results go to bench/results/
+and are compared against the previous run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import app_config
+from bench.fleet import make_fleet, advance
+from bench.standin_api import StandinAPI
+from bench import tk_stubs
+
+RESULTS_DIR = Path(__file__).parent / "results"
+DEFAULT_SIZES = [100, 1000, 5000, 20000, 50000]
+STAGES = ["sync_once", "refresh_device_list", "update_map_markers", "save_data"]
+
+
+def _wchar() -> int | None:
+    """Bytes this process has written via write() so far (Linux only)."""
+    try:
+        for line in Path("/proc/self/io").read_text().splitlines():
+            if line.startswith("wchar:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+
+class Stage:
+    """Times one stage and records bytes written; peak memory when tracing."""
+
+    def __init__(self, out: dict, name: str, data_dir: Path):
+        self.out, self.name, self.data_dir = out, name, data_dir
+
+    def __enter__(self):
+        self.w0, self.s0 = _wchar(), _dir_size(self.data_dir)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.t0) * 1000
+        w1 = _wchar()
+        written = (w1 - self.w0) if (w1 is not None and self.w0 is not None) else max(0, _dir_size(self.data_dir) - self.s0)
+        rec = self.out.setdefault(self.name, {"ms": [], "bytes_written": [], "peak_kb": []})
+        if tracemalloc.is_tracing():
+            rec["peak_kb"].append(tracemalloc.get_traced_memory()[1] / 1024)
+        else:
+            rec["ms"].append(ms)
+            rec["bytes_written"].append(written)
+        return False
+
+
+def _setup_gui(real_tk: bool):
+    from gui import handlers
+    from gui.virtual_table import VirtualTreeview
+    if real_tk:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+        tree = ttk.Treeview(root, columns=("name", "type", "battery", "tamper", "status", "last_seen"), show="headings")
+        tree.pack()
+        tree = VirtualTreeview(tree)
+        try:
+            from tkintermapview import TkinterMapView
+            map_widget = TkinterMapView(root, width=400, height=400)
+            map_widget.pack()
+        except Exception:
+            map_widget = tk_stubs.MapWidgetStub()
+    else:
+        root, tree, map_widget = tk_stubs.RootStub(), VirtualTreeview(tk_stubs.TreeviewStub()), tk_stubs.MapWidgetStub()
+    handlers.init_handlers(
+        root, tree, tk_stubs.WidgetStub(),
+        tk_stubs.WidgetStub(), tk_stubs.WidgetStub(), tk_stubs.WidgetStub(),
+        tk_stubs.VarStub(), tk_stubs.VarStub(),
+        _alerts_list=tk_stubs.WidgetStub(), _map_widget=map_widget,
+    )
+    return handlers, root
+
+
+def _worker(handlers, store, data_dir: Path):
+    """The app's sync worker (see handlers._ensure_sync_worker), not started: the bench calls sync_once itself."""
+    from services.api_client import iter_payloads
+    from services.image_assembler import ImageAssembler
+    from services.image_cache import ImageCache
+    from services.sync_worker import SyncWorker
+    return SyncWorker(handlers.registry, handlers._store_lock, app_config.POLL_INTERVAL_MS, store.stage_upserts,
+                      fetch=lambda: iter_payloads(delta=False), images=ImageAssembler(data_dir / "images"),
+                      tracks=handlers.tracks, cache=ImageCache(data_dir / "cache"), status=None)
+
+
+def _poll(handlers, store, worker, stats: dict, data_dir: Path, save: bool):
+    with Stage(stats, "sync_once", data_dir):
+        msg = worker.sync_once()
+    if msg["error"]:
+        raise RuntimeError(msg["error"])
+    with Stage(stats, "refresh_device_list", data_dir):
+        handlers.refresh_device_list(msg["changes"])
+        handlers.tatree.update_idletasks()   # the table materialises its rows on idle
+    with Stage(stats, "update_map_markers", data_dir):
+        handlers.update_map_markers(msg["changes"])
+    if save:
+        with Stage(stats, "save_data", data_dir):
+            store.save_data(handlers.registry.devices)
+    return sum(msg["summary"].values())
+
+
+def bench_size(n: int, backend: str, polls: int, real_tk: bool) -> dict:
+    from storage import json_store, sqlite_store, get_store
+    with tempfile.TemporaryDirectory(prefix="optech-bench-") as tmp:
+        data_dir = Path(tmp)
+        json_store.DATA_FILE = data_dir / "devices.json"
+        sqlite_store.DB_FILE = data_dir / "devices.db"
+        app_config.CONFIG_FILE = data_dir / "config.json"
+        from gui import handlers
+        from storage.track_store import TrackStore
+        handlers.tracks = TrackStore(data_dir / "tracks.bin")
+
+        api = StandinAPI().start()
+        try:
+            app_config.save_config({**app_config.DEFAULTS, "api_url": api.url, "api_token": "",
+                                    "storage_backend": backend})
+            handlers, root = _setup_gui(real_tk)
+            store = get_store(backend)
+            worker = _worker(handlers, store, data_dir)
+
+            fleet = make_fleet(n)
+            first, steady, unchanged = {}, {}, {}
+
+            api.set_payloads(fleet)
+            _poll(handlers, store, worker, first, data_dir, save=True)
+
+            for step in range(1, polls + 1):
+                fleet = advance(fleet, step)
+                api.set_payloads(fleet)
+                _poll(handlers, store, worker, steady, data_dir, save=False)
+            with Stage(steady, "save_data", data_dir):
+                store.save_data(handlers.registry.devices)
+
+            # nothing changed: the ETag round-trip should make this ~free
+            _poll(handlers, store, worker, unchanged, data_dir, save=False)
+
+            # one more steady poll under tracemalloc for peak memory
+            fleet = advance(fleet, polls + 1)
+            api.set_payloads(fleet)
+            tracemalloc.start()
+            try:
+                _poll(handlers, store, worker, steady, data_dir, save=True)
+            finally:
+                tracemalloc.stop()
+
+            store_bytes = _dir_size(data_dir)
+            if real_tk:
+                root.destroy()
+        finally:
+            api.stop()
+
+    return {
+        "devices": n,
+        "store_bytes": store_bytes,
+        "first_poll": _summarise(first),
+        "steady_poll": _summarise(steady),
+        "unchanged_poll": _summarise(unchanged),
+    }
+
+
+def _summarise(stats: dict) -> dict:
+    out = {}
+    for stage in STAGES:
+        rec = stats.get(stage)
+        if not rec or not rec["ms"]:
+            continue
+        out[stage] = {
+            "median_ms": round(statistics.median(rec["ms"]), 3),
+            "max_ms": round(max(rec["ms"]), 3),
+            "bytes_written": int(statistics.median(rec["bytes_written"])),
+            "peak_kb": round(max(rec["peak_kb"]), 1) if rec["peak_kb"] else None,
+        }
+    return out
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _previous_results() -> dict | None:
+    files = sorted(RESULTS_DIR.glob("*.json"))
+    if not files:
+        return None
+    try:
+        return json.loads(files[-1].read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _report(run: dict, previous: dict | None):
+    prev_by_size = {}
+    if previous and previous.get("backend") == run["backend"]:
+        prev_by_size = {r["devices"]: r for r in previous.get("results", [])}
+    print(f"backend={run['backend']} tk={'real' if run['real_tk'] else 'stub'} rev={run['git_rev']}")
+    for res in run["results"]:
+        print(f"\n== {res['devices']} devices (store on disk: {res['store_bytes'] / 1024:.0f} KB)")
+        prev = prev_by_size.get(res["devices"])
+        for phase in ("first_poll", "steady_poll", "unchanged_poll"):
+            print(f"  {phase}")
+            for stage, s in res[phase].items():
+                line = (f"    {stage:<20} {s['median_ms']:>10.2f} ms  (max {s['max_ms']:.2f})"
+                        f"  {s['bytes_written'] / 1024:>9.1f} KB written")
+                if s.get("peak_kb") is not None:
+                    line += f"  peak {s['peak_kb']:.0f} KB"
+                old = ((prev or {}).get(phase) or {}).get(stage)
+                if old and old.get("median_ms"):
+                    delta = (s["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+                    line += f"  [{delta:+.0f}% vs {previous.get('git_rev') or 'previous'}]"
+                print(line)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    ap.add_argument("--polls", type=int, default=3, help="steady-state polls per size")
+    ap.add_argument("--real-tk", action="store_true", help="use real Tk widgets (needs a display, e.g. xvfb-run)")
+    ap.add_argument("--no-save", action="store_true", help="don't write bench/results/")
+    args = ap.parse_args(argv)
+
+    if args.real_tk and not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        ap.error("--real-tk needs a display; run under xvfb-run")
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "real_tk": args.real_tk,
+        "polls": args.polls,
+        "results": [],
+    }
+    previous = _previous_results()
+    for n in args.sizes:
+        run["results"].append(bench_size(n, args.backend, args.polls, args.real_tk))
+
+    _report(run, previous)
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        out = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{args.backend}.json"
+        out.write_text(json.dumps(run, indent=2), encoding="utf-8")
+        print(f"\nSaved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# bench/standin_api.py
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandinAPI:
+    """
+    Local stand-in for the kit-tracker endpoint.
+    Serves {"results": [...]} for whatever `payloads` currently holds, with an
+    ETag so conditional requests get a 304 when nothing changed.
+    """
+
+    def __init__(self, gzip_body: bool = False):
+        self.payloads: list[dict] = []
+        self.gzip_body = gzip_body
+        self.requests = 0
+        self.last_path = None
+        self._version = 0
+        self._body = b'{"results":[]}'
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                api.requests += 1
+                api.last_path = self.path
+                etag = f'"v{api._version}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = api._body
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                if api.gzip_body and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def set_payloads(self, payloads: list[dict]):
+        self.payloads = payloads
+        self._body = json.dumps({"results": payloads}).encode("utf-8")
+        self._version += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
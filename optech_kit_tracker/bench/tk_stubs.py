@@ -0,0 +1,188 @@
+# bench/tk_stubs.py
+# Just enough of ttk.Treeview / TkinterMapView / Tk variables for gui.handlers
+# to run headless. Use --real-tk (e.g. under xvfb-run) to measure real widgets.
+import types
+
+
+class TreeviewStub:
+    def __init__(self):
+        self._rows = {}
+        self._sel = ()
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self._rows[iid] = [values, tags]
+        return iid
+
+    def item(self, iid, option=None, **kw):
+        row = self._rows[iid]
+        if "values" in kw:
+            row[0] = kw["values"]
+        if "tags" in kw:
+            row[1] = kw["tags"]
+        return {"values": row[0], "tags": row[1]}
+
+    def delete(self, *iids):
+        for iid in iids:
+            self._rows.pop(iid, None)
+        self._sel = tuple(i for i in self._sel if i in self._rows)
+
+    def exists(self, iid):
+        return iid in self._rows
+
+    def get_children(self, item=""):
+        return tuple(self._rows)
+
+    def selection(self):
+        return self._sel
+
+    def selection_set(self, *iids):
+        self._sel = tuple(iids)
+
+    def focus(self, iid=None):
+        return ""
+
+    def see(self, iid):
+        pass
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def tag_configure(self, *args, **kw):
+        pass
+
+    def heading(self, column, option=None, **kw):
+        headings = self.__dict__.setdefault("_headings", {})
+        if "text" in kw:
+            headings[column] = kw["text"]
+        return headings.get(column, column) if option == "text" else None
+
+    def bind(self, sequence=None, func=None, add=None):
+        if sequence and func:
+            handlers = self.__dict__.setdefault("_bindings", {}).setdefault(sequence, [])
+            if not add:
+                handlers.clear()
+            handlers.append(func)
+
+    def event_generate(self, sequence, **kw):
+        # delivered straight away (Tk would queue a virtual event until idle)
+        event = types.SimpleNamespace(widget=self, **kw)
+        for func in list(getattr(self, "_bindings", {}).get(sequence, ())):
+            func(event)
+
+    def move(self, iid, parent, index):
+        pass
+
+    def selection_remove(self, *iids):
+        self._sel = tuple(i for i in self._sel if i not in iids)
+
+    def configure(self, cnf=None, **kw):
+        pass
+
+    def winfo_height(self):
+        return 600
+
+    # idle callbacks run on update_idletasks(), like Tk
+    def after_idle(self, func, *args):
+        self._idle = getattr(self, "_idle", [])
+        self._idle.append((func, args))
+        return len(self._idle)
+
+    def after_cancel(self, job):
+        pass
+
+    def update_idletasks(self):
+        idle, self._idle = getattr(self, "_idle", []), []
+        for func, args in idle:
+            func(*args)
+
+
+class _Marker:
+    def __init__(self, lat, lon, text=None, marker_color_circle=None, **kw):
+        self.position = (lat, lon)
+        self.text = text
+        self.marker_color_circle = marker_color_circle
+        self.kw = kw
+
+    def draw(self, event=None):
+        pass
+
+    def set_position(self, lat, lon):
+        self.position = (lat, lon)
+
+    def set_text(self, text):
+        self.text = text
+
+    def delete(self):
+        pass
+
+
+class _Path:
+    def __init__(self, points, **kw):
+        self.position_list = points
+
+    def set_position_list(self, points):
+        self.position_list = points
+
+    def delete(self):
+        pass
+
+
+class MapWidgetStub:
+    def __init__(self, width: int = 800, height: int = 600):
+        self.zoom = 6
+        self.position = (44.0, 23.0)
+        self.width, self.height = width, height
+        self.canvas = WidgetStub()
+
+    def get_position(self):
+        return self.position
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def set_marker(self, lat, lon, text=None, **kw):
+        return _Marker(lat, lon, text, **kw)
+
+    def set_path(self, points, **kw):
+        return _Path(points, **kw)
+
+    def set_position(self, lat, lon):
+        self.position = (lat, lon)
+
+    def set_zoom(self, zoom):
+        self.zoom = zoom
+
+    def bind(self, *args, **kw):
+        pass
+
+
+class WidgetStub:
+    """Buttons, Text, Listbox: accept and ignore everything."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kw: None
+
+    def size(self):
+        return 0
+
+
+class VarStub:
+    def __init__(self):
+        self.value = ""
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class RootStub(WidgetStub):
+    def after(self, ms, func=None, *args):
+        return None
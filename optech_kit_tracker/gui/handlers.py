@@ -1,16 +1,27 @@
 import os
 import time
+import queue
+import threading
+import traceback
 import tempfile
 import webbrowser
 from pathlib import Path
 from typing import Optional
 from tkinter import messagebox, simpledialog, filedialog
-from storage.json_store import (
-    init_store, load_data, save_data, import_device_json, upsert_device_from_api
-)
+from storage import get_store
+from storage.track_store import TrackStore
 from models.device import create_device
-from services.api_client import fetch_payloads
-from app_config import load_config, save_config
+from models.registry import DeviceRegistry
+from models.event_history import payload_type
+from models.geo_index import circle_points
+from gui import map_index
+from services.sync_worker import SyncWorker
+from services.image_assembler import ImageAssembler
+from services.capture_pool import CapturePool
+from services.bulk_import import BulkImport
+from services.image_cache import ImageCache
+from services.alert_engine import AlertEngine
+from app_config import load_config, save_config, POLL_INTERVAL_MS, ALERT_RULES
 import utils
 
 # --- module "globals" ---
@@ -22,16 +33,55 @@ edit_btn = None
 del_btn = None
 save_var = None
 total_var = None
+poll_var = None       # status bar: current poll cadence and last latency
 alerts_list = None
 map_widget = None     
-_map_markers = []
+_map_markers = {}     # device id -> {"marker", "pos", "color", "text"} on the map
+_cluster_markers = {} # cluster cell -> {"marker", "text", "color", "pos"}
+_map_index = map_index.GridIndex()
+_map_view_job = None
+_rendered = {}        # iid -> (values, tags) currently shown in the table
+_sort_keys = {}       # iid -> typed sort key per column, refreshed with the row
+_sort_column = None   # (column, descending) the table is sorted by, or None
+_headings = {}        # column -> heading text without the sort arrow
+_filter = {}          # active filter-bar criteria (see apply_filter)
+_filter_ids = None    # ids matching _filter; None when nothing is filtered
+_geo_query = None     # active area query: {"label", "run", "shapes", "ids"} (see set_geo_query)
+_geo_shapes = []      # outlines of the area query drawn on the map
 last_selected_iid = None
 _suppress_select_events = False
 last_alert_bell_ts = 0 
-
-
-devices = []
-POLL_MS = 60_000
+_sync_worker = None
+store = None          # storage backend module picked from settings (json_store / sqlite_store)
+_store_lock = threading.RLock()   # guards registry + store writes shared with the sync worker
+images = ImageAssembler()         # image_fragment reassembly, fed by the sync worker
+_capture_pool = CapturePool()     # long-lived RTSP captures for Live Snapshot
+_image_cache = ImageCache()       # snapshots + reassembled images, with thumbnails
+tracks = TrackStore()             # per-device position history
+alert_engine = AlertEngine()      # alert rules + history, fed each sync's change-set
+_map_paths = {}       # device id -> {"path", "pts"}: recent track polyline on the map
+_snapshot_win = None
+_bulk_import = None               # the running/last Import JSON job
+preview_label = None              # details-pane thumbnail
+
+
+registry = DeviceRegistry()
+POLL_MS = POLL_INTERVAL_MS
+SYNC_DRAIN_MS = 200
+IMPORT_PROGRESS_MS = 250
+MAP_VIEW_DEBOUNCE_MS = 150
+CLUSTER_MAX_ZOOM = 12      # below this zoom, nearby markers merge into count bubbles
+TRACK_PATH_POINTS = 200    # points in a device's track polyline
+GEO_HIGHLIGHT = "#00A0FF"  # marker outline for devices matched by the area query
+ALERT_LIST_ROWS = 300      # newest alerts shown in the Alerts panel (the history keeps more)
+
+# Table columns, in row_values order
+_COLUMNS = ("name", "type", "battery", "tamper", "status", "last_seen")
+
+# Device fields that feed row_values/_compute_row_tags
+_ROW_FIELDS = {"name", "device_name", "device_type", "battery_pct", "tamper_status", "connectivity", "last_seen"}
+# ...and the ones that feed a map marker
+_MARKER_FIELDS = {"name", "device_name", "lat", "lon", "tamper_status", "connectivity"}
 
 DEFAULT_RTSP_URL = os.getenv("OPTECH_RTSP_URL", "rtsp://192.168.8.185:8554/cam")
 
@@ -39,12 +89,14 @@ def init_handlers(
     _root, _tatree, _details_text,
     _img_btn, _edit_btn, _del_btn,
     _save_var, _total_var,
-    poll_ms: int = 10_000,
+    poll_ms: int = POLL_INTERVAL_MS,
     _alerts_list=None,
-    _map_widget=None
+    _map_widget=None,
+    _preview_label=None,
+    _poll_var=None
 ):
     global root, tatree, details_text, img_btn, edit_btn, del_btn
-    global save_var, total_var, devices, POLL_MS, alerts_list, map_widget
+    global save_var, total_var, registry, POLL_MS, alerts_list, map_widget, store, preview_label, poll_var
 
     root, tatree, details_text = _root, _tatree, _details_text
     img_btn, edit_btn, del_btn = _img_btn, _edit_btn, _del_btn
@@ -52,9 +104,21 @@ def init_handlers(
     POLL_MS = poll_ms
     alerts_list = _alerts_list
     map_widget = _map_widget
+    preview_label = _preview_label
+    poll_var = _poll_var
 
-    init_store()
-    devices = load_data()
+    store = get_store()
+    store.init_store()
+    registry = DeviceRegistry(store.load_data())
+    try:
+        tracks.load()
+    except Exception:
+        pass
+    try:
+        alert_engine.set_rules(load_config().get("alert_rules") or ALERT_RULES)
+        alert_engine.prime(registry)
+    except Exception:
+        pass
     refresh_device_list()
     refresh_total_device()
     on_selection_change()
@@ -66,6 +130,8 @@ def init_handlers(
 
     try:
         update_map_markers()           
+        _bind_map_view_events()
+        _bind_map_menu()
     except Exception:
         pass
 
@@ -106,19 +172,45 @@ def _configure_tree_tags():
     tatree.tag_configure("offline", background="#FFEAEA", foreground="#8B0000")   # light red
     tatree.tag_configure("tampered", background="#FFF6CC", foreground="#6B4E00")  # light amber
     
-def _push_alert(msg: str):
-    """Append a red, timestamped alert to the Alerts panel."""
+def _push_alert(alert: dict):
+    """Show a red, timestamped alert at the top of the Alerts panel (row i = alert_engine.history.recent()[i])."""
     if not alerts_list:
         return
-    ts = time.strftime("%H:%M:%S")
-    alerts_list.insert(0, f"[{ts}] {msg}")
+    ts = time.strftime("%H:%M:%S", time.localtime(alert["ts"]))
+    alerts_list.insert(0, f"[{ts}] {alert['message']}")
     try:
         alerts_list.itemconfig(0, foreground="red")
     except Exception:
         pass
-    # keep size in check
-    if alerts_list.size() > 300:
-        alerts_list.delete(300, "end")
+    # the panel only mirrors the newest rows; older ones stay in the history
+    if alerts_list.size() > ALERT_LIST_ROWS:
+        alerts_list.delete(ALERT_LIST_ROWS, "end")
+
+def clear_alerts():
+    """Empty the Alerts panel and the alert history (alerts still holding aren't re-raised)."""
+    alert_engine.history.clear()
+    if alerts_list:
+        alerts_list.delete(0, "end")
+
+def on_alert_double_click(event=None):
+    """Select the device an alert is about."""
+    sel = alerts_list.curselection() if alerts_list else ()
+    if not sel:
+        return
+    shown = alert_engine.history.recent(sel[0] + 1)
+    if len(shown) <= sel[0]:
+        return
+    dev_id = shown[sel[0]]["device_id"]
+    d = registry.get(dev_id)
+    if not d:
+        return
+    try:
+        tatree.selection_set(dev_id); tatree.focus(dev_id); tatree.see(dev_id)
+    except Exception:
+        # filtered out of the table
+        pass
+    show_details(d)
+    center_map_on_device(d, zoom=13)
 
 def center_map_on_current_selection():
     """Center the map on the currently selected (or last selected) device."""
@@ -137,7 +229,7 @@ def center_map_on_current_selection():
     if not iid:
         return
 
-    dev = next((d for d in devices if d.get("id") == iid), None)
+    dev = registry.get(iid)
     if dev:
         center_map_on_device(dev, zoom=13)
 
@@ -158,16 +250,16 @@ def on_notebook_tab_changed(event):
 
 def _device_has_image_events(d: dict) -> bool:
     """
-    Returns True if recent events/payloads look like the device is providing images.
-    Heuristic: any event payload.type starting with 'image'.
+    Returns True if recent events look like the device is providing images.
+    Heuristic: a reassembled image or fragments in flight, else any event
+    payload type starting with 'image'.
     Falls back to device_type hint for camera-like things.
     """
+    if images.progress(d.get("id")) or images.latest(d.get("id")):
+        return True
 
-    for ev in reversed(d.get("event_log", [])):
-        top = ev.get("payload") or {}
-        inner = top.get("payload") or {}
-        t = (inner.get("type") or top.get("type") or "").lower()
-        if t.startswith("image"):
+    for ev in reversed(d.get("event_log") or ()):
+        if payload_type(ev).startswith("image"):
             return True
 
     dtype = (d.get("device_type") or "").lower()
@@ -176,41 +268,43 @@ def _device_has_image_events(d: dict) -> bool:
     return False
 
 
-def _grab_rtsp_snapshot(rtsp_url: str, warmup_frames: int = 12, timeout_s: int = 10) -> Path:
+def _grab_rtsp_snapshot(rtsp_url: str, timeout_s: int = 10):
     """
-    Grab a single frame from an RTSP stream using OpenCV (FFmpeg backend).
-    Returns a temp JPG path or raises RuntimeError with a clear message.
+    Newest frame from the stream's pooled capture worker (opened on first use,
+    closed after CAPTURE_IDLE_TIMEOUT_S idle). Raises RuntimeError with a clear message.
     """
-    try:
-        import cv2
-    except ImportError:
-        raise RuntimeError("OpenCV (cv2) is not installed. Run: pip install opencv-python")
-
-    cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
-    if not cap.isOpened():
-        raise RuntimeError("OpenCV could not open RTSP stream (check URL/credentials/camera)")
-
-    start = time.time()
-    ok, frame = False, None
-
-    for _ in range(max(1, warmup_frames)):
-        ok, frame = cap.read()
-        if ok:
-            break
-        if time.time() - start > timeout_s:
-            break
-    cap.release()
+    return _capture_pool.snapshot(rtsp_url, timeout_s)
 
-    if not ok or frame is None:
-        raise RuntimeError("Couldn't read a frame from RTSP (check codec/network)")
 
-    ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
-    if not ok:
-        raise RuntimeError("Failed to encode JPG")
+def _show_snapshot(d: dict, frame):
+    """Show a BGR frame in the snapshot window (Pillow), else open it as a JPG in the browser."""
+    global _snapshot_win
+    title = f"Live snapshot – {d.get('device_name') or d.get('name') or d.get('id')}"
+    try:
+        import tkinter as tk
+        from PIL import Image, ImageTk
+    except ImportError:
+        import cv2
+        ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+        if not ok:
+            raise RuntimeError("Failed to encode JPG")
+        # one file per device, overwritten each time
+        path = Path(tempfile.gettempdir()) / f"optech-snapshot-{utils.safe_filename(d.get('id'))}.jpg"
+        path.write_bytes(buf.tobytes())
+        webbrowser.open(path.as_uri())
+        return
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-        tmp.write(buf.tobytes())
-        return Path(tmp.name)
+    img = Image.fromarray(frame[:, :, ::-1])   # BGR -> RGB
+    img.thumbnail((960, 720))
+    photo = ImageTk.PhotoImage(img)
+    if _snapshot_win is None or not _snapshot_win.winfo_exists():
+        _snapshot_win = tk.Toplevel(root)
+        _snapshot_win.label = tk.Label(_snapshot_win)
+        _snapshot_win.label.pack()
+    _snapshot_win.title(title)
+    _snapshot_win.label.configure(image=photo)
+    _snapshot_win.label.image = photo   # keep a reference or Tk drops it
+    _snapshot_win.lift()
 
 
 def row_values(d: dict):
@@ -223,8 +317,50 @@ def row_values(d: dict):
     return (name, dtype, batt, tamper, status, last_seen)
 
 
+def _row_sort_keys(d: dict) -> tuple:
+    """Typed sort key for each column (blank battery/last_seen sort last)."""
+    batt = d.get("battery_pct")
+    seen = utils.parse_iso_datetime(d.get("last_seen"))
+    return (
+        (d.get("device_name") or d.get("name") or "").lower(),
+        (d.get("device_type") or "").lower(),
+        (batt is None, batt if isinstance(batt, (int, float)) else 0),
+        (d.get("tamper_status") or "").upper(),
+        (d.get("connectivity") or "").upper(),
+        (seen is None, seen.timestamp() if seen else 0.0),
+    )
+
+
+def _blanks_last_desc(key):
+    return (not key[0], key[1]) if isinstance(key, tuple) else key
+
+
 def insert_row(d: dict):
-    tatree.insert("", "end", iid=d["id"], values=row_values(d), tags=_compute_row_tags(d))
+    values, tags = row_values(d), tuple(_compute_row_tags(d))
+    _sort_keys[d["id"]] = _row_sort_keys(d)
+    tatree.insert("", "end", iid=d["id"], values=values, tags=tags)
+    _rendered[d["id"]] = (values, tags)
+
+
+def _sync_row(d: dict):
+    """Insert the row if missing, else item()-update it only if what it shows changed."""
+    iid = d["id"]
+    rendered = _rendered.get(iid)
+    if rendered is None or not tatree.exists(iid):
+        insert_row(d)
+        return
+    values, tags = row_values(d), tuple(_compute_row_tags(d))
+    if rendered != (values, tags):
+        _sort_keys[iid] = _row_sort_keys(d)
+        tatree.item(iid, values=values, tags=tags)
+        _rendered[iid] = (values, tags)
+
+
+def _drop_row(iid: str):
+    _rendered.pop(iid, None)
+    _sort_keys.pop(iid, None)
+    if tatree.exists(iid):
+        tatree.delete(iid)
 
 
 def show_details(d: Optional[dict]):
@@ -246,86 +382,209 @@ def show_details(d: Optional[dict]):
             f"Last Seen: {d.get('last_seen','')}",
             f"GPS: {d.get('lat')}, {d.get('lon')}",
             f"Stream: {stream or '(none)'}",
+            f"Image: {_image_summary(d)}",
             f"Notes: {d.get('notes','')}",
         ]
         details_text.insert("1.0", "\n".join(info))
     details_text.configure(state="disabled")
+    _show_preview(d)
+
+
+def _show_preview(d: Optional[dict]):
+    """Latest cached image of the device as a thumbnail next to the details (no stream access)."""
+    if preview_label is None:
+        return
+    thumb = _image_cache.thumbnail(d["id"]) if d and d.get("id") else None
+    if thumb is None:
+        preview_label.configure(image="", text="No image")
+        preview_label.image = None
+        return
+    try:
+        from PIL import ImageTk
+        photo = ImageTk.PhotoImage(thumb)
+    except Exception:
+        return
+    preview_label.configure(image=photo, text="")
+    preview_label.image = photo   # keep a reference or Tk drops it
+
+
+def open_preview_image(event=None):
+    """Open the selected device's latest cached image full size."""
+    sel = tatree.selection()
+    entry = _image_cache.latest(sel[0]) if sel else None
+    if entry is not None:
+        webbrowser.open(entry["path"].as_uri())
+
+
+def _image_summary(d: dict) -> str:
+    img = images.latest(d.get("id"))
+    prog = images.progress(d.get("id"))
+    parts = []
+    if img:
+        parts.append(f"{img['path'].name} ({img['bytes'] // 1024} KB)")
+    if prog and not (img and img["image_id"] == prog[0]):
+        parts.append(f"receiving {prog[0]} {prog[1]}/{prog[2]}")
+    return ", ".join(parts) or "(none)"
 
 
 def refresh_total_device():
-    total_var.set(f"Total Devices: {len(devices)}")
+    if _filter_ids is None:
+        total_var.set(f"Total Devices: {len(registry)}")
+    else:
+        shown = f"showing {len(_filter_ids)}"
+        if _geo_query is not None:
+            shown += f", {_geo_query['label']}"
+        total_var.set(f"Total Devices: {len(registry)} ({shown})")
+
+
+# ---------- sorting ----------
+
+def sort_by_column(column: str):
+    """Heading click: sort by `column`, toggling direction on repeat clicks."""
+    global _sort_column
+    descending = bool(_sort_column and _sort_column[0] == column and not _sort_column[1])
+    _sort_column = (column, descending)
+    col = _COLUMNS.index(column)
+    if descending:
+        # reverse=True flips the (is_blank, value) keys too; flip is_blank back so blanks stay last
+        tatree.sort_by(lambda iid: _blanks_last_desc(_sort_keys[iid][col]), reverse=True)
+    else:
+        tatree.sort_by(lambda iid: _sort_keys[iid][col])
 
+    for c in _COLUMNS:
+        text = _headings.setdefault(c, tatree.heading(c, "text"))
+        if c == column:
+            text += " ▼" if descending else " ▲"
+        tatree.heading(c, text=text)
 
-def refresh_device_list():
-    """Repaint table from disk while preserving selection, scroll and map center."""
-    global devices, _suppress_select_events, last_selected_iid
 
-    # remember selection to keep
-    current_sel = tatree.selection()
-    wanted_iid = current_sel[0] if current_sel else last_selected_iid
+# ---------- filter bar ----------
 
-    # remember scroll so doesn't jump to top
-    try:
-        y0, _ = tatree.yview()
-    except Exception:
-        y0 = None
+def apply_filter(**criteria):
+    """
+    Show only matching devices in the table and on the map.
+    criteria: text (name/serial substring), battery_min, battery_max and any of
+    kit_id, device_type, model, connectivity, tamper_status. Blank = any.
+    """
+    global _filter
+    _filter = {k: v for k, v in criteria.items() if v is not None and str(v).strip() != ""}
+    _refilter()
+    if _map_available():
+        with _store_lock:
+            _render_map_view()
+    refresh_total_device()
 
-    # load from disk; if read fails, keep previous in-memory devices
-    try:
-        loaded = load_data()
-        if isinstance(loaded, list) and loaded is not None:
-            devices = loaded
-    except Exception:
-        pass
 
-    _suppress_select_events = True
-    try:
-        # clear & reinsert
-        tatree.delete(*tatree.get_children())
-        for d in devices:
-            if isinstance(d, dict) and d.get("id"):
-                insert_row(d)
-
-        # restore scroll
-        if y0 is not None:
-            try:
-                tatree.yview_moveto(y0)
-            except Exception:
-                pass
+def filter_values(field: str) -> list[str]:
+    """Values present in the fleet for a filter drop-down."""
+    with _store_lock:
+        return registry.search.values(field)
 
-        # restore selection if possible
-        dev = None
-        if wanted_iid and tatree.exists(wanted_iid):
-            tatree.selection_set(wanted_iid)
-            tatree.focus(wanted_iid)
-            tatree.see(wanted_iid)
-            dev = next((x for x in devices if x.get("id") == wanted_iid), None)
-
-        # update buttons/details
-        if dev:
-            show_details(dev)
-            edit_btn.config(state="normal"); del_btn.config(state="normal")
-            has_rtsp = bool(dev.get("stream_url") or DEFAULT_RTSP_URL)
-            imaging = _device_has_image_events(dev)
-            img_btn.config(state="normal" if (has_rtsp and imaging) else "disabled")
-            # keep map centered on selection AFTER markers exist
-            try:
-                center_map_on_device(dev, zoom=13)
-            except Exception:
-                pass
-        else:
-            edit_btn.config(state="disabled"); del_btn.config(state="disabled")
-            img_btn.config(state="disabled")
-            show_details(None)
 
-    finally:
-        _suppress_select_events = False
+def _refilter():
+    global _filter_ids
+    with _store_lock:
+        ids = registry.search.query(**_filter) if _filter else None
+    if _geo_query is not None:
+        ids = set(_geo_query["ids"]) if ids is None else ids & _geo_query["ids"]
+    _filter_ids = ids
+    tatree.set_filter(_filter_ids)
+
+
+def _track_filter(changes: list[dict]):
+    """Re-test just the changed devices against the active filter (indexes are already current)."""
+    if _filter_ids is None:
+        return
+    if _geo_query is not None and _rerun_geo_query(changes):
+        _refilter()
+        return
+    flipped = False
+    with _store_lock:
+        for res in changes:
+            iid = res.get("id")
+            if not iid:
+                continue
+            hit = registry.search.matches(iid, **_filter) and (_geo_query is None or iid in _geo_query["ids"])
+            if hit != (iid in _filter_ids):
+                if hit:
+                    _filter_ids.add(iid)
+                else:
+                    _filter_ids.discard(iid)
+                flipped = True
+    if flipped:
+        tatree.set_filter(_filter_ids)
+
+
+def refresh_device_list(changes: list[dict] | None = None):
+    """
+    Bring the table in line with the in-memory registry (no disk reload).
+    - changes=None: diff every device against what's currently rendered
+    - changes=[upsert results]: only touch the rows named in those results
+    Unchanged rows aren't touched, so selection and scroll stay put.
+    """
+    global _suppress_select_events
+
+    _suppress_select_events = True
+    with _store_lock:
+        try:
+            if changes is None:
+                live = registry.ids()
+                for iid in [i for i in _rendered if i not in live]:
+                    _drop_row(iid)
+                for d in registry:
+                    if d.get("id"):
+                        _sync_row(d)
+                if _geo_query is not None:
+                    _rerun_geo_query()
+                if _filter_ids is not None:
+                    _refilter()
+                touched = live
+                moved = set()
+            else:
+                _track_filter(changes)
+                touched, moved = set(), set()
+                for res in changes:
+                    iid = res.get("id")
+                    if not iid:
+                        continue
+                    d = registry.get(iid)
+                    if d is None:
+                        _drop_row(iid)
+                        continue
+                    fields = res.get("updated_fields") or []
+                    if res.get("action") == "created" or iid not in _rendered or _ROW_FIELDS.intersection(fields):
+                        _sync_row(d)
+                    if fields or res.get("action") == "created":
+                        touched.add(iid)
+                    if "lat" in fields or "lon" in fields:
+                        moved.add(iid)
+
+            # keep details/buttons current for the selected device
+            sel = tatree.selection()
+            if not sel:
+                if changes is None:
+                    edit_btn.config(state="disabled"); del_btn.config(state="disabled")
+                    img_btn.config(state="disabled")
+                    show_details(None)
+            elif sel[0] in touched:
+                dev = registry.get(sel[0])
+                show_details(dev)
+                has_rtsp = bool(dev and (dev.get("stream_url") or DEFAULT_RTSP_URL))
+                imaging = bool(dev and _device_has_image_events(dev))
+                img_btn.config(state="normal" if (has_rtsp and imaging) else "disabled")
+                # follow the selected device on the map only when it actually moved
+                if dev and sel[0] in moved:
+                    try:
+                        center_map_on_device(dev, zoom=13)
+                    except Exception:
+                        pass
+        finally:
+            _suppress_select_events = False
 
     # footer count
     refresh_total_device()
 
 
-
 def _map_available() -> bool:
     return map_widget is not None
 
@@ -347,40 +606,396 @@ def _device_latlon(d: dict):
     except Exception:
         return None
 
-def update_map_markers(center_on_device: dict | None = None):
-    """Redraw markers without touching map center/zoom (unless centering is requested)."""
+def update_map_markers(changes: list[dict] | None = None, center_on_device: dict | None = None):
+    """
+    Bring markers in line with the registry without touching map center/zoom
+    (unless centering is requested).
+    - changes=None: re-index every device
+    - changes=[upsert results]: only re-index the devices named in those results
+    Only devices inside the current view get a marker; below CLUSTER_MAX_ZOOM
+    dense groups collapse into count bubbles (see _render_map_view).
+    """
+    if not _map_available():
+        return
+
+    with _store_lock:
+        if changes is None:
+            live = registry.ids()
+            for iid in [i for i in _map_index.ids() if i not in live]:
+                _map_index.remove(iid)
+            for d in registry:
+                if d.get("id"):
+                    _map_index.update(d["id"], _device_latlon(d))
+            dirty = None
+        else:
+            dirty = set()
+            for res in changes:
+                iid = res.get("id")
+                if not iid:
+                    continue
+                d = registry.get(iid)
+                if d is None:
+                    _map_index.remove(iid)
+                elif res.get("action") == "created" or _MARKER_FIELDS.intersection(res.get("updated_fields") or ()):
+                    _map_index.update(iid, _device_latlon(d))
+                    dirty.add(iid)
+        if changes is None or changes:
+            _render_map_view(dirty)
+
+    # Only recenter if explicitly asked to center on a specific device
+    if center_on_device:
+        try:
+            center_map_on_device(center_on_device, zoom=13)
+        except Exception:
+            pass
+
+
+def _map_view():
+    """(center, zoom, width, height) of the map widget, or None if it can't say yet."""
+    try:
+        center = tuple(map_widget.get_position())
+        zoom = float(map_widget.zoom)
+        width, height = int(map_widget.winfo_width()), int(map_widget.winfo_height())
+    except Exception:
+        return None
+    if width <= 1 or height <= 1:
+        # not laid out yet
+        return None
+    return center, zoom, width, height
+
+
+def _render_map_view(dirty: set | None = None):
+    """
+    Diff markers against what should be on screen now: single devices in view
+    get their own marker, clusters get a count bubble, everything else none.
+    `dirty` = devices whose marker may be stale (None = check all visible).
+    """
+    view = _map_view()
+    if view is None:
+        bbox, zoom = None, CLUSTER_MAX_ZOOM
+    else:
+        center, zoom, width, height = view
+        bbox = map_index.viewport_bbox(center, zoom, width, height)
+    visible = _map_index.query(bbox)
+    if _filter_ids is not None:
+        visible = [(i, ll) for i, ll in visible if i in _filter_ids]
+
+    clusters = {}
+    if zoom < CLUSTER_MAX_ZOOM:
+        singles = []
+        for key, (ids, centroid) in map_index.cluster(visible, zoom).items():
+            if len(ids) == 1:
+                singles.append(ids[0])
+            else:
+                clusters[key] = (ids, centroid)
+    else:
+        singles = [i for i, _ in visible]
+
+    shown = set(singles)
+    for iid in [i for i in _map_markers if i not in shown]:
+        _drop_marker(iid)
+    for iid in [i for i in _map_paths if i not in shown]:
+        _drop_path(iid)
+    for iid in singles:
+        if dirty is None or iid in dirty or iid not in _map_markers:
+            d = registry.get(iid)
+            if d is not None:
+                _sync_marker(d)
+                _sync_path(iid)
+
+    for key in [k for k in _cluster_markers if k not in clusters]:
+        _drop_cluster(key)
+    for key, (ids, centroid) in clusters.items():
+        _sync_cluster(key, ids, centroid, zoom)
+
+
+def _sync_path(iid: str):
+    """Draw/refresh the device's recent track as a polyline (2+ points only)."""
+    pts = tracks.path_points(iid, TRACK_PATH_POINTS)
+    entry = _map_paths.get(iid)
+    if len(pts) < 2:
+        _drop_path(iid)
+        return
+    if entry is not None and entry["pts"] == pts:
+        return
+    try:
+        if entry is not None:
+            entry["path"].set_position_list(pts)
+            entry["pts"] = pts
+            return
+    except Exception:
+        _drop_path(iid)
+    try:
+        path = map_widget.set_path(pts, color="#1F4E79", width=2)
+    except Exception:
+        return
+    _map_paths[iid] = {"path": path, "pts": pts}
+
+
+def _drop_path(iid: str):
+    entry = _map_paths.pop(iid, None)
+    if entry is not None:
+        try:
+            entry["path"].delete()
+        except Exception:
+            pass
+
+
+def _sync_cluster(key, ids: list, centroid: tuple, zoom: float):
+    text = str(len(ids))
+    # colour by the worst state inside the bubble
+    colors = {_marker_color_for(registry.get(i) or {}) for i in ids}
+    color = "orange" if "orange" in colors else "red" if "red" in colors else "green"
+    entry = _cluster_markers.get(key)
+    if entry is not None and (entry["text"], entry["color"], entry["pos"]) == (text, color, centroid):
+        return
+    _drop_cluster(key)
+
+    def zoom_in(_marker=None, lat=centroid[0], lon=centroid[1]):
+        try:
+            map_widget.set_position(lat, lon)
+            map_widget.set_zoom(min(int(zoom) + 2, 19))
+        except Exception:
+            pass
+        _on_map_view_changed()
+
+    try:
+        marker = map_widget.set_marker(
+            centroid[0], centroid[1], text=text,
+            marker_color_circle=color, marker_color_outside="#1F4E79",
+            command=zoom_in
+        )
+    except Exception:
+        return
+    _cluster_markers[key] = {"marker": marker, "text": text, "color": color, "pos": centroid}
+
+
+def _drop_cluster(key):
+    entry = _cluster_markers.pop(key, None)
+    if entry is not None:
+        try:
+            entry["marker"].delete()
+        except Exception:
+            pass
+
+
+def _bind_map_view_events():
+    """Re-cull/re-cluster after the user pans, zooms or resizes the map."""
+    canvas = getattr(map_widget, "canvas", None)
+    if canvas is None:
+        return
+    for seq in ("<ButtonRelease-1>", "<MouseWheel>", "<Button-4>", "<Button-5>", "<Configure>"):
+        try:
+            canvas.bind(seq, _on_map_view_changed, add="+")
+        except Exception:
+            pass
+
+
+def _on_map_view_changed(event=None):
+    # debounce: wheel/drag events arrive in bursts
+    global _map_view_job
+    if _map_view_job is not None:
+        try:
+            root.after_cancel(_map_view_job)
+        except Exception:
+            pass
+    _map_view_job = root.after(MAP_VIEW_DEBOUNCE_MS, _map_view_settled)
+
+
+def _map_view_settled():
+    global _map_view_job
+    _map_view_job = None
     if not _map_available():
         return
+    with _store_lock:
+        _render_map_view()
+
+
+# ---------- area queries ----------
+
+def set_geo_query(label: str, run, shapes=()):
+    """
+    Narrow the table and map to an area query and highlight its markers.
+    run(registry) -> set of ids is re-run whenever devices move; `shapes` are
+    [(lat, lon), ...] outlines to draw on the map.
+    """
+    global _geo_query
+    with _store_lock:
+        ids = run(registry)
+    old = _geo_query["ids"] if _geo_query is not None else set()
+    _geo_query = {"label": label, "run": run, "shapes": [list(s) for s in shapes], "ids": ids}
+    _geo_query_changed(old ^ ids)
+
 
-    # Clear previous markers
-    for m in list(_map_markers):
+def clear_geo_query():
+    global _geo_query
+    if _geo_query is None:
+        return
+    old = _geo_query["ids"]
+    _geo_query = None
+    _geo_query_changed(old)
+
+
+def _geo_query_changed(flipped: set):
+    _refilter()
+    _draw_geo_shapes()
+    if _map_available():
+        with _store_lock:
+            _render_map_view(flipped)
+    refresh_total_device()
+
+
+def _rerun_geo_query(changes: list[dict] | None = None) -> bool:
+    """Re-run the area query if any device moved, appeared or went; True if its result changed."""
+    if changes is not None and not any(
+        res.get("action") == "created" or {"lat", "lon"}.intersection(res.get("updated_fields") or ())
+        or (res.get("id") and res["id"] not in registry)
+        for res in changes
+    ):
+        return False
+    with _store_lock:
+        ids = _geo_query["run"](registry)
+    flipped = ids ^ _geo_query["ids"]
+    if not flipped:
+        return False
+    _geo_query["ids"] = ids
+    if _map_available():
+        # re-outline markers that joined/left without moving
+        with _store_lock:
+            _render_map_view(flipped)
+    return True
+
+
+def filter_within_radius(lat: float, lon: float, km: float):
+    set_geo_query(f"within {km:g} km", lambda reg: reg.geo.within_radius(lat, lon, km),
+                  [circle_points(lat, lon, km)])
+
+
+def filter_nearest(lat: float, lon: float, k: int = 5, online_only: bool = True):
+    set_geo_query(f"nearest {k}", lambda reg: _nearest_ids(reg, (lat, lon), k, online_only))
+
+
+def filter_nearest_to_selected(k: int = 5, online_only: bool = True):
+    """The k devices closest to the selected one, following it as it moves."""
+    sel = tatree.selection()
+    if not sel or registry.geo.position(sel[0]) is None:
+        messagebox.showinfo("Nearest devices", "Select a device with a GPS position first.", parent=root)
+        return
+    iid = sel[0]
+    set_geo_query(f"nearest {k} to selected",
+                  lambda reg: _nearest_ids(reg, reg.geo.position(iid), k, online_only, exclude=(iid,)))
+
+
+def _nearest_ids(reg, origin, k: int, online_only: bool, exclude=()) -> set:
+    if origin is None:
+        return set()
+    among = reg.search.query(connectivity="ONLINE") if online_only else None
+    return {i for i, _ in reg.geo.nearest(origin[0], origin[1], k, among=among, exclude=exclude)}
+
+
+def outside_op_areas(reg, fences: dict) -> set:
+    """Positioned devices outside their op's geofence; fences = {kit_id: [(lat, lon), ...]}."""
+    out = set()
+    for kit_id, ring in fences.items():
+        out |= reg.geo.outside_polygon(ring, among=reg.search.query(kit_id=kit_id))
+    return out
+
+
+def filter_outside_op_areas():
+    fences = load_config().get("geofences") or {}
+    if not fences:
+        messagebox.showinfo("Op areas", 'No op areas set. Add "geofences": {"<op>": [[lat, lon], ...]} to the config file.', parent=root)
+        return
+    set_geo_query("outside op area", lambda reg: outside_op_areas(reg, fences), fences.values())
+
+
+def _draw_geo_shapes():
+    global _geo_shapes
+    for shape in _geo_shapes:
         try:
-            m.delete()
+            shape.delete()
         except Exception:
             pass
-    _map_markers.clear()
-
-    # Re-add markers
-    for d in devices:
-        ll = _device_latlon(d)
-        if not ll:
-            continue
-        lat, lon = ll
-        name = d.get("device_name") or d.get("name") or "Device"
-        color = _marker_color_for(d)
+    _geo_shapes = []
+    if not _map_available() or _geo_query is None:
+        return
+    for ring in _geo_query["shapes"]:
+        try:
+            _geo_shapes.append(map_widget.set_polygon(
+                [tuple(p) for p in ring], outline_color=GEO_HIGHLIGHT, fill_color=None, border_width=2
+            ))
+        except Exception:
+            pass
+
+
+def _bind_map_menu():
+    """Area queries on the map's right-click menu."""
+    add = getattr(map_widget, "add_right_click_menu_command", None)
+    if add is None:
+        return
+
+    def ask_radius(coords):
+        km = simpledialog.askfloat("Area filter", "Radius (km)", initialvalue=5, minvalue=0, parent=root)
+        if km:
+            filter_within_radius(coords[0], coords[1], km)
+
+    def ask_nearest(coords):
+        k = simpledialog.askinteger("Area filter", "How many online devices?", initialvalue=5, minvalue=1, parent=root)
+        if k:
+            filter_nearest(coords[0], coords[1], k)
+
+    add(label="Devices within… km", command=ask_radius, pass_coords=True)
+    add(label="Nearest online devices…", command=ask_nearest, pass_coords=True)
+    add(label="Nearest online to selected device", command=filter_nearest_to_selected)
+    add(label="Devices outside their op area", command=filter_outside_op_areas)
+    add(label="Clear area filter", command=clear_geo_query)
+
+
+def _sync_marker(d: dict):
+    iid = d["id"]
+    ll = _device_latlon(d)
+    if not ll:
+        _drop_marker(iid)
+        return
+    name = d.get("device_name") or d.get("name") or "Device"
+    color = _marker_color_for(d)
+    outline = GEO_HIGHLIGHT if _geo_query is not None and iid in _geo_query["ids"] else "black"
+    entry = _map_markers.get(iid)
+    if entry is None:
         try:
             marker = map_widget.set_marker(
-                lat, lon, text=name,
-                marker_color_circle=color, marker_color_outside="black"
+                ll[0], ll[1], text=name,
+                marker_color_circle=color, marker_color_outside=outline
             )
-            _map_markers.append(marker)
         except Exception:
-            pass
+            return
+        _map_markers[iid] = {"marker": marker, "pos": ll, "color": color, "text": name, "outline": outline}
+        return
 
-    # Only recenter if explicitly asked to center on a specific device
-    if center_on_device:
+    marker = entry["marker"]
+    try:
+        if entry["pos"] != ll:
+            marker.set_position(*ll)
+            entry["pos"] = ll
+        if entry["text"] != name:
+            marker.set_text(name)
+            entry["text"] = name
+        if (entry["color"], entry["outline"]) != (color, outline):
+            marker.marker_color_circle = color
+            marker.marker_color_outside = outline
+            marker.draw()
+            entry["color"], entry["outline"] = color, outline
+    except Exception:
+        # widget version without these hooks: fall back to recreating this one marker
+        _drop_marker(iid)
+        _sync_marker(d)
+
+
+def _drop_marker(iid: str):
+    entry = _map_markers.pop(iid, None)
+    if entry is not None:
         try:
-            center_map_on_device(center_on_device, zoom=13)
+            entry["marker"].delete()
         except Exception:
             pass
 
@@ -398,6 +1013,7 @@ def center_map_on_device(d: dict, zoom: int = 13):
         map_widget.set_zoom(zoom)
     except Exception:
         pass
+    _on_map_view_changed()
 
 # ---------- CRUD actions ----------
 
@@ -415,17 +1031,20 @@ def add_btn_clicked():
         return
     device_type = (device_type or "").strip() or "No type"
 
-    existing_ids = {d.get("id") for d in devices}
     device_id = utils.make_id("hb")
-    while device_id in existing_ids:
+    while device_id in registry:
         device_id = utils.make_id("hb")
 
     d = create_device(device_id, name, device_type)
     d.setdefault("device_name", d.get("name"))
-    devices.append(d)
-    save_data(devices)
+    with _store_lock:
+        registry.add(d)
+        write = store.stage_changes(registry.devices, changed=[d])
+    write()
 
+    _track_filter([{"id": d["id"]}])
     insert_row(d)
+    update_map_markers([{"id": d["id"], "action": "created"}])
     tatree.selection_set(d["id"]); tatree.focus(d["id"]); tatree.see(d["id"])
     show_details(d)
     refresh_total_device()
@@ -437,7 +1056,7 @@ def edit_btn_clicked():
         messagebox.showinfo("Too many", "Greedy", parent=root)
         return
     iid = selected_items[0]
-    device = next((d for d in devices if d.get("id") == iid), None)
+    device = registry.get(iid)
     if not device:
         return
 
@@ -448,19 +1067,26 @@ def edit_btn_clicked():
     if not name:
         messagebox.showerror("Edit Device", "Please enter a name.", parent=root)
         return
-    device["name"] = name
-    device["device_name"] = name
-    tatree.item(iid, values=row_values(device))
+    with _store_lock:
+        device["name"] = name
+        device["device_name"] = name
+        registry.reindex(device)
+    _track_filter([{"id": iid}])
+    _sync_row(device)
 
     device_type = simpledialog.askstring("Device Type", "Please enter the device type", initialvalue=device.get("device_type", ""), parent=root)
     if device_type is None:
         return
-    device["device_type"] = device_type.strip() or "No device type"
-
-    tatree.item(iid, values=row_values(device))
-    tatree.item(iid, tags=_compute_row_tags(device))
+    with _store_lock:
+        device["device_type"] = device_type.strip() or "No device type"
+        registry.reindex(device)
+        write = store.stage_changes(registry.devices, changed=[device])
+    write()
+
+    _track_filter([{"id": iid}])
+    _sync_row(device)
+    update_map_markers([{"id": iid, "updated_fields": ["device_name"]}])
     show_details(device)
-    save_data(devices)
 
 
 def del_btn_clicked():
@@ -469,25 +1095,31 @@ def del_btn_clicked():
         messagebox.showinfo("We are showing you this", "Select one device.", parent=root)
         return
     iid = selected_items[0]
-    device = next((d for d in devices if d.get("id") == iid), None)
+    device = registry.get(iid)
     if not device:
         return
     ok = messagebox.askyesno("Delete", "Delete this device?", parent=root)
     if not ok:
         return
 
-    devices.remove(device)
-    tatree.delete(iid)
+    with _store_lock:
+        registry.remove(iid)
+        write = store.stage_changes(registry.devices, deleted_ids=[iid])
+    write()
+    tracks.remove(iid)
+    alert_engine.forget(iid)
+    _track_filter([{"id": iid}])
+    _drop_row(iid)
+    update_map_markers([{"id": iid}])
     refresh_total_device()
     on_selection_change()
-    save_data(devices)
 
 
 def save_btn_clicked():
     try:
-        global devices
-        devices = load_data()
-        save_data(devices)
+        with _store_lock:
+            write = store.stage_data(registry.devices)
+        write()
     except Exception as e:
         messagebox.showerror("Save error", str(e), parent=root)
     else:
@@ -496,71 +1128,51 @@ def save_btn_clicked():
 
 
 def on_import_json_clicked():
+    """Bulk-import payload files on a background thread; progress shows in the status bar."""
+    global _bulk_import
+    if _bulk_import is not None and not _bulk_import.finished.is_set():
+        messagebox.showinfo("Import", "An import is already running.", parent=root)
+        return
     paths = filedialog.askopenfilenames(
         title="Import Device JSON…",
-        filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        filetypes=[("JSON / JSON lines", "*.json *.jsonl *.ndjson"), ("All files", "*.*")]
     )
     if not paths:
         return
+    _bulk_import = BulkImport(paths, registry, store.stage_changes, lock=_store_lock).start()
+    root.after(IMPORT_PROGRESS_MS, _poll_bulk_import)
 
-    summary = {"created": 0, "updated": 0, "no_change": 0}
-    errors = []
-    for p in paths:
-        try:
-            results = import_device_json(p)
-            for res in results:
-                summary[res["action"]] = summary.get(res["action"], 0) + 1
-        except Exception as e:
-            errors.append(f"{p}: {e}")
 
-    refresh_device_list()
+def _poll_bulk_import():
+    job = _bulk_import
+    if not job.finished.is_set():
+        prog = job.progress
+        pct = 100 * prog["bytes_read"] // prog["total_bytes"] if prog["total_bytes"] else 0
+        save_var.set(f"Importing… {prog['payloads']:,} payloads, file {prog['files_done'] + 1}/{prog['files']} ({pct}%)")
+        root.after(IMPORT_PROGRESS_MS, _poll_bulk_import)
+        return
+
+    save_var.set("")
+    refresh_device_list(job.changes)
+    update_map_markers(job.changes)
+    # imported state is the new baseline; imports don't raise alerts
+    with _store_lock:
+        alert_engine.prime(registry, [c["id"] for c in job.changes])
+    summary = job.summary
     msg = f"Created: {summary['created']}\nUpdated: {summary['updated']}\nNo change: {summary['no_change']}"
-    if errors:
-        msg += "\n\nErrors:\n- " + "\n- ".join(errors[:5])
-        if len(errors) > 5:
-            msg += f"\n… and {len(errors)-5} more"
+    if job.failed:
+        msg += f"\n\nImport stopped: {job.failed}"
+    if job.errors:
+        msg += "\n\nErrors:\n- " + "\n- ".join(job.errors[:5])
+        more = max(len(job.errors), summary["error"]) - 5
+        if more > 0:
+            msg += f"\n… and {more} more"
     messagebox.showinfo("Import complete", msg, parent=root)
-    
 
 
 def on_refresh_api_clicked():
-    try:
-        payloads = fetch_payloads()
-    except Exception as e:
-        messagebox.showerror("API error", f"Failed to fetch from API:\n{e}", parent=root)
-        return
-
-    summary = {"created": 0, "updated": 0, "no_change": 0}
-    errors = []
-    alerts = []
-
-    for p in payloads:
-        try:
-            res = upsert_device_from_api(p)
-            action = res.get("action", "no_change")
-            summary[action] = summary.get(action, 0) + 1
-
-            if res.get("tamper_changed") and res.get("tamper") == "TAMPERED":
-                alerts.append(f"{p.get('model','?')} {p.get('serial','?')}: TAMPERED")
-            if res.get("connectivity_changed") and res.get("connectivity") == "OFFLINE":
-                alerts.append(f"{p.get('model','?')} {p.get('serial','?')}: OFFLINE")
-        except Exception as e:
-            errors.append(str(e))
-
-    refresh_device_list()
-
-    if alerts:
-        messagebox.showwarning("Alerts", "\n".join(alerts), parent=root)
-        for m in alerts:
-            _push_alert(m)
-
-
-    msg = f"Created: {summary['created']}\nUpdated: {summary['updated']}\nNo change: {summary['no_change']}"
-    if errors:
-        msg += "\n\nErrors:\n- " + "\n- ".join(errors[:5])
-        if len(errors) > 5:
-            msg += f"\n… and {len(errors)-5} more"
-    messagebox.showinfo("API sync complete", msg, parent=root)
+    """Ask the sync worker for an immediate sync; the summary pops up when it lands."""
+    _ensure_sync_worker().request_sync(manual=True)
 
 
 def open_device_snapshot():
@@ -568,7 +1180,7 @@ def open_device_snapshot():
     if not sel:
         messagebox.showinfo("Live snapshot", "Select a device first.", parent=root)
         return
-    d = next((x for x in devices if x.get("id") == sel[0]), None)
+    d = registry.get(sel[0])
     if not d:
         return
 
@@ -583,11 +1195,19 @@ def open_device_snapshot():
 
     img_btn.config(state="disabled")
 
+    def show(frame):
+        if tatree.selection() == (d["id"],):
+            _show_preview(d)
+        try:
+            _show_snapshot(d, frame)
+        except Exception as e:
+            messagebox.showerror("Live snapshot", f"Failed to show frame:\n{e}", parent=root)
+
     def work():
         try:
-            img_path = _grab_rtsp_snapshot(rtsp)
-            uri = Path(img_path).as_uri()
-            root.after(0, lambda: webbrowser.open(uri))
+            frame = _grab_rtsp_snapshot(rtsp)
+            _image_cache.put_frame(d["id"], frame)
+            root.after(0, lambda: show(frame))
         except Exception as e:
             root.after(0, lambda: messagebox.showerror("Live snapshot", f"Failed to capture frame:\n{e}", parent=root))
         finally:
@@ -613,7 +1233,7 @@ def open_settings():
         return
     cfg.update({"api_url": api.strip(), "api_token": tok.strip(), "media_base": media.strip()})
     save_config(cfg)
-    messagebox.showinfo("Settings", "Saved. Use Refresh from API to apply.", parent=root)
+    messagebox.showinfo("Settings", "Saved. Changes apply from the next sync.", parent=root)
 
 
 def on_selection_change(event=None):
@@ -629,7 +1249,7 @@ def on_selection_change(event=None):
         edit_btn.config(state="normal")
         del_btn.config(state="normal")
         iid = selected[0]
-        device = next((d for d in devices if d.get("id") == iid), None)
+        device = registry.get(iid)
         show_details(device)
 
         has_rtsp = bool(device and (device.get("stream_url") or DEFAULT_RTSP_URL))
@@ -643,40 +1263,91 @@ def on_selection_change(event=None):
 
 
 
-def poll_api():
-    alerts = []
-    try:
-        payloads = fetch_payloads()
-        for p in payloads:
-            try:
-                res = upsert_device_from_api(p)
+def _ensure_sync_worker() -> SyncWorker:
+    global _sync_worker
+    if _sync_worker is None:
+        _sync_worker = SyncWorker(registry, _store_lock, POLL_MS, store.stage_upserts,
+                                  images=images, tracks=tracks, cache=_image_cache)
+        _sync_worker.start()
+        root.after(SYNC_DRAIN_MS, _drain_sync_queue)
+    return _sync_worker
 
-                # Only alert on *changes* to negative states
-                if res.get("tamper_changed") and (res.get("tamper") == "TAMPERED"):
-                    model = p.get("model", "?"); serial = p.get("serial", "?")
-                    alerts.append(f"{model} {serial}: TAMPERED")
 
-                if res.get("connectivity_changed") and (res.get("connectivity") == "OFFLINE"):
-                    model = p.get("model", "?"); serial = p.get("serial", "?")
-                    alerts.append(f"{model} {serial}: OFFLINE")
+def _drain_sync_queue():
+    """Runs on the Tk thread: apply whatever change-sets the worker has posted."""
+    try:
+        while True:
+            try:
+                msg = _sync_worker.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                _apply_sync_result(msg)
+            except Exception as e:
+                # a bad change-set mustn't stop the drain loop, but the table/map
+                # may now lag the registry: say so rather than drift silently
+                traceback.print_exc()
+                if poll_var is not None:
+                    poll_var.set(f"Failed to apply sync results: {e} (see console)")
+    finally:
+        root.after(SYNC_DRAIN_MS, _drain_sync_queue)
 
-            except Exception:
-                # Continue polling other payloads
-                pass
 
-        # Refresh table so state colors/tags (if you added them) remain accurate
-        refresh_device_list()
+def _show_poll_status(msg: dict):
+    """Cadence, last latency and failures of the background poll, in the status bar."""
+    if poll_var is None:
+        return
+    poll = msg.get("poll") or {}
+    next_s = (poll.get("next_ms") or 0) / 1000
+    if poll.get("failed"):
+        text = f"API unreachable ({poll.get('failures', 1)}x), retrying in {next_s:.0f}s"
+    else:
+        text = f"Polling every {(poll.get('interval_ms') or POLL_MS) / 1000:.1f}s"
+        if poll.get("latency_ms") is not None:
+            text += f" · last {poll['latency_ms']:.0f} ms"
+        if msg.get("endpoint_errors"):
+            text += f" · {len(msg['endpoint_errors'])} endpoint(s) failing"
+    poll_var.set(text)
+
+
+def _apply_sync_result(msg: dict):
+    manual = msg.get("manual")
+    _show_poll_status(msg)
+
+    # Rules run on every poll, even a failed or unchanged one: a poll that broke
+    # part-way may still have applied some batches, and "stale" rules come due
+    # with no change at all
+    with _store_lock:
+        raised = alert_engine.evaluate(registry, msg.get("changes") or ())
+    for a in raised:
+        _push_alert(a)
+    if raised:
+        _sync_worker.scheduler.alerts_raised()
+    alerts = [a["message"] for a in raised]
+
+    if msg.get("error"):
+        if msg.get("changes"):
+            refresh_device_list(msg["changes"])
+            update_map_markers(msg["changes"])
+        if manual:
+            messagebox.showerror("API error", msg["error"], parent=root)
+        # automatic polls back off instead (see the status bar)
+        return
 
+    # Patch only the rows/markers this sync changed so state colours/tags stay accurate
+    if msg.get("changes"):
+        refresh_device_list(msg["changes"])
+        update_map_markers(msg["changes"])
 
-    except Exception:
-        # swallow transient API errors
-        pass
-    finally:
-        if alerts:
-            # Log to Alerts panel (non-blocking)
-            for msg in alerts:
-                _push_alert(msg)
+    # newly reassembled images (already cached + thumbnailed by the worker): refresh the selected device's details
+    sel = tatree.selection()
+    if sel and any(img["device_id"] == sel[0] for img in msg.get("images") or ()):
+        show_details(registry.get(sel[0]))
 
+    if alerts:
+        if manual:
+            messagebox.showwarning("Alerts", "\n".join(alerts), parent=root)
+        else:
             # Throttle the bell (once every 10s max)
             global last_alert_bell_ts
             now = time.time()
@@ -694,11 +1365,19 @@ def poll_api():
             except Exception:
                 pass
 
-        root.after(POLL_MS, poll_api)
-
+    if manual:
+        summary, errors = msg.get("summary", {}), msg.get("endpoint_errors", []) + msg.get("errors", [])
+        text = f"Created: {summary.get('created', 0)}\nUpdated: {summary.get('updated', 0)}\nNo change: {summary.get('no_change', 0)}"
+        if errors:
+            text += "\n\nErrors:\n- " + "\n- ".join(errors[:5])
+            if len(errors) > 5:
+                text += f"\n… and {len(errors)-5} more"
+        messagebox.showinfo("API sync complete", text, parent=root)
 
 
-def start_polling(ms: int):
+def start_polling(ms: int = POLL_INTERVAL_MS):
+    """Start the background sync worker: `ms` is the base cadence, adapted per poll (see PollScheduler)."""
     global POLL_MS
     POLL_MS = ms
-    root.after(POLL_MS, poll_api)
\ No newline at end of file
+    worker = _ensure_sync_worker()
+    worker.interval_ms = ms
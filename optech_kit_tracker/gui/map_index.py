@@ -0,0 +1,119 @@
+import math
+from typing import Iterable
+
+# Spatial helpers for the Map tab: a lat/lon grid index over device positions,
+# the visible bbox for a TkinterMapView-style (web mercator, 256px tiles) view,
+# and pixel-grid clustering for low zoom levels.
+
+TILE_PX = 256
+MAX_LAT = 85.05112878
+
+
+class GridIndex:
+    """Device ids bucketed into cell_deg x cell_deg lat/lon cells."""
+
+    def __init__(self, cell_deg: float = 0.25):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], set] = {}
+        self._where: dict[str, tuple[tuple[int, int], tuple[float, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def update(self, device_id: str, latlon: tuple[float, float] | None) -> None:
+        """Insert/move a device; latlon=None removes it."""
+        old = self._where.get(device_id)
+        if latlon is None:
+            self.remove(device_id)
+            return
+        cell = self._cell(*latlon)
+        if old is not None:
+            if old[0] == cell:
+                self._where[device_id] = (cell, latlon)
+                return
+            self._discard(device_id, old[0])
+        self._cells.setdefault(cell, set()).add(device_id)
+        self._where[device_id] = (cell, latlon)
+
+    def remove(self, device_id: str) -> None:
+        old = self._where.pop(device_id, None)
+        if old is not None:
+            self._discard(device_id, old[0])
+
+    def _discard(self, device_id: str, cell) -> None:
+        ids = self._cells.get(cell)
+        if ids is not None:
+            ids.discard(device_id)
+            if not ids:
+                del self._cells[cell]
+
+    def ids(self) -> list[str]:
+        return list(self._where)
+
+    def position(self, device_id: str) -> tuple[float, float] | None:
+        w = self._where.get(device_id)
+        return w[1] if w else None
+
+    def query(self, bbox: tuple[float, float, float, float] | None) -> Iterable[tuple[str, tuple[float, float]]]:
+        """(id, (lat, lon)) for every device inside bbox=(lat_min, lat_max, lon_min, lon_max); all if None."""
+        if bbox is None:
+            return ((i, w[1]) for i, w in self._where.items())
+        lat_min, lat_max, lon_min, lon_max = bbox
+        r0, c0 = self._cell(lat_min, lon_min)
+        r1, c1 = self._cell(lat_max, lon_max)
+        span = (r1 - r0 + 1) * (c1 - c0 + 1)
+        if span > len(self._cells):
+            # zoomed far out: cheaper to walk the occupied cells than the bbox
+            cells = [c for c in self._cells if r0 <= c[0] <= r1 and c0 <= c[1] <= c1]
+        else:
+            cells = [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1) if (r, c) in self._cells]
+        out = []
+        for cell in cells:
+            for i in self._cells[cell]:
+                lat, lon = self._where[i][1]
+                if lat_min <= lat <= lat_max and lon_min <= lon <= lon_max:
+                    out.append((i, (lat, lon)))
+        return out
+
+
+def to_world_px(lat: float, lon: float, zoom: float) -> tuple[float, float]:
+    size = TILE_PX * (2 ** zoom)
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    s = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0 * size
+    y = (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * size
+    return x, y
+
+
+def from_world_px(x: float, y: float, zoom: float) -> tuple[float, float]:
+    size = TILE_PX * (2 ** zoom)
+    lon = x / size * 360.0 - 180.0
+    n = math.pi - 2 * math.pi * y / size
+    lat = math.degrees(math.atan(math.sinh(n)))
+    return lat, lon
+
+
+def viewport_bbox(center: tuple[float, float], zoom: float, width_px: int, height_px: int,
+                  margin_px: int = 64) -> tuple[float, float, float, float]:
+    """(lat_min, lat_max, lon_min, lon_max) visible around center, padded by margin_px."""
+    cx, cy = to_world_px(center[0], center[1], zoom)
+    hw, hh = width_px / 2 + margin_px, height_px / 2 + margin_px
+    lat_top, lon_left = from_world_px(cx - hw, cy - hh, zoom)
+    lat_bot, lon_right = from_world_px(cx + hw, cy + hh, zoom)
+    return (lat_bot, lat_top, max(-180.0, lon_left), min(180.0, lon_right))
+
+
+def cluster(points: Iterable[tuple[str, tuple[float, float]]], zoom: float, cell_px: int = 60):
+    """
+    Group points falling in the same cell_px x cell_px screen cell.
+    Returns {cell_key: (ids, (centroid_lat, centroid_lon))}.
+    """
+    groups: dict[tuple[int, int], list] = {}
+    for i, (lat, lon) in points:
+        x, y = to_world_px(lat, lon, zoom)
+        g = groups.setdefault((int(x // cell_px), int(y // cell_px)), [[], 0.0, 0.0])
+        g[0].append(i); g[1] += lat; g[2] += lon
+    return {k: (ids, (la / len(ids), lo / len(ids))) for k, (ids, la, lo) in groups.items()}
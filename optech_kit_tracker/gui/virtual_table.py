@@ -0,0 +1,357 @@
+# gui/virtual_table.py
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkfont
+
+# A ttk.Treeview front that only keeps the rows around the viewport as real Tk
+# items. The full row list (order + values/tags) lives in Python, so the List
+# tab costs the same with 50 or 50,000 devices. The handlers talk to it through
+# the usual Treeview calls (insert/item/delete/exists/selection_set/see...).
+
+
+class VirtualTreeview:
+    """
+    Wraps a ttk.Treeview. `_view` is the displayed row list (`_order` minus
+    anything hidden by set_filter, ordered by sort_by's key); rows [_start, _start + len(_window)) of it exist
+    in the tree: what's visible plus `buffer_rows` either side, so wheel/arrow
+    scrolling inside the buffer is handled natively by the tree. The scrollbar
+    passed via configure(yscrollcommand=...) sees the whole list.
+
+    Multiple selection ("extended", as a plain Treeview): selected rows stay
+    selected while they're scrolled out of the window; a plain click replaces
+    the selection, Ctrl/Shift-click adds to it (a Shift range only spans the
+    rows currently in the window). Anything not overridden here (heading,
+    column, pack, tag_configure, ...) goes straight to the tree.
+    """
+
+    def __init__(self, tree, buffer_rows: int = 30, row_height: int | None = None):
+        self.tree = tree
+        self.buffer_rows = buffer_rows
+        self._row_height = row_height
+        self._order: list[str] = []         # every row, in insertion order
+        self._view: list[str] = []          # the rows on show, in display order
+        self._filter: set | None = None
+        self._sort_key = None               # iid -> sort key; None = insertion order
+        self._sort_reverse = False
+        self._unsorted = False              # rows added/changed since _view was last sorted
+        self._rows: dict[str, list] = {}    # iid -> [values, tags]
+        self._window: list[str] = []        # iids currently in the tree, in order
+        self._in_tree: set[str] = set()
+        self._start = 0                     # index in _view of _window[0]
+        self._top = 0                       # index in _view of the first visible row
+        self._selected: list[str] = []      # selected iids, in the order they were selected
+        self._extending = False             # the click/key behind the next select event held Ctrl/Shift
+        self._focus = ""
+        self._yscroll = None
+        self._select_callbacks = []
+        self._render_job = None
+
+        tree.configure(yscrollcommand=self._on_tree_scrolled, selectmode="extended")
+        tree.bind("<<TreeviewSelect>>", self._on_tree_select, add="+")
+        tree.bind("<ButtonPress-1>", self._note_modifiers, add="+")
+        tree.bind("<KeyPress>", self._note_modifiers, add="+")
+        tree.bind("<Configure>", lambda e: self._schedule_render(), add="+")
+
+    def __getattr__(self, name):
+        return getattr(self.tree, name)
+
+    # ---------- Treeview API used by the handlers ----------
+
+    def insert(self, parent, index, iid=None, values=(), tags=(), **kw):
+        if iid is None:
+            raise ValueError("VirtualTreeview rows need an explicit iid")
+        if iid in self._rows:
+            raise tk.TclError(f"Item {iid} already exists")
+        self._rows[iid] = [tuple(values), tags]
+        if index == "end":
+            self._order.append(iid)
+            if self._passes(iid):
+                self._view.append(iid)
+        else:
+            self._order.insert(int(index), iid)
+            self._rebuild_view()
+        self._unsorted = self._sort_key is not None
+        self._schedule_render()
+        return iid
+
+    def item(self, iid, option=None, **kw):
+        row = self._rows.get(iid)
+        if row is None:
+            raise tk.TclError(f"Item {iid} not found")
+        if kw:
+            if "values" in kw:
+                row[0] = tuple(kw["values"])
+                if self._sort_key is not None:
+                    self._unsorted = True
+                    self._schedule_render()
+            if "tags" in kw:
+                row[1] = kw["tags"]
+            if iid in self._in_tree:
+                self.tree.item(iid, **kw)
+            return None
+        info = {"text": "", "values": list(row[0]), "tags": list(row[1] or ())}
+        return info[option] if option else info
+
+    def delete(self, *iids):
+        gone = {i for i in iids if i in self._rows}
+        if not gone:
+            return
+        for iid in gone:
+            del self._rows[iid]
+        if len(gone) == 1:
+            iid = next(iter(gone))
+            self._order.remove(iid)
+            if self._passes(iid):
+                self._view.remove(iid)
+        else:
+            self._order = [i for i in self._order if i not in gone]
+            self._view = [i for i in self._view if i not in gone]
+        live = [i for i in gone if i in self._in_tree]
+        if live:
+            self.tree.delete(*live)
+            self._window = [i for i in self._window if i not in gone]
+            self._in_tree.difference_update(live)
+        if any(i in gone for i in self._selected):
+            self._selected = [i for i in self._selected if i not in gone]
+        if self._focus in gone:
+            self._focus = ""
+        self._schedule_render()
+
+    def exists(self, iid) -> bool:
+        return iid in self._rows
+
+    def get_children(self, item=""):
+        self._ensure_sorted()
+        return tuple(self._view)
+
+    def index(self, iid) -> int:
+        self._ensure_sorted()
+        return self._view.index(iid)
+
+    def set_filter(self, ids=None):
+        """Show only the rows whose iid is in `ids` (None = all of them)."""
+        self._filter = None if ids is None else set(ids)
+        self._rebuild_view()
+        kept = [i for i in self._selected if self._passes(i)]
+        if kept != self._selected:
+            self.selection_set(kept)
+        self._render()
+
+    def sort_by(self, key=None, reverse: bool = False):
+        """
+        Order the rows by key(iid) (None = insertion order). The key is re-applied
+        whenever rows are added or their values change, so it should be cheap —
+        e.g. a lookup into sort keys cached alongside the rows.
+        """
+        self._sort_key, self._sort_reverse = key, reverse
+        self._rebuild_view()
+        self._render()
+
+    def _passes(self, iid) -> bool:
+        return self._filter is None or iid in self._filter
+
+    def _rebuild_view(self):
+        if self._filter is None:
+            self._view = list(self._order)
+        else:
+            self._view = [i for i in self._order if i in self._filter]
+        self._unsorted = self._sort_key is not None
+
+    def _ensure_sorted(self):
+        if self._unsorted:
+            # mostly-sorted already, which timsort handles in ~linear time
+            self._view.sort(key=self._sort_key, reverse=self._sort_reverse)
+            self._unsorted = False
+
+    def selection(self):
+        return tuple(self._selected)
+
+    def selection_set(self, *items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            items = tuple(items[0])
+        new = list(dict.fromkeys(i for i in items if i in self._rows))
+        if new == self._selected:
+            return
+        self._selected = new
+        self._sync_tree_selection()
+        # a plain Treeview fires <<TreeviewSelect>> for programmatic changes too
+        self.tree.after_idle(self._notify_select)
+
+    def _sync_tree_selection(self):
+        """Select, in the tree, the selected rows that are in the window."""
+        want = [i for i in self._selected if i in self._in_tree]
+        if set(self.tree.selection()) == set(want):
+            return
+        if want:
+            self.tree.selection_set(*want)
+        else:
+            self.tree.selection_remove(*self.tree.selection())
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self._focus
+        self._focus = iid
+        if iid in self._in_tree:
+            self.tree.focus(iid)
+        return None
+
+    def see(self, iid):
+        if iid not in self._rows or not self._passes(iid):
+            return
+        self._ensure_sorted()
+        idx = self._view.index(iid)
+        vis = self._visible_rows()
+        if not (self._top <= idx < self._top + vis):
+            self._top = idx - vis // 2
+            self._render()
+
+    def bind(self, sequence=None, func=None, add=None):
+        if sequence == "<<TreeviewSelect>>":
+            if not add:
+                self._select_callbacks = []
+            if func is not None:
+                self._select_callbacks.append(func)
+            return None
+        return self.tree.bind(sequence, func, add)
+
+    def configure(self, cnf=None, **kw):
+        if "yscrollcommand" in kw:
+            self._yscroll = kw.pop("yscrollcommand")
+            self._update_scrollbar()
+        if cnf or kw:
+            return self.tree.configure(cnf, **kw)
+        return None
+
+    config = configure
+
+    def yview(self, *args):
+        """Scrollbar protocol over the full row list (moveto / scroll n units|pages)."""
+        n, vis = len(self._view), self._visible_rows()
+        if not args:
+            return self._fractions(n, vis)
+        if args[0] == "moveto":
+            self._top = int(float(args[1]) * n)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self._top += step * (vis if str(args[2]).startswith("page") else 1)
+        self._render()
+        return None
+
+    def yview_moveto(self, fraction):
+        self.yview("moveto", fraction)
+
+    # ---------- windowing ----------
+
+    def _visible_rows(self) -> int:
+        try:
+            height = int(self.tree.winfo_height())
+        except Exception:
+            height = 0
+        if height <= 1:
+            # not laid out yet: assume a generous screenful
+            return 40
+        return max(1, height // self._rowheight() + 1)
+
+    def _rowheight(self) -> int:
+        if self._row_height:
+            return self._row_height
+        rh = 0
+        try:
+            rh = int(ttk.Style(self.tree).lookup("Treeview", "rowheight") or 0)
+        except Exception:
+            pass
+        if not rh:
+            try:
+                rh = tkfont.nametofont("TkDefaultFont").metrics("linespace") + 2
+            except Exception:
+                rh = 20
+        self._row_height = rh
+        return rh
+
+    def _schedule_render(self):
+        if self._render_job is None:
+            self._render_job = self.tree.after_idle(self._render)
+
+    def _render(self):
+        """Materialise the rows around _top; move/insert/delete only what changed."""
+        if self._render_job is not None:
+            try:
+                self.tree.after_cancel(self._render_job)
+            except Exception:
+                pass
+            self._render_job = None
+
+        self._ensure_sorted()
+        n, vis = len(self._view), self._visible_rows()
+        self._top = max(0, min(self._top, n - vis))
+        start = max(0, self._top - self.buffer_rows)
+        want = self._view[start:self._top + vis + self.buffer_rows]
+
+        if want != self._window:
+            keep = set(want)
+            gone = [i for i in self._window if i not in keep]
+            if gone:
+                self.tree.delete(*gone)
+            cur = [i for i in self._window if i in keep]
+            have = set(cur)
+            for pos, iid in enumerate(want):
+                if pos < len(cur) and cur[pos] == iid:
+                    continue
+                if iid in have:
+                    self.tree.move(iid, "", pos)
+                    cur.remove(iid)
+                else:
+                    values, tags = self._rows[iid]
+                    self.tree.insert("", pos, iid=iid, values=values, tags=tags)
+                cur.insert(pos, iid)
+            self._window, self._in_tree = want, keep
+            if self._selected:
+                self._sync_tree_selection()
+            if self._focus in keep:
+                self.tree.focus(self._focus)
+        self._start = start
+
+        if want:
+            self.tree.yview_moveto((self._top - start) / len(want))
+        self._update_scrollbar()
+
+    def _fractions(self, n: int, vis: int):
+        if not n:
+            return (0.0, 1.0)
+        return (self._top / n, min(1.0, (self._top + vis) / n))
+
+    def _update_scrollbar(self):
+        if self._yscroll is not None:
+            self._yscroll(*self._fractions(len(self._view), self._visible_rows()))
+
+    def _on_tree_scrolled(self, first, last):
+        # the tree scrolled itself (wheel, arrow keys, see()): follow it, and
+        # slide the window before the buffer runs out
+        if self._window:
+            self._top = self._start + round(float(first) * len(self._window))
+            vis = self._visible_rows()
+            end = self._start + len(self._window)
+            low = self._start > 0 and self._top - self._start < self.buffer_rows // 2
+            high = end < len(self._view) and end - (self._top + vis) < self.buffer_rows // 2
+            if low or high:
+                self._schedule_render()
+        self._update_scrollbar()
+
+    def _note_modifiers(self, event):
+        self._extending = bool(getattr(event, "state", 0) & 0x0005)   # Shift | Control
+
+    def _on_tree_select(self, event=None):
+        visible = set(self.tree.selection())
+        if visible == {i for i in self._selected if i in self._in_tree}:
+            return   # our own _sync_tree_selection, or rows scrolled out of the window
+        # rows outside the window are only kept when the user extended the selection
+        kept = [i for i in self._selected if i in visible or (self._extending and i not in self._in_tree)]
+        have = set(kept)
+        new = kept + [i for i in self.tree.selection() if i not in have]
+        if new != self._selected:
+            self._selected = new
+            self._notify_select(event)
+
+    def _notify_select(self, event=None):
+        for cb in self._select_callbacks:
+            cb(event)
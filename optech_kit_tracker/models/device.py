@@ -1,4 +1,5 @@
 import utils
+from models.event_history import new_history, make_event, append_event
 
 def create_device(device_id: str, name: str, device_type: str, serial_number: str | None = None):
     return {
@@ -18,7 +19,7 @@ def create_device(device_id: str, name: str, device_type: str, serial_number: st
         "last_image_url": None,
         "stream_url": None,
 
-        "event_log": []
+        "event_log": new_history()
     }
 
 def create_device_from_api(data: dict):
@@ -47,7 +48,10 @@ def create_device_from_api(data: dict):
         "last_image_url": None,
         "stream_url": None,
 
-        "event_log": [{"ts": data.get("timestamp"), "type": "IMPORT", "payload": data}]
+        # only what we need from the raw payload: its type and id (e.g. image id)
+        "event_log": new_history([make_event(data.get("timestamp"), "IMPORT",
+                                             (data.get("payload") or {}).get("type"),
+                                             (data.get("payload") or {}).get("id"))])
     }
 
 # --- keep your imports & function signature as-is ---
@@ -111,17 +115,12 @@ def refresh_device_from_api(device: dict, payload: dict) -> dict:
         device["connectivity"] = conn
         changed_fields.append("connectivity")
 
-    # ---- Minimal event (so image-type checks still work)
-    pl = payload.get("payload") or {}
-    ptype = (pl.get("type") or payload.get("type") or "").lower()
-    if "event_log" not in device or not isinstance(device["event_log"], list):
-        device["event_log"] = []
-    device["event_log"].append({
-        "ts": ts or utils.today_iso_date(),
-        "type": ptype or "API_REFRESH",
-    })
-    if len(device["event_log"]) > 50:
-        device["event_log"] = device["event_log"][-50:]
+    # ---- Minimal event (so image-type checks still work); a re-sent report
+    # that changes nothing (same timestamp) isn't a new event
+    if changed_fields:
+        pl = payload.get("payload") or {}
+        ptype = (pl.get("type") or payload.get("type") or "").lower()
+        append_event(device, make_event(ts or utils.today_iso_date(), "API_REFRESH", ptype, pl.get("id")))
 
     # >>> NEW: compute change flags for alerts
     tamper_changed = (device.get("tamper_status") != prev_tamper)
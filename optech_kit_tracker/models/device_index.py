@@ -0,0 +1,158 @@
+import bisect
+from typing import Iterable, Optional
+
+# Filter/search indexes over the device list:
+# - an inverted index per facet field: normalised value -> set of device ids
+# - battery_pct as a sorted [(pct, id)] list for range queries
+# - a trigram index over name/device_name/serial_number for substring search
+# DeviceRegistry keeps one up to date as devices are added, refreshed and removed.
+
+FACET_FIELDS = ("kit_id", "device_type", "model", "connectivity", "tamper_status")
+TEXT_FIELDS = ("name", "device_name", "serial_number")
+INDEXED_FIELDS = frozenset(FACET_FIELDS + TEXT_FIELDS + ("battery_pct",))
+
+
+def _norm(value) -> str:
+    return "" if value is None else str(value).strip().lower()
+
+
+def _battery(value) -> Optional[float]:
+    try:
+        return None if value is None or value == "" else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DeviceIndex:
+    """
+    query(text=..., battery_min=..., battery_max=..., kit_id=..., ...) -> set of ids.
+    Facet values match case-insensitively; empty/None criteria are ignored.
+    """
+
+    def __init__(self, devices: Iterable[dict] = ()):
+        self._facets: dict[str, dict[str, set]] = {f: {} for f in FACET_FIELDS}
+        self._labels: dict[str, dict[str, str]] = {f: {} for f in FACET_FIELDS}
+        self._battery: list[tuple] = []
+        self._grams: dict[str, set] = {}
+        self._entries: dict[str, tuple] = {}   # id -> (facet values, battery, text) it was indexed under
+        for d in devices:
+            self.update(d)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---------- maintenance ----------
+
+    def update(self, d: dict) -> None:
+        """(Re)index one device; a no-op when none of its indexed fields changed."""
+        dev_id = d.get("id")
+        if not dev_id:
+            return
+        entry = (
+            tuple(_norm(d.get(f)) for f in FACET_FIELDS),
+            _battery(d.get("battery_pct")),
+            "\0".join(_norm(d.get(f)) for f in TEXT_FIELDS),
+        )
+        old = self._entries.get(dev_id)
+        if old == entry:
+            return
+        if old is not None:
+            self._unindex(dev_id, old)
+        self._entries[dev_id] = entry
+        facets, battery, text = entry
+        for field, value in zip(FACET_FIELDS, facets):
+            self._facets[field].setdefault(value, set()).add(dev_id)
+            raw = d.get(field)
+            if value and value not in self._labels[field]:
+                self._labels[field][value] = str(raw).strip()
+        if battery is not None:
+            bisect.insort(self._battery, (battery, dev_id))
+        for g in _trigrams(text):
+            self._grams.setdefault(g, set()).add(dev_id)
+
+    def remove(self, dev_id) -> None:
+        old = self._entries.pop(dev_id, None)
+        if old is not None:
+            self._unindex(dev_id, old)
+
+    def _unindex(self, dev_id, entry) -> None:
+        facets, battery, text = entry
+        for field, value in zip(FACET_FIELDS, facets):
+            ids = self._facets[field].get(value)
+            if ids is not None:
+                ids.discard(dev_id)
+                if not ids:
+                    del self._facets[field][value]
+                    self._labels[field].pop(value, None)
+        if battery is not None:
+            i = bisect.bisect_left(self._battery, (battery, dev_id))
+            if i < len(self._battery) and self._battery[i] == (battery, dev_id):
+                del self._battery[i]
+        for g in _trigrams(text):
+            ids = self._grams.get(g)
+            if ids is not None:
+                ids.discard(dev_id)
+                if not ids:
+                    del self._grams[g]
+
+    # ---------- queries ----------
+
+    def values(self, field: str) -> list[str]:
+        """Distinct values present for a facet field (for the filter drop-downs)."""
+        return sorted(self._labels[field].values(), key=str.lower)
+
+    def query(self, text: str = "", battery_min=None, battery_max=None, **facets) -> set:
+        candidates: list[set] = []
+        for field, value in facets.items():
+            if field not in self._facets:
+                raise ValueError(f"Unknown filter field: {field}")
+            if value is None or value == "":
+                continue
+            candidates.append(self._facets[field].get(_norm(value), set()))
+
+        lo, hi = _battery(battery_min), _battery(battery_max)
+        if lo is not None or hi is not None:
+            a = 0 if lo is None else bisect.bisect_left(self._battery, (lo, ""))
+            b = len(self._battery) if hi is None else bisect.bisect_right(self._battery, (hi, "\uffff"))
+            candidates.append({dev_id for _, dev_id in self._battery[a:b]})
+
+        q = _norm(text)
+        if len(q) >= 3:
+            candidates.extend(self._grams.get(g, set()) for g in _trigrams(q))
+
+        if candidates:
+            candidates.sort(key=len)
+            result = set(candidates[0])
+            for ids in candidates[1:]:
+                if not result:
+                    break
+                result &= ids
+        else:
+            result = set(self._entries)
+
+        if q:
+            # trigrams narrow it down; the substring check makes it exact
+            result = {i for i in result if q in self._entries[i][2]}
+        return result
+
+    def matches(self, dev_id, text: str = "", battery_min=None, battery_max=None, **facets) -> bool:
+        """Same test as query() for a single device."""
+        entry = self._entries.get(dev_id)
+        if entry is None:
+            return False
+        values, battery, haystack = entry
+        for field, value in facets.items():
+            if value is None or value == "":
+                continue
+            if values[FACET_FIELDS.index(field)] != _norm(value):
+                return False
+        lo, hi = _battery(battery_min), _battery(battery_max)
+        if lo is not None or hi is not None:
+            if battery is None or (lo is not None and battery < lo) or (hi is not None and battery > hi):
+                return False
+        q = _norm(text)
+        return not q or q in haystack
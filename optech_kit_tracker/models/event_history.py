@@ -0,0 +1,61 @@
+from collections import deque
+from app_config import EVENT_HISTORY_DEPTH
+
+# A device's event_log is a fixed-capacity deque of compact events:
+#     [ts, kind, payload_type, ref]
+# kind is "IMPORT" or "API_REFRESH", payload_type the inner payload.type
+# ("image_fragment", "beacon", ...) and ref the inner payload id, if any.
+# Appending past capacity drops the oldest entry; nothing is copied.
+# On disk it's a plain JSON list of those lists.
+
+TS, KIND, PTYPE, REF = range(4)
+
+
+def new_history(events=(), depth: int = EVENT_HISTORY_DEPTH) -> deque:
+    return deque((compact_event(e) for e in events), maxlen=depth)
+
+
+def make_event(ts, kind: str, ptype: str = "", ref=None) -> list:
+    return [ts, kind, (ptype or "").lower(), ref]
+
+
+def compact_event(ev) -> list:
+    """Normalise an event from any stored format to [ts, kind, payload_type, ref]."""
+    if isinstance(ev, (list, tuple)):
+        return (list(ev) + [None] * 4)[:4]
+    if not isinstance(ev, dict):
+        return [None, "API_REFRESH", "", None]
+    # old dict formats:
+    #   {"ts", "type": "IMPORT", "payload": <raw API payload>}
+    #   {"ts", "type": <payload type or "API_REFRESH">}
+    etype = ev.get("type") or ""
+    if etype == "IMPORT":
+        inner = (ev.get("payload") or {}).get("payload") or {}
+        return [ev.get("ts"), "IMPORT", (inner.get("type") or "").lower(), inner.get("id")]
+    if etype == "API_REFRESH":
+        return [ev.get("ts"), "API_REFRESH", "", None]
+    return [ev.get("ts"), "API_REFRESH", etype.lower(), None]
+
+
+def ensure_history(device: dict) -> deque:
+    """The device's event_log as a deque, converting a loaded list once."""
+    log = device.get("event_log")
+    if not isinstance(log, deque) or log.maxlen != EVENT_HISTORY_DEPTH:
+        log = new_history(log if isinstance(log, (list, tuple, deque)) else ())
+        device["event_log"] = log
+    return log
+
+
+def append_event(device: dict, event) -> None:
+    ensure_history(device).append(compact_event(event))
+
+
+def payload_type(ev) -> str:
+    return compact_event(ev)[PTYPE] or ""
+
+
+def to_json(obj):
+    """json.dump(default=...) hook so deques serialise as lists."""
+    if isinstance(obj, deque):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
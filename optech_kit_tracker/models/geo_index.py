@@ -0,0 +1,177 @@
+import math
+from typing import Iterable, Optional
+
+import numpy as np
+
+import utils
+
+# Fleet-wide geospatial queries: every positioned device is one row in NumPy
+# columns (lat/lon in degrees, lat in radians and its cosine), so radius,
+# bounding-box, polygon and nearest queries are single vectorised passes.
+# DeviceRegistry keeps one up to date as positions change (see registry.geo).
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _latlon(d: dict) -> Optional[tuple[float, float]]:
+    lat, lon = utils.to_float(d.get("lat")), utils.to_float(d.get("lon"))
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def _inside(lat: np.ndarray, lon: np.ndarray, polygon) -> np.ndarray:
+    """Even-odd ray casting of each point against a [(lat, lon), ...] ring."""
+    inside = np.zeros(len(lat), dtype=bool)
+    pts = [(float(a), float(b)) for a, b in polygon]
+    for (y1, x1), (y2, x2) in zip(pts, pts[1:] + pts[:1]):
+        if y1 == y2:
+            continue   # horizontal edges never cross the ray
+        crosses = (y1 > lat) != (y2 > lat)
+        x_at = x1 + (x2 - x1) * (lat - y1) / (y2 - y1)
+        inside ^= crosses & (lon < x_at)
+    return inside
+
+
+def circle_points(lat: float, lon: float, km: float, n: int = 48) -> list[tuple[float, float]]:
+    """Ring of n (lat, lon) points km away from a centre, for drawing a radius."""
+    d = km / EARTH_RADIUS_KM
+    la, lo = math.radians(lat), math.radians(lon)
+    out = []
+    for i in range(n):
+        b = 2 * math.pi * i / n
+        la2 = math.asin(math.sin(la) * math.cos(d) + math.cos(la) * math.sin(d) * math.cos(b))
+        lo2 = lo + math.atan2(math.sin(b) * math.sin(d) * math.cos(la), math.cos(d) - math.sin(la) * math.sin(la2))
+        out.append((math.degrees(la2), (math.degrees(lo2) + 540) % 360 - 180))
+    return out
+
+
+class GeoIndex:
+    """
+    Positions of the devices that have one. update()/remove() touch a single
+    row (removal moves the last row into the gap); the query methods return
+    sets of device ids, nearest() a distance-ordered [(id, km)].
+    """
+
+    def __init__(self, devices: Iterable[dict] = ()):
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._lat = np.empty(64)
+        self._lon = np.empty(64)
+        self._lat_rad = np.empty(64)
+        self._cos_lat = np.empty(64)
+        for d in devices:
+            self.update(d)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # ---------- maintenance ----------
+
+    def update(self, d: dict) -> None:
+        """(Re)position one device; no usable lat/lon removes it."""
+        dev_id = d.get("id")
+        if not dev_id:
+            return
+        ll = _latlon(d)
+        if ll is None:
+            self.remove(dev_id)
+            return
+        row = self._rows.get(dev_id)
+        if row is None:
+            row = len(self._ids)
+            if row == len(self._lat):
+                self._grow()
+            self._ids.append(dev_id)
+            self._rows[dev_id] = row
+        lat, lon = ll
+        self._lat[row], self._lon[row] = lat, lon
+        self._lat_rad[row] = math.radians(lat)
+        self._cos_lat[row] = math.cos(self._lat_rad[row])
+
+    def remove(self, dev_id) -> None:
+        row = self._rows.pop(dev_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        moved = self._ids.pop()
+        if row != last:
+            self._ids[row] = moved
+            self._rows[moved] = row
+            for col in (self._lat, self._lon, self._lat_rad, self._cos_lat):
+                col[row] = col[last]
+
+    def _grow(self):
+        for name in ("_lat", "_lon", "_lat_rad", "_cos_lat"):
+            col = getattr(self, name)
+            bigger = np.empty(len(col) * 2)
+            bigger[:len(col)] = col
+            setattr(self, name, bigger)
+
+    # ---------- queries ----------
+
+    def position(self, dev_id) -> Optional[tuple[float, float]]:
+        row = self._rows.get(dev_id)
+        return None if row is None else (float(self._lat[row]), float(self._lon[row]))
+
+    def _select(self, among) -> np.ndarray:
+        """Row numbers to consider: all of them, or those of the ids in `among`."""
+        if among is None:
+            return np.arange(len(self._ids))
+        return np.fromiter((self._rows[i] for i in among if i in self._rows), dtype=np.intp)
+
+    def _pick(self, rows: np.ndarray, mask: np.ndarray) -> set:
+        ids = self._ids
+        return {ids[r] for r in rows[mask].tolist()}
+
+    def distances_km(self, lat: float, lon: float, rows: np.ndarray) -> np.ndarray:
+        """Haversine distance from (lat, lon) to each of the given rows."""
+        la = math.radians(lat)
+        dlat = self._lat_rad[rows] - la
+        dlon = np.radians(self._lon[rows] - lon)
+        a = np.sin(dlat / 2) ** 2 + math.cos(la) * self._cos_lat[rows] * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def within_radius(self, lat: float, lon: float, km: float, among=None) -> set:
+        rows = self._select(among)
+        return self._pick(rows, self.distances_km(lat, lon, rows) <= km)
+
+    def within_bbox(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float, among=None) -> set:
+        """Devices inside the box; lon_min > lon_max means it crosses the antimeridian."""
+        rows = self._select(among)
+        lat, lon = self._lat[rows], self._lon[rows]
+        in_lon = (lon >= lon_min) & (lon <= lon_max) if lon_min <= lon_max else (lon >= lon_min) | (lon <= lon_max)
+        return self._pick(rows, (lat >= lat_min) & (lat <= lat_max) & in_lon)
+
+    def in_polygon(self, polygon, among=None) -> set:
+        """Devices inside a [(lat, lon), ...] ring (closing the ring is optional)."""
+        rows = self._select(among)
+        return self._pick(rows, _inside(self._lat[rows], self._lon[rows], polygon))
+
+    def outside_polygon(self, polygon, among=None) -> set:
+        """Positioned devices outside the ring (devices without a position aren't included)."""
+        rows = self._select(among)
+        return self._pick(rows, ~_inside(self._lat[rows], self._lon[rows], polygon))
+
+    def contains(self, dev_id, polygon) -> Optional[bool]:
+        """Whether one device is inside the ring; None if it has no position."""
+        row = self._rows.get(dev_id)
+        if row is None:
+            return None
+        return bool(_inside(self._lat[row:row + 1], self._lon[row:row + 1], polygon)[0])
+
+    def nearest(self, lat: float, lon: float, k: int = 1, among=None, exclude=()) -> list[tuple[str, float]]:
+        """The k devices closest to (lat, lon) as [(id, km)], nearest first."""
+        rows = self._select(among)
+        if exclude:
+            skip = {self._rows[i] for i in exclude if i in self._rows}
+            rows = rows[~np.isin(rows, list(skip))] if skip else rows
+        if k <= 0 or not len(rows):
+            return []
+        dist = self.distances_km(lat, lon, rows)
+        if k < len(rows):
+            top = np.argpartition(dist, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(dist[top])]
+        return [(self._ids[r], float(km)) for r, km in zip(rows[top].tolist(), dist[top].tolist())]
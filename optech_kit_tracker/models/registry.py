@@ -0,0 +1,190 @@
+from typing import Iterable, Iterator, Optional
+from models.device import create_device_from_api, refresh_device_from_api
+from models.device_index import DeviceIndex, INDEXED_FIELDS
+from models.geo_index import GeoIndex
+
+
+class DeviceRegistry:
+    """
+    Owns the device list and keeps hash indexes over it:
+    - by id
+    - by (serial_number, model)
+    - by serial_number (for payloads that don't carry a model)
+
+    Lookups keep the old linear-scan semantics: when several devices share a
+    key, the one earliest in the list wins.
+
+    `search` (a DeviceIndex for the filter bar) and `geo` (a GeoIndex over
+    positions) are built on first use and kept current from then on.
+    """
+
+    def __init__(self, devices: Optional[Iterable[dict]] = None):
+        self.devices: list[dict] = []
+        self._by_id: dict[str, dict] = {}
+        self._by_key: dict[tuple, dict] = {}
+        self._by_serial: dict[str, list[dict]] = {}
+        self._keys: dict[int, tuple] = {}   # id(device) -> (id, serial, model) it was indexed under
+        self._search: Optional[DeviceIndex] = None
+        self._geo: Optional[GeoIndex] = None
+        for d in devices or []:
+            if isinstance(d, dict):
+                self.add(d)
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.devices)
+
+    def __contains__(self, device_id) -> bool:
+        return device_id in self._by_id
+
+    # ---------- lookups ----------
+
+    def get(self, device_id) -> Optional[dict]:
+        if not device_id:
+            return None
+        return self._by_id.get(device_id)
+
+    def find(self, serial, model=None) -> Optional[dict]:
+        """Device matching serial (and model, when given)."""
+        if model:
+            return self._by_key.get((serial, model))
+        same = self._by_serial.get(serial)
+        return same[0] if same else None
+
+    def ids(self) -> set:
+        return set(self._by_id)
+
+    @property
+    def search(self) -> DeviceIndex:
+        if self._search is None:
+            self._search = DeviceIndex(self._by_id.values())
+        return self._search
+
+    @property
+    def geo(self) -> GeoIndex:
+        if self._geo is None:
+            self._geo = GeoIndex(self._by_id.values())
+        return self._geo
+
+    # ---------- mutations ----------
+
+    def add(self, device: dict) -> dict:
+        self.devices.append(device)
+        self._index(device)
+        return device
+
+    def remove(self, device_id) -> Optional[dict]:
+        device = self._by_id.get(device_id)
+        if device is None:
+            return None
+        self._unindex(device)
+        self.devices.remove(device)
+        return device
+
+    def upsert(self, payload: dict) -> dict:
+        """Apply one API payload (create or refresh), no disk I/O."""
+        serial = payload.get("serial")
+        if not serial:
+            raise ValueError("Payload missing 'serial' – cannot upsert.")
+        model = payload.get("model")
+
+        existing = self.find(serial, model)
+
+        # default result shape in case refresh/create doesn't return flags
+        res = {
+            "status": "no_change",
+            "updated_fields": [],
+            "tamper_changed": False,
+            "tamper": None,
+            "connectivity_changed": False,
+            "connectivity": None,
+        }
+
+        if existing:
+            r = refresh_device_from_api(existing, payload) or {}
+            res.update(r)
+            action = res.get("status", "no_change")
+            if self._search is not None and INDEXED_FIELDS.intersection(res.get("updated_fields") or ()):
+                self._search.update(existing)
+            if self._geo is not None and {"lat", "lon"}.intersection(res.get("updated_fields") or ()):
+                self._geo.update(existing)
+        else:
+            new_dev = create_device_from_api(payload)
+            self.add(new_dev)
+            action = "created"
+            # Fill flags from the newly created device's current state
+            res.update({
+                "tamper": new_dev.get("tamper_status"),
+                "connectivity": new_dev.get("connectivity"),
+            })
+
+        # Preserve the original return contract but now include the refresh flags, too
+        return {
+            "action": action,
+            "serial": serial,
+            "id": (existing or new_dev).get("id"),
+            **res,
+        }
+
+    def reindex(self, device: dict) -> None:
+        """Call after editing a device by hand (id, serial_number, model, name, ...)."""
+        if self._search is not None:
+            self._search.update(device)
+        if self._geo is not None:
+            self._geo.update(device)
+        if self._keys.get(id(device)) == self._key_of(device):
+            return
+        self._unindex(device)
+        self._index(device)
+
+    # ---------- internals ----------
+
+    @staticmethod
+    def _key_of(d: dict) -> tuple:
+        return (d.get("id"), d.get("serial_number"), d.get("model"))
+
+    def _index(self, d: dict) -> None:
+        dev_id, serial, model = key = self._key_of(d)
+        self._keys[id(d)] = key
+        if dev_id:
+            self._by_id.setdefault(dev_id, d)
+            if self._by_id[dev_id] is d:
+                for index in (self._search, self._geo):
+                    if index is not None:
+                        index.update(d)
+        if serial is not None:
+            self._by_serial.setdefault(serial, []).append(d)
+            self._by_key.setdefault((serial, model), d)
+
+    def _unindex(self, d: dict) -> None:
+        key = self._keys.pop(id(d), None)
+        if key is None:
+            return
+        dev_id, serial, model = key
+        if dev_id and self._by_id.get(dev_id) is d:
+            del self._by_id[dev_id]
+            # another device may share the id; promote the earliest one
+            nxt = next((x for x in self.devices if x is not d and x.get("id") == dev_id), None)
+            if nxt is not None:
+                self._by_id[dev_id] = nxt
+            for index in (self._search, self._geo):
+                if index is None:
+                    continue
+                if nxt is not None:
+                    index.update(nxt)
+                else:
+                    index.remove(dev_id)
+        if serial is None:
+            return
+        same = [x for x in self._by_serial.get(serial, []) if x is not d]
+        if same:
+            self._by_serial[serial] = same
+        else:
+            self._by_serial.pop(serial, None)
+        if self._by_key.get((serial, model)) is d:
+            del self._by_key[(serial, model)]
+            nxt = next((x for x in same if x.get("model") == model), None)
+            if nxt is not None:
+                self._by_key[(serial, model)] = nxt
@@ -0,0 +1,240 @@
+# services/alert_engine.py
+import heapq
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from app_config import load_config, ALERT_RULES, ALERT_DEBOUNCE_MS, ALERT_HISTORY_MAX
+import utils
+
+# Alert rules are plain dicts; which key is present picks the condition:
+#     {"name": "tamper",        "field": "tamper_status", "equals": "TAMPERED"}
+#     {"name": "battery_low",   "field": "battery_pct",   "below": 15}
+#     {"name": "stale",         "field": "last_seen",     "older_than_s": 1800}
+#     {"name": "geofence_exit", "geofence": True}   # outside the op area of its kit_id
+# plus a "message" formatted with the device's fields ("battery {battery_pct}%").
+# An alert is raised when a rule starts to hold for a device, not while it keeps
+# holding; it can be raised again once the rule has stopped holding.
+
+
+def _rule_fields(rule: dict) -> set:
+    """Device fields whose change can flip the rule."""
+    if rule.get("geofence"):
+        return {"lat", "lon", "kit_id"}
+    return {rule.get("field")}
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return "?"
+
+
+class AlertHistory:
+    """
+    The last `maxlen` alerts, oldest first, indexed by device and by rule.
+    Each alert is a dict: {"seq", "ts", "device_id", "rule", "serial", "model", "message"}.
+    """
+
+    def __init__(self, maxlen: int = ALERT_HISTORY_MAX):
+        self.maxlen = maxlen
+        self._alerts: deque[dict] = deque()
+        self._by_device: dict[str, deque] = {}
+        self._by_rule: dict[str, deque] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def __iter__(self):
+        return iter(self._alerts)
+
+    def add(self, alert: dict) -> dict:
+        self._seq += 1
+        alert["seq"] = self._seq
+        self._alerts.append(alert)
+        self._by_device.setdefault(alert["device_id"], deque()).append(alert)
+        self._by_rule.setdefault(alert["rule"], deque()).append(alert)
+        while len(self._alerts) > self.maxlen:
+            old = self._alerts.popleft()
+            # the indexes are in the same (oldest first) order, so `old` is at their front
+            for index, key in ((self._by_device, old["device_id"]), (self._by_rule, old["rule"])):
+                q = index[key]
+                q.popleft()
+                if not q:
+                    del index[key]
+        return alert
+
+    def recent(self, n: Optional[int] = None) -> list[dict]:
+        """Newest first."""
+        n = len(self._alerts) if n is None else min(n, len(self._alerts))
+        return [self._alerts[-1 - i] for i in range(n)]
+
+    def for_device(self, device_id) -> list[dict]:
+        return list(self._by_device.get(device_id, ()))
+
+    def for_rule(self, name: str) -> list[dict]:
+        return list(self._by_rule.get(name, ()))
+
+    def clear(self):
+        self._alerts.clear()
+        self._by_device.clear()
+        self._by_rule.clear()
+
+
+class AlertEngine:
+    """
+    Evaluates alert rules against the devices a sync changed (the change
+    flags / updated_fields of registry.upsert results), so a poll costs
+    O(changed devices), not O(fleet):
+    - only the rules reading a changed field are re-checked for a device
+    - "older_than_s" rules can't wait for a change, so each device gets a
+      deadline on a heap and is re-checked when it comes due
+    - an alert is raised once per (device, rule) while the rule holds, and not
+      again within debounce_ms of the last one, so a flapping device stays quiet;
+      one that trips inside the window is re-checked when it ends
+    Raised alerts go into `history`. Call with the registry lock held.
+    """
+
+    def __init__(self, rules: Iterable[dict] = ALERT_RULES, debounce_ms: int = ALERT_DEBOUNCE_MS,
+                 history: Optional[AlertHistory] = None,
+                 fences: Callable[[], dict] = lambda: load_config().get("geofences") or {}):
+        self.debounce_s = debounce_ms / 1000
+        self.history = history if history is not None else AlertHistory()
+        self.fences = fences
+        self.set_rules(rules)
+
+    def set_rules(self, rules: Iterable[dict]):
+        self.rules = {r["name"]: r for r in rules if isinstance(r, dict) and r.get("name")}
+        self._by_field: dict[str, list[dict]] = {}
+        for r in self.rules.values():
+            for f in _rule_fields(r):
+                self._by_field.setdefault(f, []).append(r)
+        self._active: set[tuple] = set()           # (device id, rule) currently holding
+        self._last_raised: dict[tuple, float] = {}
+        self._deadlines: list[tuple] = []          # heap of (due, device id, rule): "older_than_s" rules, debounced re-trips
+        self._scheduled: set[tuple] = set()
+
+    # ---------- entry points ----------
+
+    def prime(self, registry, ids: Optional[Iterable] = None, now: Optional[float] = None):
+        """Take the devices' current state as the baseline, without raising (startup, imports)."""
+        ids = [d.get("id") for d in registry.devices] if ids is None else ids
+        self._check(registry, {i: self.rules.values() for i in ids if i}, now, quiet=True)
+
+    def evaluate(self, registry, changes: Iterable[dict], now: Optional[float] = None) -> list[dict]:
+        """Alerts raised by a sync's change-set (plus any "older_than_s" deadlines now due)."""
+        now = time.time() if now is None else now
+        todo: dict[str, dict] = {}
+        created = []
+        for res in changes:
+            dev_id = res.get("id")
+            if not dev_id or res.get("action") == "error":
+                continue
+            if res.get("action") == "created":
+                created.append(dev_id)
+                continue
+            fields = set(res.get("updated_fields") or ())
+            if res.get("tamper_changed"):
+                fields.add("tamper_status")
+            if res.get("connectivity_changed"):
+                fields.add("connectivity")
+            for f in fields:
+                for r in self._by_field.get(f, ()):
+                    todo.setdefault(dev_id, {})[r["name"]] = r
+
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, dev_id, name = heapq.heappop(self._deadlines)
+            self._scheduled.discard((dev_id, name))
+            if name in self.rules:
+                todo.setdefault(dev_id, {})[name] = self.rules[name]
+
+        # a device seen for the first time sets its baseline (as before: only changes alert)
+        self.prime(registry, created, now)
+        return self._check(registry, {i: r.values() for i, r in todo.items()}, now)
+
+    def forget(self, device_id):
+        """Drop a deleted device's rule state (its history stays)."""
+        for name in self.rules:
+            self._active.discard((device_id, name))
+            self._last_raised.pop((device_id, name), None)
+
+    # ---------- internals ----------
+
+    def _check(self, registry, todo: dict, now: Optional[float], quiet: bool = False) -> list[dict]:
+        now = time.time() if now is None else now
+        outside = self._outside_fences(registry, [i for i, rules in todo.items()
+                                                  if any(r.get("geofence") for r in rules)])
+        raised = []
+        for dev_id, rules in todo.items():
+            d = registry.get(dev_id)
+            if d is None:
+                continue
+            for rule in rules:
+                key = (dev_id, rule["name"])
+                if rule.get("geofence"):
+                    holds = dev_id in outside
+                else:
+                    holds = self._holds(rule, d, key, now)
+                if not holds:
+                    self._active.discard(key)
+                    continue
+                if key in self._active:
+                    continue
+                if quiet:
+                    self._active.add(key)
+                    continue
+                last = self._last_raised.get(key)
+                if last is not None and now - last < self.debounce_s:
+                    # tripped again too soon: not active yet, so re-check once the window is over
+                    heapq.heappush(self._deadlines, (last + self.debounce_s, *key))
+                    continue
+                self._active.add(key)
+                self._last_raised[key] = now
+                raised.append(self.history.add(self._alert(rule, d, now)))
+        return raised
+
+    def _holds(self, rule: dict, d: dict, key: tuple, now: float) -> bool:
+        value = d.get(rule.get("field"))
+        if "equals" in rule:
+            return value == rule["equals"]
+        if "below" in rule:
+            v = utils.to_float(value)
+            return v is not None and v < rule["below"]
+        if "older_than_s" in rule:
+            seen = utils.parse_iso_datetime(value)
+            if seen is None:
+                return False
+            due = seen.timestamp() + rule["older_than_s"]
+            if due <= now:
+                return True
+            # re-check when it would go stale; an earlier deadline already queued
+            # re-checks (and reschedules) anyway, so one entry per device is enough
+            if key not in self._scheduled:
+                self._scheduled.add(key)
+                heapq.heappush(self._deadlines, (due, *key))
+            return False
+        return False
+
+    def _outside_fences(self, registry, ids: list) -> set:
+        """Of `ids`, the positioned devices outside their kit's geofence."""
+        if not ids:
+            return set()
+        fences = self.fences()
+        by_kit: dict[str, list] = {}
+        for i in ids:
+            d = registry.get(i)
+            if d is not None and d.get("kit_id") in fences:
+                by_kit.setdefault(d["kit_id"], []).append(i)
+        out = set()
+        for kit_id, kit_ids in by_kit.items():
+            out |= registry.geo.outside_polygon(fences[kit_id], among=kit_ids)
+        return out
+
+    def _alert(self, rule: dict, d: dict, now: float) -> dict:
+        try:
+            text = (rule.get("message") or rule["name"]).format_map(_Fields(d))
+        except (ValueError, IndexError):
+            text = rule["name"]   # malformed template in the settings
+        model, serial = d.get("model") or "?", d.get("serial_number") or "?"
+        return {"ts": now, "device_id": d.get("id"), "rule": rule["name"],
+                "serial": serial, "model": model, "message": f"{model} {serial}: {text}"}
@@ -1,10 +1,16 @@
 # services/api_client.py
 import os
+import time
+import queue
+import random
+import threading
 import requests
-from app_config import load_config
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from app_config import load_config, config_version, FETCH_WORKERS, FETCH_BACKOFF_BASE_S, FETCH_BACKOFF_MAX_S
+from services.json_stream import JSONStream, decode_chunks, CHUNK_SIZE
+import utils
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
-_SESSION = requests.Session()
 _TIMEOUT = 8
 
 
@@ -16,42 +22,243 @@ MEDIA_BASE = os.getenv("OPTECH_MEDIA_BASE", "").rstrip("/")
 if not MEDIA_BASE:
     MEDIA_BASE = f"{API_URL}/images"
 
-def _auth_header():
-    # prefer value in settings over env default
-    cfg_token = (load_config().get("api_token") or "").strip()
-    token = (cfg_token or API_TOKEN).strip()
+
+def _bearer(token) -> dict:
+    token = (token or "").strip()
     if not token:
         return {}
-    return {"Authorization": token if token.lower().startswith("bearer ")
-            else f"Bearer {token}"}
+    return {"Authorization": token if token.lower().startswith("bearer ") else f"Bearer {token}"}
+
 
-def fetch_payloads() -> List[Dict[str, Any]]:
+class Endpoint:
     """
-    Fetch payloads from API_URL and always return a list of dicts.
-    - Uses a shared requests.Session for speed.
-    - Defensive JSON parsing (non-JSON => []).
-    - Normalizes {'results': [...]} and single-object dicts to a list.
+    One tracker API. Keeps its own requests.Session (connections stay alive
+    between polls), ETag/Last-Modified validators, delta cursor, and error
+    backoff: after n failures in a row it sits out polls for about
+    FETCH_BACKOFF_BASE_S * 2**(n-1) seconds (jittered, capped at FETCH_BACKOFF_MAX_S).
     """
-    headers = _auth_header()
-    try:
-        resp = _SESSION.get(API_URL, headers=headers, timeout=_TIMEOUT)
-        resp.raise_for_status()
-    except requests.RequestException:
-        return []
 
-    try:
-        data = resp.json()
-    except ValueError:
-        return []
+    def __init__(self, name: str, url: str, headers: dict, timeout_s: float = _TIMEOUT):
+        self.name = name
+        self.url = url
+        self.headers = headers
+        self.timeout_s = timeout_s
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        # revalidation state from the last full (200) response, and the newest
+        # payload timestamp seen so far (used for ?since= in delta mode)
+        self.validators = {"etag": None, "last_modified": None}
+        self.last_seen = {"ts": None, "dt": None}
+        self.failures = 0
+        self.retry_at = 0.0
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+
+    def reset(self):
+        """Forget validators and the delta cursor."""
+        self.validators.update(etag=None, last_modified=None)
+        self.last_seen.update(ts=None, dt=None)
+
+    def due(self, now: float) -> bool:
+        return now >= self.retry_at
+
+    def iter_fetch(self, delta: bool) -> Iterator[Dict[str, Any]]:
+        """
+        This endpoint's payloads, tagged with "source", decoded one at a time
+        from the response body as it arrives (gzip/deflate included), so the
+        body is never held whole. Nothing on a 304; a failure, even part-way
+        through, ends the stream (see .error). Validators and the delta cursor
+        only move once the whole response has been read.
+        """
+        headers = {}
+        if self.validators["etag"]:
+            headers["If-None-Match"] = self.validators["etag"]
+        if self.validators["last_modified"]:
+            headers["If-Modified-Since"] = self.validators["last_modified"]
+        params = {"since": self.last_seen["ts"]} if (delta and self.last_seen["ts"]) else None
+
+        t0 = time.monotonic()
+        try:
+            with self.session.get(self.url, headers=headers, params=params,
+                                  timeout=self.timeout_s, stream=True) as resp:
+                if resp.status_code == 304:
+                    self._succeeded(t0)
+                    return
+                resp.raise_for_status()
+                items = JSONStream(decode_chunks(resp.iter_content(CHUNK_SIZE))).results()
+                for p in _track_newest(items, self.last_seen, drop_seen=delta):
+                    p["source"] = self.name
+                    yield p
+        except (requests.RequestException, ValueError) as e:
+            self._failed(e, t0)
+            return
+
+        self.validators["etag"] = resp.headers.get("ETag")
+        self.validators["last_modified"] = resp.headers.get("Last-Modified")
+        self._succeeded(t0)
+
+    def _succeeded(self, t0: float):
+        self.latency_ms = (time.monotonic() - t0) * 1000
+        self.failures, self.retry_at, self.error = 0, 0.0, None
+
+    def _failed(self, e: Exception, t0: float):
+        now = time.monotonic()
+        self.latency_ms = (now - t0) * 1000
+        self.failures += 1
+        self.error = str(e) or e.__class__.__name__
+        delay = min(FETCH_BACKOFF_BASE_S * 2 ** (self.failures - 1), FETCH_BACKOFF_MAX_S)
+        self.retry_at = now + delay * random.uniform(0.5, 1.0)
+
+
+# Endpoints derived from settings, rebuilt only when the config changes
+_ENDPOINTS = {"version": None, "list": []}
+_POOL: Optional[ThreadPoolExecutor] = None
+
+def endpoints() -> List[Endpoint]:
+    """
+    api_url/api_token from settings (falling back to the env defaults), plus
+    each entry of the "endpoints" setting:
+        [{"name": "op-north", "url": "...", "token": "...", "timeout_s": 8}, ...]
+    An endpoint whose url and auth haven't changed keeps its session and state.
+    """
+    version = config_version()
+    if _ENDPOINTS["version"] != version:
+        cfg = load_config()
+        specs = [{"name": "default",
+                  "url": (cfg.get("api_url") or "").strip() or API_URL,
+                  "token": (cfg.get("api_token") or "").strip() or API_TOKEN}]
+        specs += [e for e in cfg.get("endpoints") or () if isinstance(e, dict) and (e.get("url") or "").strip()]
+
+        old = {(ep.url, tuple(sorted(ep.headers.items()))): ep for ep in _ENDPOINTS["list"]}
+        eps, urls = [], set()
+        for spec in specs:
+            url, headers = spec["url"].strip().rstrip("/"), _bearer(spec.get("token"))
+            if url in urls:
+                continue
+            urls.add(url)
+            ep = old.pop((url, tuple(sorted(headers.items()))), None) or Endpoint(url, url, headers)
+            ep.name = (spec.get("name") or "").strip() or url
+            ep.timeout_s = utils.to_float(spec.get("timeout_s"), _TIMEOUT)
+            eps.append(ep)
+        for ep in old.values():
+            ep.session.close()
+        _ENDPOINTS.update(version=version, list=eps)
+    return _ENDPOINTS["list"]
+
+def reset_fetch_state():
+    """Forget every endpoint's ETag/Last-Modified and delta cursor."""
+    for ep in endpoints():
+        ep.reset()
+
+def endpoint_status() -> List[Dict[str, Any]]:
+    """Per endpoint: name, url, last error (None if the last fetch worked), latency and backoff."""
+    now = time.monotonic()
+    return [{"name": ep.name, "url": ep.url, "error": ep.error, "failures": ep.failures,
+             "latency_ms": ep.latency_ms, "retry_in_s": max(0.0, ep.retry_at - now)}
+            for ep in endpoints()]
 
-    # Normalize to list
-    if isinstance(data, dict) and "results" in data:
-        data = data["results"]
+def fetch_payloads(delta: bool | None = None) -> List[Dict[str, Any]]:
+    """
+    Fetch payloads from every configured endpoint and return one list of
+    dicts, each tagged with "source" (the endpoint's name).
+    - Endpoints are fetched concurrently on a small thread pool, so a poll
+      takes as long as the slowest endpoint, not the sum.
+    - Each revalidates with If-None-Match / If-Modified-Since; a 304 adds
+      nothing, so nothing downstream touches the store.
+    - delta=True (or "delta_fetch" in settings) sends ?since=<newest timestamp
+      seen from that endpoint> and drops anything not newer, in case the
+      server ignores it.
+    - A failing endpoint (network error, HTTP error, non-JSON) adds nothing
+      and is backed off; the others are unaffected. See endpoint_status().
+    - Accepts {'results': [...]}, a bare list, or a single object.
+    See iter_payloads() to process a large fleet without holding it all.
+    """
+    return list(iter_payloads(delta))
 
-    if isinstance(data, list):
-        return [d for d in data if isinstance(d, dict)]
+def iter_payloads(delta: bool | None = None, batch_size: int = 256) -> Iterator[Dict[str, Any]]:
+    """
+    fetch_payloads() as a generator: payloads come out as they're decoded, so
+    memory holds the items in flight rather than whole responses. With several
+    endpoints due, each is read on the pool and handed over `batch_size` at a
+    time through a small queue (each endpoint's payloads stay in order; the
+    endpoints interleave). Closing the generator early stops the readers.
+    """
+    global _POOL
+    if delta is None:
+        delta = bool(load_config().get("delta_fetch"))
 
-    if isinstance(data, dict):
-        return [data]
+    now = time.monotonic()
+    due = [ep for ep in endpoints() if ep.due(now)]
+    if len(due) <= 1:
+        for ep in due:
+            yield from ep.iter_fetch(delta)
+        return
 
-    return []
+    if _POOL is None:
+        _POOL = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+    out: "queue.Queue[Optional[list]]" = queue.Queue(maxsize=2 * len(due))
+    stop = threading.Event()
+    crashed = []
+
+    def put(item) -> bool:
+        # give up once the consumer has gone, rather than block on a full queue
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def pump(ep: Endpoint):
+        if stop.is_set():
+            return   # consumer gone before this endpoint's turn on the pool
+        stream = ep.iter_fetch(delta)
+        batch = []
+        try:
+            for p in stream:
+                batch.append(p)
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch:
+                put(batch)
+        except Exception as e:
+            crashed.append(e)
+        finally:
+            stream.close()
+            put(None)
+
+    for ep in due:
+        _POOL.submit(pump, ep)
+    pending = len(due)
+    try:
+        while pending:
+            batch = out.get()
+            if batch is None:
+                pending -= 1
+                continue
+            yield from batch
+    finally:
+        stop.set()
+    if crashed:
+        raise crashed[0]
+
+def _track_newest(payloads: Iterable, last_seen: dict, drop_seen: bool) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the dict payloads, optionally dropping those not newer than the
+    endpoint's delta cursor; the cursor advances once `payloads` is exhausted.
+    """
+    cursor = last_seen["dt"]
+    newest_ts, newest_dt = last_seen["ts"], cursor
+    for p in payloads:
+        if not isinstance(p, dict):
+            continue
+        dt = utils.parse_iso_datetime(p.get("timestamp"))
+        if dt is not None and (newest_dt is None or dt > newest_dt):
+            newest_ts, newest_dt = p.get("timestamp"), dt
+        if drop_seen and cursor is not None and dt is not None and dt <= cursor:
+            continue
+        yield p
+    last_seen.update(ts=newest_ts, dt=newest_dt)
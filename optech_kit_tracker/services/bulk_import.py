@@ -0,0 +1,175 @@
+# services/bulk_import.py
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+from app_config import IMPORT_WORKERS, IMPORT_BATCH_SIZE
+from services import json_stream
+
+IMPORT_SUFFIXES = (".json", ".jsonl", ".ndjson")
+
+
+def list_import_files(dir_path: Union[str, Path]) -> list[Path]:
+    """Payload files in a folder, in name order."""
+    return sorted(p for p in Path(dir_path).iterdir() if p.suffix.lower() in IMPORT_SUFFIXES and p.is_file())
+
+
+class BulkImport:
+    """
+    Imports payload files (a JSON object, a JSON array, or JSON lines) into a
+    registry:
+    - files are read and decoded incrementally on a thread pool, in batches of
+      `batch_size` payloads through a small queue per file, so memory stays
+      bounded by the batches in flight rather than file size
+    - batches are applied in file order (same result as importing the files
+      one by one), each under `lock`
+    - everything touched is persisted with one stage_changes() at the end,
+      written after `lock` is released
+
+    run() blocks; start() runs it on a daemon thread and `progress` /
+    `finished` can be polled from the Tk thread.
+    """
+
+    def __init__(self, paths: Iterable, registry, stage_changes: Callable, lock=None,
+                 workers: int = IMPORT_WORKERS, batch_size: int = IMPORT_BATCH_SIZE):
+        self.paths = [Path(p) for p in paths]
+        self.registry = registry
+        self.stage_changes = stage_changes
+        self.lock = lock if lock is not None else threading.RLock()
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.summary = {"created": 0, "updated": 0, "no_change": 0, "error": 0}
+        self.errors: list[str] = []
+        self.changes: list[dict] = []     # one merged upsert result per device touched
+        self.failed: Optional[str] = None # set if the import stopped early (e.g. the save failed)
+        self.finished = threading.Event()
+        self._cancel = threading.Event()
+        self._read = [0] * len(self.paths)
+        self._files_done = 0
+        self._payloads = 0
+        self._total_bytes = 0
+        for p in self.paths:
+            try:
+                self._total_bytes += os.path.getsize(p)
+            except OSError:
+                pass
+
+    @property
+    def progress(self) -> dict:
+        return {
+            "files": len(self.paths), "files_done": self._files_done, "payloads": self._payloads,
+            "bytes_read": sum(self._read), "total_bytes": self._total_bytes,
+        }
+
+    def start(self) -> "BulkImport":
+        threading.Thread(target=self.run, name="bulk-import", daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    # ---------- pipeline ----------
+
+    def _parse(self, i: int, path: Path, out: queue.Queue):
+        """Worker: stream one file into `out` as ("batch", [...]) / ("error", msg), then ("done", None)."""
+        def counted(n):
+            self._read[i] = n
+
+        batch = []
+        try:
+            for item in json_stream.iter_file(path, on_bytes=counted):
+                if self._cancel.is_set():
+                    return
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    out.put(("batch", batch))
+                    batch = []
+            if batch:
+                out.put(("batch", batch))
+        except Exception as e:
+            if batch:
+                out.put(("batch", batch))
+            out.put(("error", f"{path.name}: {e}"))
+        finally:
+            out.put(("done", None))
+
+    def run(self) -> "BulkImport":
+        queues = [queue.Queue(maxsize=4) for _ in self.paths]
+        merged: dict[str, dict] = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import") as pool:
+                for i, (path, q) in enumerate(zip(self.paths, queues)):
+                    pool.submit(self._parse, i, path, q)
+                try:
+                    for q in queues:
+                        self._consume(q, merged)
+                        self._files_done += 1
+                finally:
+                    # unblock workers still putting into full queues (each puts at most
+                    # a batch, an error and "done" after seeing the cancel flag)
+                    self._cancel.set()
+                    for q in queues:
+                        while not q.empty():
+                            q.get_nowait()
+
+            write = None
+            with self.lock:
+                changed = [d for d in (self.registry.get(i) for i in merged) if d is not None]
+                if changed:
+                    write = self.stage_changes(self.registry.devices, changed=changed)
+            if write is not None:
+                write()
+            self.changes = list(merged.values())
+        except Exception as e:
+            self.failed = str(e)
+        finally:
+            self.finished.set()
+        return self
+
+    def _consume(self, q: queue.Queue, merged: dict):
+        while True:
+            kind, item = q.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                self._error(item)
+                continue
+            with self.lock:
+                results = [self._upsert(p) for p in item]
+            self._payloads += len(item)
+            for res in results:
+                self.summary[res["action"]] = self.summary.get(res["action"], 0) + 1
+                if res["action"] == "error":
+                    self._error(f"{res.get('serial') or '?'}: {res.get('error')}")
+                elif res.get("id"):
+                    _merge(merged, res)
+
+    def _error(self, msg: str):
+        # an archive full of bad payloads shouldn't hold every message (summary["error"] counts them all)
+        if len(self.errors) < 100:
+            self.errors.append(msg)
+
+    def _upsert(self, payload) -> dict:
+        try:
+            return self.registry.upsert(payload)
+        except Exception as e:
+            serial = payload.get("serial") if isinstance(payload, dict) else None
+            return {"action": "error", "serial": serial, "error": str(e)}
+
+
+def _merge(merged: dict, res: dict):
+    """Fold several results for one device into one change-set entry."""
+    m = merged.get(res["id"])
+    if m is None:
+        merged[res["id"]] = {**res, "updated_fields": list(res.get("updated_fields") or ())}
+        return
+    fields = m["updated_fields"]
+    fields.extend(f for f in res.get("updated_fields") or () if f not in fields)
+    if m["action"] != "created" and res["action"] != "no_change":
+        m["action"] = res["action"]
+    for flag in ("tamper_changed", "connectivity_changed"):
+        m[flag] = bool(m.get(flag) or res.get(flag))
+    m["tamper"], m["connectivity"] = res.get("tamper"), res.get("connectivity")
@@ -0,0 +1,188 @@
+# services/capture_pool.py
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from app_config import CAPTURE_IDLE_TIMEOUT_S
+
+
+def open_cv2_capture(url: str):
+    """Default source: an OpenCV VideoCapture (FFmpeg backend for RTSP)."""
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("OpenCV (cv2) is not installed. Run: pip install opencv-python")
+    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(url)
+    return cap
+
+
+class _CaptureWorker:
+    """
+    Keeps one stream open and decodes continuously so `frame` is always the
+    newest picture (RTSP buffers otherwise hand back stale frames). Stops
+    after `idle_timeout_s` without a snapshot request. Once it has stopped
+    (`done`) its frames are never handed out; the pool starts a new worker.
+    """
+
+    def __init__(self, url: str, open_capture: Callable, idle_timeout_s: float):
+        self.url = url
+        self.open_capture = open_capture
+        self.idle_timeout_s = idle_timeout_s
+        self.frame = None
+        self.frame_ts: Optional[float] = None
+        self.error: Optional[str] = None
+        self.last_used = time.monotonic()
+        self.done = False
+        self._lock = threading.Lock()   # makes "idle, so stop" and a new request exclusive
+        self._has_frame = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"capture:{url}", daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self, timeout_s: float):
+        """Newest frame, or None if none came in time or this worker has stopped."""
+        with self._lock:
+            if self.done:
+                return None
+            self.last_used = time.monotonic()
+        self._has_frame.wait(timeout_s)
+        with self._lock:
+            return None if self.done else self.frame
+
+    def _idle(self) -> bool:
+        with self._lock:
+            if time.monotonic() - self.last_used > self.idle_timeout_s:
+                self.done = True
+            return self.done
+
+    def _run(self):
+        is_file = os.path.exists(self.url)
+        cap, failures = None, 0
+        try:
+            while not self._stop.is_set():
+                if self._idle():
+                    break
+                if cap is None:
+                    try:
+                        cap = self.open_capture(self.url)
+                    except Exception as e:
+                        self.error = str(e)
+                        break
+                    if not cap.isOpened():
+                        self.error = "Could not open stream (check URL/credentials/camera)"
+                        cap = None
+                        if self._stop.wait(min(2 ** failures, 10)):
+                            break
+                        failures += 1
+                        continue
+                    fps = 0.0
+                    try:
+                        fps = float(cap.get(5))   # cv2.CAP_PROP_FPS
+                    except Exception:
+                        pass
+                    # files decode as fast as we ask: pace them like a live feed
+                    frame_gap = (1.0 / fps if fps > 0 else 0.04) if is_file else 0.0
+
+                ok, frame = cap.read()
+                if ok and frame is not None:
+                    self.frame, self.frame_ts, self.error = frame, time.time(), None
+                    self._has_frame.set()
+                    failures = 0
+                    if frame_gap:
+                        self._stop.wait(frame_gap)
+                    continue
+
+                failures += 1
+                # a failed read can return at once: don't spin on it
+                if self._stop.wait(min(0.01 * failures, 0.25)):
+                    break
+                if is_file:
+                    # loop local test clips
+                    try:
+                        cap.set(1, 0)   # cv2.CAP_PROP_POS_FRAMES
+                    except Exception:
+                        pass
+                if failures > 25:
+                    # stream dropped: reopen with a short backoff
+                    self.error = "Couldn't read a frame (check codec/network)"
+                    cap.release()
+                    cap = None
+                    if self._stop.wait(min(2 ** (failures - 25), 10)):
+                        break
+        finally:
+            with self._lock:
+                self.done = True
+            if cap is not None:
+                try:
+                    cap.release()
+                except Exception:
+                    pass
+            self._has_frame.set()   # wake anyone still waiting
+
+
+class CapturePool:
+    """
+    Long-lived capture workers keyed by stream URL. The first snapshot of a
+    stream waits for its first frame; later ones return the newest decoded
+    frame straight from memory.
+    `open_capture(url)` returns a cv2.VideoCapture-like object (isOpened/read/
+    get/set/release) — swap it for a synthetic source in tests.
+    """
+
+    def __init__(self, idle_timeout_s: float = CAPTURE_IDLE_TIMEOUT_S,
+                 open_capture: Callable = open_cv2_capture):
+        self.idle_timeout_s = idle_timeout_s
+        self.open_capture = open_capture
+        self._workers: dict[str, _CaptureWorker] = {}
+        self._lock = threading.Lock()
+
+    def _worker(self, url: str) -> _CaptureWorker:
+        with self._lock:
+            for u in [u for u, w in self._workers.items() if w.done or not w.alive]:
+                del self._workers[u]
+            w = self._workers.get(url)
+            if w is None:
+                w = self._workers[url] = _CaptureWorker(url, self.open_capture, self.idle_timeout_s)
+            return w
+
+    def snapshot(self, url: str, timeout_s: float = 10):
+        """Newest frame for `url` (an ndarray from cv2); raises RuntimeError if none arrives."""
+        w = self._worker(url)
+        frame = w.latest(timeout_s)
+        if frame is None and w.done and not w.error and not w._stop.is_set():
+            # it went idle just as we asked: its last frame is stale, start afresh
+            w = self._worker(url)
+            frame = w.latest(timeout_s)
+        if frame is None:
+            raise RuntimeError(w.error or "Timed out waiting for a frame from the stream")
+        return frame
+
+    def snapshot_jpeg(self, url: str, timeout_s: float = 10, quality: int = 90) -> bytes:
+        import cv2
+        ok, buf = cv2.imencode(".jpg", self.snapshot(url, timeout_s), [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ok:
+            raise RuntimeError("Failed to encode JPG")
+        return buf.tobytes()
+
+    def streams(self) -> list[str]:
+        with self._lock:
+            return [u for u, w in self._workers.items() if w.alive and not w.done]
+
+    def close(self, url: Optional[str] = None):
+        """Stop one stream's worker, or all of them."""
+        with self._lock:
+            targets = [url] if url else list(self._workers)
+            for u in targets:
+                w = self._workers.pop(u, None)
+                if w is not None:
+                    w.stop()
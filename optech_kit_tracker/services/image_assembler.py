@@ -0,0 +1,223 @@
+# services/image_assembler.py
+import base64
+import binascii
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from app_config import IMAGE_BUFFER_MAX_BYTES, IMAGE_PARTIAL_TTL_S
+from utils import safe_filename as _safe
+
+IMAGES_DIR = Path(__file__).resolve().parent.parent.joinpath("storage", "images")
+
+
+class _Partial:
+    __slots__ = ("device_id", "image_id", "fmt", "total", "checksum", "fragments", "nbytes", "updated")
+
+    def __init__(self, device_id, image_id, fmt, total, checksum):
+        self.device_id = device_id
+        self.image_id = image_id
+        self.fmt = fmt
+        self.total = total
+        self.checksum = checksum
+        self.fragments: dict[int, bytes] = {}
+        self.nbytes = 0
+        self.updated = time.monotonic()
+
+    def ordered(self) -> Optional[list]:
+        """Fragments in order once all of them are in (0- or 1-based numbering), else None."""
+        if len(self.fragments) != self.total:
+            return None
+        lo = min(self.fragments)
+        if lo not in (0, 1) or max(self.fragments) != lo + self.total - 1:
+            return None
+        return [self.fragments[i] for i in range(lo, lo + self.total)]
+
+
+class ImageAssembler:
+    """
+    Rebuilds images from `image_fragment` payloads:
+        {"type": "image_fragment", "id", "fragment", "total_fragments",
+         "format", "size_kb", "checksum", "data": <base64 fragment bytes>}
+
+    Fragments are buffered per image id, bounded by `max_bytes` across all
+    partial images (least recently fed dropped first) and by `ttl_s` of
+    inactivity. A complete image is CRC32-checked incrementally and streamed
+    to disk fragment by fragment, so it's never joined in memory.
+
+    The API doesn't send fragment bytes yet; fragments without "data" are
+    only counted (see progress()).
+    """
+
+    def __init__(self, out_dir: Path = IMAGES_DIR, max_bytes: int = IMAGE_BUFFER_MAX_BYTES,
+                 ttl_s: float = IMAGE_PARTIAL_TTL_S):
+        self.out_dir = Path(out_dir)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._partials: dict[tuple, _Partial] = {}   # (device_id, image_id) -> partial, oldest first
+        self._buffered = 0
+        self._latest: dict[str, dict] = {}           # device_id -> latest completed image
+        self._missing: set[str] = set()              # device_ids with no image on disk (until one is written)
+        self._seen: dict[str, dict] = {}             # device_id -> {"image_id", "fragments": set, "total"}
+        self.stats = {"completed": 0, "bad_checksum": 0, "evicted": 0}
+
+    # ---------- feeding ----------
+
+    def feed(self, payloads, results) -> list[dict]:
+        """Feed API payloads alongside their upsert results; returns images completed."""
+        done = []
+        for p, res in zip(payloads, results):
+            if res.get("action") == "error" or not res.get("id"):
+                continue
+            inner = (p or {}).get("payload") or {}
+            if (inner.get("type") or "").lower() != "image_fragment":
+                continue
+            img = self.add_fragment(res["id"], inner)
+            if img:
+                done.append(img)
+        return done
+
+    def add_fragment(self, device_id: str, frag: dict) -> Optional[dict]:
+        """Buffer one fragment; returns the image record if it completed an image."""
+        image_id = frag.get("id")
+        try:
+            index = int(frag.get("fragment"))
+            total = int(frag.get("total_fragments"))
+        except (TypeError, ValueError):
+            return None
+        if not image_id or total <= 0:
+            return None
+
+        with self._lock:
+            seen = self._seen.get(device_id)
+            if seen is None or seen["image_id"] != image_id:
+                seen = self._seen[device_id] = {"image_id": image_id, "fragments": set(), "total": total}
+            seen["fragments"].add(index)
+
+            data = self._decode(frag.get("data"))
+            if data is None:
+                return None
+
+            key = (device_id, image_id)
+            part = self._partials.pop(key, None)
+            if part is None:
+                part = _Partial(device_id, image_id, (frag.get("format") or "bin").lower(),
+                                total, (frag.get("checksum") or "").lower())
+            self._partials[key] = part   # re-insert: dict order doubles as LRU order
+            part.updated = time.monotonic()
+            if index not in part.fragments:
+                part.fragments[index] = data
+                part.nbytes += len(data)
+                self._buffered += len(data)
+
+            ordered = part.ordered()
+            if ordered is None:
+                self._evict(keep=key)
+                return None
+            del self._partials[key]
+            self._buffered -= part.nbytes
+
+        return self._finish(part, ordered)
+
+    @staticmethod
+    def _decode(data) -> Optional[bytes]:
+        if not data:
+            return None
+        if isinstance(data, (bytes, bytearray)):
+            return bytes(data)
+        try:
+            return base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+
+    def _finish(self, part: _Partial, ordered: list) -> Optional[dict]:
+        crc = 0
+        for chunk in ordered:
+            crc = zlib.crc32(chunk, crc)
+        if part.checksum and f"{crc & 0xFFFFFFFF:08x}" != part.checksum:
+            with self._lock:
+                self.stats["bad_checksum"] += 1
+            return None
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        path = self.out_dir / f"{_safe(part.device_id)}__{_safe(part.image_id)}.{_safe(part.fmt)}"
+        tmp = path.with_suffix(path.suffix + ".part")
+        with open(tmp, "wb") as fh:
+            fh.writelines(ordered)
+        os.replace(tmp, path)
+
+        img = {"device_id": part.device_id, "image_id": part.image_id, "format": part.fmt,
+               "path": path, "bytes": sum(len(c) for c in ordered), "completed": time.time()}
+        with self._lock:
+            self._latest[part.device_id] = img
+            self._missing.discard(part.device_id)
+            self.stats["completed"] += 1
+        return img
+
+    # ---------- eviction ----------
+
+    def _evict(self, keep=None):
+        """Drop stale partials, then the least recently fed ones while over budget (lock held)."""
+        cutoff = time.monotonic() - self.ttl_s
+        for key in [k for k, p in self._partials.items() if p.updated < cutoff and k != keep]:
+            self._drop(key)
+        for key in list(self._partials):
+            if self._buffered <= self.max_bytes:
+                break
+            if key != keep:
+                self._drop(key)
+
+    def _drop(self, key):
+        part = self._partials.pop(key)
+        self._buffered -= part.nbytes
+        self.stats["evicted"] += 1
+
+    def evict_stale(self):
+        with self._lock:
+            self._evict()
+
+    # ---------- queries ----------
+
+    def latest(self, device_id: str) -> Optional[dict]:
+        """
+        Latest completed image for a device (falls back to what's on disk from
+        earlier runs). A device found to have none isn't looked up on disk
+        again until this assembler writes one for it.
+        """
+        with self._lock:
+            img = self._latest.get(device_id)
+            if img is None and device_id in self._missing:
+                return None
+        if img is not None and img["path"].exists():
+            return img
+        try:
+            files = [p for p in self.out_dir.glob(f"{_safe(device_id)}__*") if p.suffix != ".part"]
+        except OSError:
+            files = []
+        if not files:
+            with self._lock:
+                if device_id not in self._latest:
+                    self._missing.add(device_id)
+            return None
+        path = max(files, key=lambda p: p.stat().st_mtime)
+        image_id = path.stem.split("__", 1)[-1]
+        img = {"device_id": device_id, "image_id": image_id, "format": path.suffix.lstrip("."),
+               "path": path, "bytes": path.stat().st_size, "completed": path.stat().st_mtime}
+        with self._lock:
+            self._latest[device_id] = img
+        return img
+
+    def progress(self, device_id: str) -> Optional[tuple]:
+        """(image_id, fragments seen, total) for the image a device is currently sending."""
+        with self._lock:
+            seen = self._seen.get(device_id)
+            if seen is None:
+                return None
+            return seen["image_id"], len(seen["fragments"]), seen["total"]
+
+    def buffered_bytes(self) -> int:
+        return self._buffered
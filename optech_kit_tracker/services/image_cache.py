@@ -0,0 +1,187 @@
+# services/image_cache.py
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app_config import IMAGE_CACHE_MAX_BYTES, IMAGE_CACHE_MEM_ITEMS, THUMBNAIL_SIZE
+from utils import safe_filename
+
+CACHE_DIR = Path(__file__).resolve().parent.parent.joinpath("storage", "cache")
+
+
+class ImageCache:
+    """
+    Device images keyed by (device_id, captured_ms):
+    - on disk: <device>__<captured_ms>.jpg plus a .thumb.jpg made once at insert,
+      evicted least-recently-used first once the folder passes `max_bytes`
+    - in memory: the last `mem_items` thumbnails used, as PIL images
+
+    Needs Pillow; without it every call is a no-op returning None.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 mem_items: int = IMAGE_CACHE_MEM_ITEMS, thumb_size: tuple = THUMBNAIL_SIZE):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.mem_items = mem_items
+        self.thumb_size = thumb_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()   # key -> entry, least recently used first
+        self._by_device: dict[str, list] = {}                       # device_id -> keys, oldest capture first
+        self._thumbs: "OrderedDict[tuple, object]" = OrderedDict()  # key -> PIL thumbnail
+        self._bytes = 0
+        self._scanned = False
+
+    # ---------- writes ----------
+
+    def put_frame(self, device_id: str, frame, captured: Optional[float] = None) -> Optional[dict]:
+        """Store a BGR frame (as returned by cv2)."""
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        return self._put(device_id, Image.fromarray(frame[:, :, ::-1]), captured)
+
+    def put_file(self, device_id: str, path, captured: Optional[float] = None) -> Optional[dict]:
+        """Store an image file in any format Pillow reads (e.g. a reassembled BMP)."""
+        try:
+            from PIL import Image
+            with Image.open(path) as img:
+                img.load()
+                return self._put(device_id, img, captured if captured is not None else os.path.getmtime(path))
+        except Exception:
+            return None
+
+    def _put(self, device_id: str, img, captured: Optional[float]) -> dict:
+        self._scan()
+        captured_ms = int((captured if captured is not None else time.time()) * 1000)
+        key = (device_id, captured_ms)
+        self.root.mkdir(parents=True, exist_ok=True)
+        stem = f"{safe_filename(device_id)}__{captured_ms}"
+        path, thumb_path = self.root / f"{stem}.jpg", self.root / f"{stem}.thumb.jpg"
+
+        img = img.convert("RGB")
+        thumb = img.copy()
+        thumb.thumbnail(self.thumb_size)
+        for im, dest in ((img, path), (thumb, thumb_path)):
+            buf = io.BytesIO()
+            im.save(buf, "JPEG", quality=90 if im is img else 80)
+            tmp = dest.with_suffix(".part")
+            tmp.write_bytes(buf.getvalue())
+            os.replace(tmp, dest)
+
+        entry = {"device_id": device_id, "captured_ms": captured_ms, "path": path, "thumb_path": thumb_path,
+                 "bytes": path.stat().st_size + thumb_path.stat().st_size}
+        with self._lock:
+            self._add(key, entry)
+            self._remember_thumb(key, thumb)
+            self._evict(keep=key)
+        return entry
+
+    # ---------- reads ----------
+
+    def latest(self, device_id: str) -> Optional[dict]:
+        """Newest cached image for a device."""
+        self._scan()
+        with self._lock:
+            keys = self._by_device.get(device_id)
+            if not keys:
+                return None
+            self._entries.move_to_end(keys[-1])
+            return self._entries[keys[-1]]
+
+    def thumbnail(self, device_id: str):
+        """PIL thumbnail of the device's newest image (memory first, then its .thumb.jpg)."""
+        entry = self.latest(device_id)
+        if entry is None:
+            return None
+        key = (entry["device_id"], entry["captured_ms"])
+        with self._lock:
+            thumb = self._thumbs.get(key)
+            if thumb is not None:
+                self._thumbs.move_to_end(key)
+                return thumb
+        try:
+            from PIL import Image
+            with Image.open(entry["thumb_path"]) as im:
+                im.load()
+                thumb = im.copy()
+        except Exception:
+            return None
+        with self._lock:
+            self._remember_thumb(key, thumb)
+        return thumb
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    # ---------- internals (lock held unless noted) ----------
+
+    def _add(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old["bytes"]
+        else:
+            keys = self._by_device.setdefault(key[0], [])
+            keys.append(key)
+            if len(keys) > 1 and keys[-2][1] > key[1]:
+                keys.sort(key=lambda k: k[1])
+        self._entries[key] = entry
+        self._bytes += entry["bytes"]
+
+    def _remember_thumb(self, key, thumb):
+        self._thumbs[key] = thumb
+        self._thumbs.move_to_end(key)
+        while len(self._thumbs) > self.mem_items:
+            self._thumbs.popitem(last=False)
+
+    def _evict(self, keep=None):
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self._entries.pop(key)
+            self._bytes -= entry["bytes"]
+            self._thumbs.pop(key, None)
+            keys = self._by_device.get(key[0], [])
+            if key in keys:
+                keys.remove(key)
+            if not keys:
+                self._by_device.pop(key[0], None)
+            for p in (entry["path"], entry["thumb_path"]):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def _scan(self):
+        """Index what earlier runs left on disk, once (oldest-modified = least recently used)."""
+        if self._scanned:
+            return
+        with self._lock:
+            if self._scanned:
+                return
+            self._scanned = True
+            try:
+                files = sorted(self.root.glob("*__*.jpg"), key=lambda p: p.stat().st_mtime)
+            except OSError:
+                return
+            by_id = {}
+            for p in files:
+                if p.name.endswith(".thumb.jpg"):
+                    continue
+                thumb = p.with_name(p.stem + ".thumb.jpg")
+                dev_safe, _, ms = p.stem.rpartition("__")
+                if not ms.isdigit() or not thumb.exists():
+                    continue
+                by_id[p] = {"device_id": dev_safe, "captured_ms": int(ms), "path": p, "thumb_path": thumb,
+                            "bytes": p.stat().st_size + thumb.stat().st_size}
+            for entry in by_id.values():
+                # file names carry the filesystem-safe id, which is the id for ordinary device ids
+                self._add((entry["device_id"], entry["captured_ms"]), entry)
+            self._evict()
@@ -0,0 +1,182 @@
+# services/json_stream.py
+import codecs
+import json
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+# Incremental JSON decoding for inputs too big to hold as one string: text
+# arrives in chunks and each value is decoded with JSONDecoder.raw_decode as
+# soon as it's complete, so only the value being decoded is buffered.
+
+CHUNK_SIZE = 64 * 1024
+MAX_VALUE_CHARS = 32 * 1024 * 1024   # one value buffered past this is treated as malformed input
+_NOT_WS = re.compile(r"[^ \t\r\n]")
+_decoder = json.JSONDecoder()
+
+
+class JSONStream:
+    """
+    Pull parser over text chunks. values() yields what a payload file holds:
+    the elements of a top-level array, else each top-level value in turn
+    (a single object, or JSON lines / concatenated JSON).
+    """
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_chars: int = 1) -> bool:
+        """Append at least min_chars more input (dropping what's consumed); False at end of input."""
+        if self._eof:
+            return False
+        parts, got = [self._buf[self._pos:]], 0
+        for chunk in self._chunks:
+            parts.append(chunk)
+            got += len(chunk)
+            if got >= min_chars:
+                break
+        else:
+            self._eof = True
+        if not got:
+            return False
+        self._buf, self._pos = "".join(parts), 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character, not consumed; "" at end of input."""
+        while True:
+            m = _NOT_WS.search(self._buf, self._pos)
+            if m:
+                self._pos = m.start()
+                return self._buf[self._pos]
+            self._pos = len(self._buf)
+            if not self._fill():
+                return ""
+
+    def _error(self, msg: str):
+        return json.JSONDecodeError(msg, self._buf, self._pos)
+
+    def value(self):
+        """Decode the next complete value."""
+        if not self._peek():
+            raise self._error("Expecting value")
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                # a newline can't occur inside a string, number or literal, so an
+                # error with one after it is malformed input, not a cut-off value
+                if self._buf.find("\n", e.pos) != -1:
+                    raise
+                pending = len(self._buf) - self._pos
+                if pending > MAX_VALUE_CHARS:
+                    raise self._error(f"Value exceeds {MAX_VALUE_CHARS} characters") from e
+                # incomplete: read at least as much again as is pending, so a
+                # big value costs a few decode attempts rather than one per chunk
+                if self._fill(max(CHUNK_SIZE, pending)):
+                    continue
+                raise
+            if type(value) in (int, float) and end + 2 >= len(self._buf) and self._fill():
+                continue   # a number may be cut off at the chunk boundary ("12" of "12.5e-3")
+            self._pos = end
+            return value
+
+    def expect(self, ch: str):
+        if self._peek() != ch:
+            raise self._error(f"Expecting {ch!r}")
+        self._pos += 1
+
+    def array_items(self) -> Iterator:
+        """Elements of the array starting at the next character, one at a time."""
+        self.expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            ch = self._peek()
+            self._pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                self._pos -= 1
+                raise self._error("Expecting ',' delimiter")
+
+    def results(self, key: str = "results") -> Iterator:
+        """
+        Items of an API response, one at a time: the elements of data[key] when
+        the document is an object holding that key, the elements of a top-level
+        array, otherwise the document itself. Members before `key` are decoded
+        whole; whatever follows the results isn't read.
+        """
+        ch = self._peek()
+        if ch == "[":
+            yield from self.array_items()
+            return
+        if ch != "{":
+            if ch:
+                yield self.value()
+            return
+        self.expect("{")
+        others = {}
+        if self._peek() != "}":
+            while True:
+                name = self.value()
+                if not isinstance(name, str):
+                    raise self._error("Expecting property name")
+                self.expect(":")
+                if name == key:
+                    if self._peek() == "[":
+                        yield from self.array_items()
+                    else:
+                        yield self.value()
+                    return
+                others[name] = self.value()
+                if self._peek() == "}":
+                    break
+                self.expect(",")
+        self._pos += 1
+        yield others
+
+    def values(self) -> Iterator:
+        while True:
+            ch = self._peek()
+            if not ch:
+                return
+            if ch == "[":
+                yield from self.array_items()
+            else:
+                yield self.value()
+
+
+def decode_chunks(byte_chunks: Iterable[bytes], encoding: str = "utf-8-sig") -> Iterator[str]:
+    """bytes chunks -> str chunks (multi-byte characters split across chunks are fine)."""
+    dec = codecs.getincrementaldecoder(encoding)()
+    for b in byte_chunks:
+        text = dec.decode(b)
+        if text:
+            yield text
+    tail = dec.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_file(path: Union[str, Path], on_bytes: Optional[Callable[[int], None]] = None,
+              chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Values in a JSON / JSON-lines file, decoded as it's read. on_bytes(n) gets the bytes read so far."""
+    def read():
+        n = 0
+        with open(path, "rb") as fh:
+            while True:
+                b = fh.read(chunk_size)
+                if not b:
+                    return
+                n += len(b)
+                if on_bytes is not None:
+                    on_bytes(n)
+                yield b
+
+    return JSONStream(decode_chunks(read())).values()
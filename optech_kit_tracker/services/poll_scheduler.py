@@ -0,0 +1,59 @@
+# services/poll_scheduler.py
+import math
+import random
+import time
+
+from app_config import (POLL_INTERVAL_MS, POLL_FAST_MS, POLL_IDLE_MAX_MS, POLL_ERROR_MAX_MS,
+                        POLL_ALERT_HOLD_S)
+
+
+class PollScheduler:
+    """
+    Picks the delay before the next poll from how the last one went:
+    - failed: base * 2**n after n failures in a row, up to error_max_ms
+    - devices changed, or alerts raised in the last alert_hold_s: fast_ms
+    - nothing changed: 1.5x longer per quiet poll in a row, up to idle_max_ms
+    Each delay is jittered by ±jitter so clients don't poll in lockstep.
+    """
+
+    def __init__(self, base_ms: int = POLL_INTERVAL_MS, fast_ms: int = POLL_FAST_MS,
+                 idle_max_ms: int = POLL_IDLE_MAX_MS, error_max_ms: int = POLL_ERROR_MAX_MS,
+                 alert_hold_s: float = POLL_ALERT_HOLD_S, jitter: float = 0.2):
+        self.base_ms = base_ms
+        self.fast_ms = fast_ms
+        self.idle_max_ms = idle_max_ms
+        self.error_max_ms = error_max_ms
+        self.alert_hold_s = alert_hold_s
+        self.jitter = jitter
+        self.interval_ms = base_ms   # current cadence, before jitter
+        self.failures = 0
+        self.quiet = 0
+        self._alerts_until = 0.0
+
+    def alerts_raised(self):
+        """Keep polling fast for alert_hold_s (called from the Tk thread)."""
+        self._alerts_until = time.monotonic() + self.alert_hold_s
+
+    def next_delay_ms(self, failed: bool, changed: bool) -> int:
+        if failed:
+            # counters stop growing once the delay is capped (1.5**n overflows a float after ~1750 polls)
+            self.failures = min(self.failures + 1, _steps_to(self.base_ms, self.error_max_ms, 2))
+            self.quiet = 0
+            interval = min(self.base_ms * 2 ** self.failures, self.error_max_ms)
+        else:
+            self.failures = 0
+            if changed or time.monotonic() < self._alerts_until:
+                self.quiet = 0
+                interval = min(self.fast_ms, self.base_ms)
+            else:
+                self.quiet = min(self.quiet + 1, _steps_to(self.base_ms, self.idle_max_ms, 1.5))
+                interval = min(self.base_ms * 1.5 ** self.quiet, max(self.idle_max_ms, self.base_ms))
+        self.interval_ms = int(interval)
+        return int(interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+def _steps_to(base_ms: float, max_ms: float, factor: float) -> int:
+    """Smallest n with base_ms * factor**n >= max_ms."""
+    if base_ms <= 0 or max_ms <= base_ms:
+        return 1
+    return max(1, math.ceil(math.log(max_ms / base_ms, factor)))
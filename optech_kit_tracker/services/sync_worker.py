@@ -0,0 +1,181 @@
+# services/sync_worker.py
+import queue
+import threading
+import time
+from itertools import islice
+from typing import Callable, Iterable, Optional
+
+from app_config import SYNC_BATCH_SIZE
+from services.api_client import iter_payloads, endpoint_status
+from services.poll_scheduler import PollScheduler
+
+
+class SyncWorker:
+    """
+    Background API sync.
+    Fetches, upserts and saves on its own thread, then posts a compact
+    change-set to `results` for the Tk thread to drain with root.after().
+    Polls run back to back on that one thread (never overlapping), with
+    `scheduler` (a PollScheduler) choosing the gap after each one.
+    `fetch` may return a list or a generator; payloads are upserted
+    `batch_size` at a time as they arrive, so a streamed response is never
+    held whole.
+
+    Change-set shape:
+        {"manual": bool, "error": str | None,
+         "summary": {"created": n, "updated": n, "no_change": n},
+         "changes": [upsert results that created/updated a device, plus "model"],
+         "errors": [per-payload error strings],
+         "images": [images completed from image_fragment payloads, with "cached": ImageCache entry or None],
+         "endpoint_errors": ["<endpoint>: <error>" for endpoints whose last fetch failed],
+         "poll": {"latency_ms", "failed", "next_ms", "interval_ms", "failures"}}
+
+    `images` (ImageAssembler) and `tracks` (TrackStore) are optional and fed
+    from every poll's payloads; completed images go into `cache` (ImageCache)
+    here too, so Pillow's decode/thumbnail never runs on the Tk thread.
+    """
+
+    def __init__(self, registry, lock: threading.RLock, interval_ms: int,
+                 stage: Callable, fetch: Callable[[], Iterable] = iter_payloads,
+                 images=None, tracks=None, cache=None,
+                 status: Optional[Callable[[], list]] = endpoint_status, batch_size: int = SYNC_BATCH_SIZE):
+        self.registry = registry
+        self.images = images
+        self.tracks = tracks
+        self.cache = cache
+        self.stage = stage   # store.stage_upserts: (payloads, registry) -> (results, write)
+        self.lock = lock
+        self.scheduler = PollScheduler(base_ms=interval_ms)
+        self.fetch = fetch
+        self.status = status
+        self.batch_size = batch_size
+        self._delay_ms = 0   # first poll straight away
+        self.results: "queue.Queue[dict]" = queue.Queue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._manual = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def interval_ms(self) -> int:
+        return self.scheduler.base_ms
+
+    @interval_ms.setter
+    def interval_ms(self, ms: int):
+        self.scheduler.base_ms = ms
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="api-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def request_sync(self, manual: bool = True):
+        """Run a sync now, or as soon as the one in flight finishes."""
+        self._manual = self._manual or manual
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._delay_ms / 1000)
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            manual, self._manual = self._manual, False
+            try:
+                msg = self.sync_once(manual)
+                poll = msg["poll"]
+                self._delay_ms = self.scheduler.next_delay_ms(poll["failed"], bool(msg["changes"]))
+                poll.update(next_ms=self._delay_ms, interval_ms=self.scheduler.interval_ms,
+                            failures=self.scheduler.failures)
+            except Exception as e:
+                # never let one bad poll kill the thread (polling would silently stop);
+                # it counts as a failed poll, so a poll that keeps raising backs off
+                try:
+                    self._delay_ms = self.scheduler.next_delay_ms(True, False)
+                except Exception:
+                    self._delay_ms = self.scheduler.error_max_ms
+                msg = {"manual": manual, "error": f"Sync failed:\n{e}", "changes": [], "errors": [],
+                       "images": [], "endpoint_errors": [], "summary": {},
+                       "poll": {"failed": True, "next_ms": self._delay_ms,
+                                "interval_ms": self.scheduler.interval_ms, "failures": self.scheduler.failures}}
+            self.results.put(msg)
+
+    def sync_once(self, manual: bool = False) -> dict:
+        msg = {"manual": manual, "error": None,
+               "summary": {"created": 0, "updated": 0, "no_change": 0},
+               "changes": [], "errors": [], "images": [], "endpoint_errors": [],
+               "poll": {"latency_ms": None, "failed": False}}
+        t0 = time.monotonic()
+        payloads = None
+        try:
+            payloads = iter(self.fetch())
+            while True:
+                batch = list(islice(payloads, self.batch_size))
+                if not batch:
+                    break
+                try:
+                    with self.lock:
+                        results, write = self.stage(batch, self.registry)
+                    # disk I/O (journal fsync, compaction) without holding up the Tk thread
+                    write()
+                except Exception as e:
+                    msg["error"] = f"Failed to save API results:\n{e}"
+                    break
+                self._collect(batch, results, msg)
+        except Exception as e:
+            # batches already applied stay applied (and are in msg["changes"])
+            msg["error"] = f"Failed to fetch from API:\n{e}"
+        finally:
+            close = getattr(payloads, "close", None)
+            if close is not None:
+                close()
+            msg["poll"]["latency_ms"] = (time.monotonic() - t0) * 1000
+
+        if self.tracks is not None:
+            try:
+                self.tracks.flush()
+            except Exception:
+                pass
+
+        try:
+            endpoints = self.status() if self.status else []
+        except Exception:
+            endpoints = []
+        failing = [ep for ep in endpoints if ep.get("error")]
+        msg["endpoint_errors"] = [f"{ep['name']}: {ep['error']}" for ep in failing]
+        # every endpoint down counts as a failed poll (one down is its own backoff's business)
+        msg["poll"]["failed"] = bool(msg["error"]) or (bool(endpoints) and len(failing) == len(endpoints))
+        return msg
+
+    def _collect(self, payloads: list, results: list, msg: dict):
+        """Fold one upserted batch into the change-set, and feed images/tracks."""
+        for p, res in zip(payloads, results):
+            action = res.get("action", "no_change")
+            if action == "error":
+                msg["errors"].append(res.get("error", "unknown error"))
+                continue
+            msg["summary"][action] = msg["summary"].get(action, 0) + 1
+            if action != "no_change":
+                msg["changes"].append({**res, "model": p.get("model")})
+
+        if self.images is not None:
+            try:
+                done = self.images.feed(payloads, results)
+                for img in done:
+                    img["cached"] = (self.cache.put_file(img["device_id"], img["path"], img.get("completed"))
+                                     if self.cache is not None else None)
+                msg["images"].extend(done)
+            except Exception:
+                # imagery is best-effort; never fail the sync over it
+                pass
+        if self.tracks is not None:
+            try:
+                self.tracks.record_payloads(payloads, results)
+            except Exception:
+                pass
@@ -0,0 +1,17 @@
+from app_config import load_config
+
+# storage_backend setting -> module exposing init_store/load_data/save_data/
+# save_changes/upsert_devices_from_api/import_device_json, and stage_data/
+# stage_changes/stage_upserts: the same writes split into serialise-now
+# (under the caller's lock) and a returned write() for after it
+BACKENDS = ("json", "sqlite")
+
+def get_store(name: str | None = None):
+    name = (name or load_config().get("storage_backend") or "json").strip().lower()
+    if name == "sqlite":
+        from storage import sqlite_store
+        return sqlite_store
+    if name != "json":
+        raise ValueError(f"Unknown storage backend {name!r}; expected one of {BACKENDS}")
+    from storage import json_store
+    return json_store
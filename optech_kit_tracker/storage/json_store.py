@@ -1,21 +1,59 @@
 from pathlib import Path
 from typing import Union
-from models.device import create_device_from_api, refresh_device_from_api
-import os, tempfile, shutil, json
+from models.event_history import append_event, to_json
+from models.registry import DeviceRegistry
+from services.bulk_import import BulkImport, list_import_files
+import os, re, tempfile, shutil, json, threading
 from json import JSONDecodeError
 
 DATA_FILE = Path(__file__).parent.joinpath("devices.json").resolve()
 
+# Changes since the last snapshot go to an append-only JSON-lines journal next
+# to DATA_FILE; it's folded back into the snapshot once it outgrows it.
+# Every journal record carries a sequence number and the snapshot records the
+# last one it includes, so replay applies exactly the records after it (a
+# crash between writing a snapshot and emptying the journal can't double-apply).
+#     devices.json:    {"seq": 12, "devices": [\n<device>,\n<device>\n]}
+#     devices.journal: {"op": "put"|"set"|"del", "seq": 13, ...} per line
+JOURNAL_MIN_COMPACT_BYTES = 1_000_000
+_SNAPSHOT_SEQ = re.compile(rb'^\{"seq":(\d+)')
+
+_SEQ = {"last": None}   # last sequence number handed out (None until read from disk)
+
+# Writes are staged, then written: stage_*() serialise under the caller's lock
+# (numbering records and, when the journal has outgrown the snapshot, rendering
+# a new snapshot) and queue the text; the write() they return does the file
+# I/O and fsync after the caller has let go of its lock. Whichever write()
+# runs first writes everything queued, in order.
+_PENDING = []                  # ("journal" | "snapshot", text), in sequence order
+_QUEUE_LOCK = threading.Lock() # guards _PENDING, _SEQ and _SIZES
+_IO_LOCK = threading.Lock()    # one writer at a time
+_SIZES = {"journal": None, "snapshot": None}   # bytes on disk + queued, for the compaction check
+
+def _journal_file() -> Path:
+    return DATA_FILE.with_suffix(".journal")
+
 def init_store():
+    _SIZES.update(journal=None, snapshot=None)   # re-read for (possibly another) DATA_FILE
     DATA_FILE.parent.mkdir(parents=True, exist_ok=True)
     if not DATA_FILE.exists():
         DATA_FILE.write_text("[]", encoding="utf-8")
 
 def load_data():
+    """Snapshot from DATA_FILE with the journal replayed on top."""
+    _flush()
+    snap_seq, devices = _load_snapshot()
+    devices, last = _replay_journal(devices, snap_seq)
+    with _QUEUE_LOCK:
+        _SEQ["last"] = max(_SEQ["last"] or 0, snap_seq, last)
+    return devices
+
+def _load_snapshot() -> tuple[int, list]:
+    """(last journal seq it includes, devices); older snapshots are a bare list (seq 0)."""
     if not DATA_FILE.exists():
-        return []
+        return 0, []
     try:
-        return json.loads(DATA_FILE.read_text(encoding="utf-8")) or []
+        data = json.loads(DATA_FILE.read_text(encoding="utf-8"))
     except JSONDecodeError:
         # back up the corrupt file once
         bad = DATA_FILE.with_suffix(".json.corrupt")
@@ -23,16 +61,150 @@ def load_data():
             shutil.copy2(DATA_FILE, bad)
         except Exception:
             pass
-        return []
+        return 0, []
     except Exception:
-        return []
+        return 0, []
+    if isinstance(data, dict):
+        return int(data.get("seq") or 0), data.get("devices") or []
+    return 0, data or []
+
+def _replay_journal(devices: list, after_seq: int = 0) -> tuple[list, int]:
+    """Apply journal records numbered after `after_seq`; returns (devices, last seq seen)."""
+    journal = _journal_file()
+    last = 0
+    if not journal.exists():
+        return devices, last
+    try:
+        raw = journal.read_bytes()
+    except OSError:
+        return devices, last
+    end = raw.rfind(b"\n") + 1
+    if end < len(raw):
+        # torn write from a crash mid-append: it was never acknowledged, so cut
+        # it off before new appends get glued onto the partial line
+        try:
+            with journal.open("r+b") as fh:
+                fh.truncate(end)
+        except OSError:
+            pass
+    by_id = {d.get("id"): d for d in devices if isinstance(d, dict)}
+    for line in raw[:end].splitlines():
+        try:
+            rec = json.loads(line)
+        except (JSONDecodeError, UnicodeDecodeError):
+            continue
+        seq = rec.get("seq")
+        if seq is not None:
+            last = max(last, seq)
+            if seq <= after_seq:
+                continue   # already in the snapshot
+        op = rec.get("op")
+        if op == "put":
+            dev = rec.get("dev") or {}
+            old = by_id.get(dev.get("id"))
+            if old is not None:
+                old.clear(); old.update(dev)
+            else:
+                devices.append(dev)
+                by_id[dev.get("id")] = dev
+        elif op == "set":
+            dev = by_id.get(rec.get("id"))
+            if dev is None:
+                continue
+            dev.update(rec.get("fields") or {})
+            ev = rec.get("event")
+            if ev is not None:
+                append_event(dev, ev)
+        elif op == "del":
+            dev = by_id.pop(rec.get("id"), None)
+            if dev is not None:
+                devices.remove(dev)
+    return devices, last
+
+def _disk_seq() -> int:
+    """Last sequence number on disk: the snapshot's, or the journal's last record."""
+    seq = 0
+    try:
+        with DATA_FILE.open("rb") as fh:
+            m = _SNAPSHOT_SEQ.match(fh.readline())
+        if m:
+            seq = int(m.group(1))
+    except OSError:
+        pass
+    try:
+        raw = _journal_file().read_bytes()
+    except OSError:
+        return seq
+    for line in reversed(raw.splitlines()):
+        try:
+            return max(seq, int(json.loads(line).get("seq") or 0))
+        except (JSONDecodeError, UnicodeDecodeError, AttributeError, ValueError):
+            continue
+    return seq
+
+def _dump(rec: dict) -> str:
+    """Serialise a journal record now, so later edits to the device don't leak in (numbered when queued)."""
+    return json.dumps(rec, ensure_ascii=False, separators=(",", ":"), default=to_json)
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+def _snapshot_text(data, seq: int) -> str:
+    # one compact device per line: small, but still diffable
+    return (f'{{"seq":{seq},"devices":[\n'
+            + ",\n".join(json.dumps(d, ensure_ascii=False, separators=(",", ":"), default=to_json)
+                         for d in data)
+            + "\n]}\n")
+
+def _stage(devices: list, lines: list, snapshot: bool = False):
+    """Number and queue journal lines; also render a snapshot if asked or the journal has grown too big."""
+    with _QUEUE_LOCK:
+        if _SEQ["last"] is None:
+            _SEQ["last"] = _disk_seq()
+        if _SIZES["journal"] is None:
+            _SIZES.update(journal=_file_size(_journal_file()), snapshot=_file_size(DATA_FILE))
+        if lines:
+            text = ""
+            for line in lines:
+                _SEQ["last"] += 1
+                text += f'{{"seq":{_SEQ["last"]},{line[1:]}\n'
+            _PENDING.append(("journal", text))
+            _SIZES["journal"] += len(text.encode("utf-8"))
+        if snapshot or _SIZES["journal"] > max(JOURNAL_MIN_COMPACT_BYTES, _SIZES["snapshot"]):
+            text = _snapshot_text(devices, _SEQ["last"])
+            _PENDING.append(("snapshot", text))
+            _SIZES.update(journal=0, snapshot=len(text.encode("utf-8")))
+    return _flush
+
+def _flush():
+    """Write everything staged so far, in order."""
+    with _IO_LOCK:
+        with _QUEUE_LOCK:
+            jobs = list(_PENDING)
+            _PENDING.clear()
+        for kind, text in jobs:
+            if kind == "journal":
+                _append_journal(text)
+            else:
+                _write_snapshot(text)
 
 def save_data(data):
+    """Write a full snapshot and empty the journal (also used for compaction)."""
+    stage_data(data)()
+
+def stage_data(data):
+    """save_data() in two steps: render the snapshot now, write it when the returned function is called."""
+    return _stage(data, [], snapshot=True)
+
+def _write_snapshot(text: str):
     DATA_FILE.parent.mkdir(parents=True, exist_ok=True)
     tmp_fd, tmp_path = tempfile.mkstemp(dir=str(DATA_FILE.parent), prefix=DATA_FILE.name, suffix=".tmp")
     try:
         with os.fdopen(tmp_fd, "w", encoding="utf-8") as fh:
-            json.dump(data, fh, ensure_ascii=False, indent=2)
+            fh.write(text)
             fh.flush()
             os.fsync(fh.fileno())
         os.replace(tmp_path, DATA_FILE)
@@ -42,68 +214,104 @@ def save_data(data):
                 os.remove(tmp_path)
         except Exception:
             pass
+    # only now is it safe to drop the journal; until then replay skips what the snapshot holds
+    journal = _journal_file()
+    if journal.exists():
+        with journal.open("w", encoding="utf-8") as fh:
+            fh.flush()
+            os.fsync(fh.fileno())
+
+def save_changes(devices: list, changed=(), deleted_ids=()):
+    """
+    Persist a few changed/deleted devices as journal appends instead of a
+    full rewrite. `devices` is the whole list, used if it's time to compact.
+    """
+    stage_changes(devices, changed, deleted_ids)()
+
+def stage_changes(devices: list, changed=(), deleted_ids=()):
+    """save_changes() in two steps: serialise now (under the caller's lock), write when the returned function is called."""
+    lines = [_dump({"op": "put", "dev": d}) for d in changed]
+    lines += [_dump({"op": "del", "id": i}) for i in deleted_ids]
+    return _stage(devices, lines)
+
+def _append_journal(text: str):
+    """Append staged journal lines and fsync."""
+    journal = _journal_file()
+    journal.parent.mkdir(parents=True, exist_ok=True)
+    with journal.open("a", encoding="utf-8") as fh:
+        fh.write(text)
+        fh.flush()
+        os.fsync(fh.fileno())
 
-def import_device_json(path: Union[str, Path]):
+def _journal_record(registry: DeviceRegistry, res: dict):
+    dev = registry.get(res.get("id"))
+    if dev is None or res.get("action") == "no_change":
+        return None
+    if res.get("action") == "created":
+        return {"op": "put", "dev": dev}
+    log = dev.get("event_log") or []
+    return {
+        "op": "set",
+        "id": dev.get("id"),
+        "fields": {f: dev.get(f) for f in res.get("updated_fields") or []},
+        "event": log[-1] if log else None,
+    }
+
+def import_device_json(path: Union[str, Path], registry: DeviceRegistry | None = None):
     data = json.loads(Path(path).read_text(encoding="utf-8"))
     if isinstance(data, dict):
-        return [upsert_device_from_api(data)]
+        return upsert_devices_from_api([data], registry)
     elif isinstance(data, list):
-        return [upsert_device_from_api(obj) for obj in data]
+        return upsert_devices_from_api(data, registry)
     else:
         raise ValueError("Unsupported JSON; expected object or list.")
 
 def import_device_json_dir(dir_path: Union[str, Path]):
-    actions = {"created":0, "updated":0, "no_change":0}
-    for p in Path(dir_path).glob("*.json"):
-        for res in import_device_json(p):
-            actions[res["action"]] += 1
-    return actions
+    """Bulk-import every .json/.jsonl file in a folder with one load and one save."""
+    job = BulkImport(list_import_files(dir_path), DeviceRegistry(load_data()), stage_changes).run()
+    if job.failed:
+        raise RuntimeError(job.failed)
+    return job.summary
 
 def upsert_device_from_api(payload: dict):
-    devices = load_data()
-
-    serial = payload.get("serial")
-    if not serial:
-        raise ValueError("Payload missing 'serial' – cannot upsert.")
-    model = payload.get("model")
-
-    existing = next(
-        (d for d in devices
-         if d.get("serial_number") == serial and (not model or d.get("model") == model)),
-        None
-    )
-
-    # default result shape in case refresh/create doesn't return flags
-    res = {
-        "status": "no_change",
-        "updated_fields": [],
-        "tamper_changed": False,
-        "tamper": None,
-        "connectivity_changed": False,
-        "connectivity": None,
-    }
-
-    if existing:
-        r = refresh_device_from_api(existing, payload) or {}
-        res.update(r)
-        action = res.get("status", "no_change")
-    else:
-        new_dev = create_device_from_api(payload)
-        devices.append(new_dev)
-        action = "created"
-        # Fill flags from the newly created device's current state
-        res.update({
-            "tamper": new_dev.get("tamper_status"),
-            "connectivity": new_dev.get("connectivity"),
-        })
-
-    save_data(devices)
-
-    # Preserve the original return contract but now include the refresh flags, too
-    return {
-        "action": action,
-        "serial": serial,
-        **res,
-    }
+    registry = DeviceRegistry(load_data())
+    res = registry.upsert(payload)
+    rec = _journal_record(registry, res)
+    _stage(registry.devices, [_dump(rec)] if rec else [])()
+    return res
 
+def upsert_devices_from_api(payloads, registry: DeviceRegistry | None = None):
+    """
+    Upsert many payloads with a single load and a single journal append.
+    Returns one result dict per payload, in order. A payload that can't be
+    applied gets {"action": "error", "error": "..."} instead of aborting the batch.
+    Pass the caller's registry to update it in place and skip the disk load.
+    """
+    if not payloads:
+        return []
+    if registry is None:
+        registry = DeviceRegistry(load_data())
+    results, write = stage_upserts(payloads, registry)
+    write()
+    return results
 
+def stage_upserts(payloads, registry: DeviceRegistry):
+    """
+    upsert_devices_from_api() in two steps: apply to `registry` and serialise
+    the journal records now, under the caller's lock; returns (results, write)
+    and the caller runs write() once it has released the lock.
+    """
+    results, lines = [], []
+    for p in payloads:
+        try:
+            res = registry.upsert(p)
+        except Exception as e:
+            serial = p.get("serial") if isinstance(p, dict) else None
+            results.append({"action": "error", "serial": serial, "error": str(e)})
+            continue
+        results.append(res)
+        # recorded right away: a device upserted twice in one batch gets each event once
+        rec = _journal_record(registry, res)
+        if rec:
+            lines.append(_dump(rec))
+    return results, _stage(registry.devices, lines)
@@ -0,0 +1,278 @@
+from pathlib import Path
+from typing import Union
+from app_config import EVENT_HISTORY_DEPTH
+from models.event_history import compact_event
+from models.registry import DeviceRegistry
+from services.bulk_import import BulkImport, list_import_files
+import json, sqlite3, threading
+
+DB_FILE = Path(__file__).parent.joinpath("devices.db").resolve()
+
+# Same public API as storage.json_store, backed by SQLite:
+# - devices: one row per device (JSON body minus event_log), indexed on id and (serial_number, model)
+# - events:  one row per event_log entry, trimmed to EVENT_HISTORY_DEPTH per device
+# Row order (rowid) keeps insertion order, like the list in devices.json.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    id            TEXT PRIMARY KEY,
+    serial_number TEXT,
+    model         TEXT,
+    data          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_devices_serial_model ON devices(serial_number, model);
+CREATE TABLE IF NOT EXISTS events (
+    device_id TEXT NOT NULL,
+    data      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_device ON events(device_id);
+"""
+
+_local = threading.local()
+
+def _conn() -> sqlite3.Connection:
+    """One connection per thread (the sync worker and Tk thread each get their own)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != DB_FILE:
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(DB_FILE), timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.path = conn, DB_FILE
+    return conn
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+# PRAGMA user_version: 0 = the JSON store hasn't been pulled across yet, 1 = it has
+_MIGRATED = 1
+
+def init_store():
+    # first run after switching backends: pull the JSON store across once
+    # (an emptied DB must stay empty, so this is a flag, not "no rows yet")
+    migrate_from_json()
+
+def migrate_from_json(force: bool = False) -> int:
+    """One-shot copy of storage/devices.json (+ journal) into the DB. Returns devices copied."""
+    from storage import json_store
+    conn = _conn()
+    if not force and conn.execute("PRAGMA user_version").fetchone()[0] >= _MIGRATED:
+        return 0
+    copied = 0
+    # a DB that already has devices (created before the flag existed) isn't overwritten
+    if force or conn.execute("SELECT 1 FROM devices LIMIT 1").fetchone() is None:
+        devices = json_store.load_data()
+        save_data(devices)
+        copied = len(devices)
+    conn.execute(f"PRAGMA user_version={_MIGRATED}")
+    return copied
+
+# ---------- reads ----------
+
+def _rows_to_devices(conn, rows):
+    devices, by_id = [], {}
+    for dev_id, data in rows:
+        d = json.loads(data)
+        d["event_log"] = []
+        devices.append(d)
+        by_id[dev_id] = d
+    return devices, by_id
+
+def _attach_events(conn, by_id, ids=None):
+    if ids is None:
+        cur = conn.execute("SELECT device_id, data FROM events ORDER BY rowid")
+    else:
+        marks = ",".join("?" * len(ids))
+        cur = conn.execute(f"SELECT device_id, data FROM events WHERE device_id IN ({marks}) ORDER BY rowid", list(ids))
+    for dev_id, data in cur:
+        d = by_id.get(dev_id)
+        if d is not None:
+            d["event_log"].append(json.loads(data))
+
+def load_data():
+    _flush()
+    conn = _conn()
+    devices, by_id = _rows_to_devices(conn, conn.execute("SELECT id, data FROM devices ORDER BY rowid"))
+    _attach_events(conn, by_id)
+    return devices
+
+def _find_device(conn, serial, model):
+    """Existing device matching serial/model via the index (same rule as DeviceRegistry.find)."""
+    if model:
+        row = conn.execute("SELECT id, data FROM devices WHERE serial_number=? AND model=? ORDER BY rowid LIMIT 1",
+                           (serial, model)).fetchone()
+    else:
+        row = conn.execute("SELECT id, data FROM devices WHERE serial_number=? ORDER BY rowid LIMIT 1",
+                           (serial,)).fetchone()
+    if row is None:
+        return None
+    devices, by_id = _rows_to_devices(conn, [row])
+    _attach_events(conn, by_id, [row[0]])
+    return devices[0]
+
+# ---------- writes ----------
+#
+# Like json_store, writes are staged, then written: stage_*() turn the devices
+# into (sql, rows) ops under the caller's lock and queue them; the write()
+# they return runs everything queued, in order, in one transaction once the
+# caller has let go of its lock.
+
+_PENDING = []                  # lists of (sql, rows) ops, in the order staged
+_QUEUE_LOCK = threading.Lock()
+_IO_LOCK = threading.Lock()
+
+_UPSERT_DEVICE = ("INSERT INTO devices(id, serial_number, model, data) VALUES(?,?,?,?) "
+                  "ON CONFLICT(id) DO UPDATE SET serial_number=excluded.serial_number, "
+                  "model=excluded.model, data=excluded.data")
+_INSERT_EVENT = "INSERT INTO events(device_id, data) VALUES(?,?)"
+_TRIM_EVENTS = ("DELETE FROM events WHERE device_id=? AND rowid NOT IN "
+                "(SELECT rowid FROM events WHERE device_id=? ORDER BY rowid DESC LIMIT ?)")
+
+def _device_ops(d: dict) -> list:
+    body = {k: v for k, v in d.items() if k != "event_log"}
+    return [(_UPSERT_DEVICE, [(d.get("id"), d.get("serial_number"), d.get("model"), _dumps(body))])]
+
+def _events_ops(d: dict) -> list:
+    return [("DELETE FROM events WHERE device_id=?", [(d.get("id"),)]),
+            (_INSERT_EVENT, [(d.get("id"), _dumps(compact_event(ev))) for ev in (d.get("event_log") or ())])]
+
+def _append_event_ops(d: dict) -> list:
+    log = d.get("event_log") or ()
+    if not log:
+        return []
+    return [(_INSERT_EVENT, [(d.get("id"), _dumps(compact_event(log[-1])))]),
+            (_TRIM_EVENTS, [(d.get("id"), d.get("id"), EVENT_HISTORY_DEPTH)])]
+
+def _run(conn, ops: list):
+    for sql, rows in ops:
+        conn.executemany(sql, rows)
+
+def _stage(ops: list):
+    with _QUEUE_LOCK:
+        _PENDING.append(ops)
+    return _flush
+
+def _flush():
+    """Write everything staged so far, in order, in one transaction."""
+    with _IO_LOCK:
+        with _QUEUE_LOCK:
+            batches = list(_PENDING)
+            _PENDING.clear()
+        if not batches:
+            return
+        conn = _conn()
+        with conn:
+            for ops in batches:
+                _run(conn, ops)
+
+def save_data(data):
+    """Replace the whole store with `data` in one transaction."""
+    stage_data(data)()
+
+def stage_data(data):
+    """save_data() in two steps: serialise now, write when the returned function is called."""
+    ops = [("DELETE FROM events", [()]), ("DELETE FROM devices", [()])]
+    for d in data:
+        if isinstance(d, dict) and d.get("id"):
+            ops += _device_ops(d) + _events_ops(d)
+    return _stage(ops)
+
+def save_changes(devices: list, changed=(), deleted_ids=()):
+    """Write only the changed/deleted rows (`devices` kept for json_store parity)."""
+    stage_changes(devices, changed, deleted_ids)()
+
+def stage_changes(devices: list, changed=(), deleted_ids=()):
+    """save_changes() in two steps: serialise now (under the caller's lock), write when the returned function is called."""
+    ops = []
+    for d in changed:
+        ops += _device_ops(d) + _events_ops(d)
+    for i in deleted_ids:
+        ops += [("DELETE FROM events WHERE device_id=?", [(i,)]), ("DELETE FROM devices WHERE id=?", [(i,)])]
+    return _stage(ops)
+
+def _result_ops(registry: DeviceRegistry, res: dict) -> list:
+    d = registry.get(res.get("id"))
+    if d is None or res.get("action") == "no_change":
+        return []
+    if res.get("action") == "created":
+        return _device_ops(d) + _events_ops(d)
+    return (_device_ops(d) if res.get("updated_fields") else []) + _append_event_ops(d)
+
+def upsert_device_from_api(payload: dict):
+    """Single-row transaction: look the device up by index, apply, write it back."""
+    conn = _conn()
+    serial = payload.get("serial")
+    if not serial:
+        raise ValueError("Payload missing 'serial' – cannot upsert.")
+    existing = _find_device(conn, serial, payload.get("model"))
+    registry = DeviceRegistry([existing] if existing else [])
+    res = registry.upsert(payload)
+    _stage(_result_ops(registry, res))()
+    return res
+
+def upsert_devices_from_api(payloads, registry: DeviceRegistry | None = None):
+    """
+    Upsert many payloads in one transaction, touching only their rows.
+    Same result contract as json_store.upsert_devices_from_api.
+    """
+    results = []
+    if not payloads:
+        return results
+    if registry is not None:
+        results, write = stage_upserts(payloads, registry)
+        write()
+        return results
+
+    # no registry: look each device up in the DB, inside the same transaction
+    _flush()
+    conn = _conn()
+    with conn:
+        for p in payloads:
+            try:
+                serial = p.get("serial")
+                if not serial:
+                    raise ValueError("Payload missing 'serial' – cannot upsert.")
+                existing = _find_device(conn, serial, p.get("model"))
+                reg = DeviceRegistry([existing] if existing else [])
+                res = reg.upsert(p)
+                _run(conn, _result_ops(reg, res))
+                results.append(res)
+            except Exception as e:
+                serial = p.get("serial") if isinstance(p, dict) else None
+                results.append({"action": "error", "serial": serial, "error": str(e)})
+    return results
+
+def stage_upserts(payloads, registry: DeviceRegistry):
+    """
+    upsert_devices_from_api() in two steps: apply to `registry` and serialise
+    the rows now, under the caller's lock; returns (results, write) and the
+    caller runs write() once it has released the lock.
+    """
+    results, ops = [], []
+    for p in payloads:
+        try:
+            res = registry.upsert(p)
+        except Exception as e:
+            serial = p.get("serial") if isinstance(p, dict) else None
+            results.append({"action": "error", "serial": serial, "error": str(e)})
+            continue
+        results.append(res)
+        ops += _result_ops(registry, res)
+    return results, _stage(ops)
+
+def import_device_json(path: Union[str, Path], registry: DeviceRegistry | None = None):
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        return upsert_devices_from_api([data], registry)
+    elif isinstance(data, list):
+        return upsert_devices_from_api(data, registry)
+    else:
+        raise ValueError("Unsupported JSON; expected object or list.")
+
+def import_device_json_dir(dir_path: Union[str, Path]):
+    """Bulk-import every .json/.jsonl file in a folder with one load and one save."""
+    job = BulkImport(list_import_files(dir_path), DeviceRegistry(load_data()), stage_changes).run()
+    if job.failed:
+        raise RuntimeError(job.failed)
+    return job.summary
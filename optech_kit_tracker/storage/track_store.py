@@ -0,0 +1,263 @@
+from array import array
+from pathlib import Path
+from typing import Optional
+import math, os, struct, threading
+
+from app_config import TRACK_RECENT_POINTS, TRACK_OLD_POINTS, TRACK_DOWNSAMPLE_S
+import utils
+
+TRACKS_FILE = Path(__file__).parent.joinpath("tracks.bin").resolve()
+
+# Position history per device, column-wise in typed arrays:
+#     ts (float64 epoch seconds), lat, lon, alt, spd (float32 – ~0.5 m at these latitudes)
+# Each track keeps up to TRACK_RECENT_POINTS samples at full resolution; past
+# that, the oldest half is thinned to one sample per TRACK_DOWNSAMPLE_S and moved
+# to an "old" tier, which halves itself again whenever it fills up.
+#
+# On disk: tracks.bin is an append-only log of fixed 28-byte records
+# (slot, ts, lat, lon, alt, spd); tracks.ids maps slot -> device id, one per line.
+# tracks.bin is rewritten from memory once it grows well past what the tracks
+# hold. Slots never change, so tracks.ids is only ever appended to and a
+# compaction is a single atomic replace of tracks.bin. Appends are fsynced, ids
+# before the records that use them; a torn tail left by a crash is cut off on load.
+
+COMPACT_MIN_BYTES = 1_000_000   # tracks.bin is compacted once past 4x max(this, what the tracks hold)
+
+_RECORD = struct.Struct("<Id4f")
+_TYPES = ("d", "f", "f", "f", "f")
+
+
+def _columns():
+    return [array(t) for t in _TYPES]
+
+
+class _Track:
+    __slots__ = ("recent", "old")
+
+    def __init__(self):
+        self.recent = _columns()
+        self.old = _columns()
+
+    def __len__(self):
+        return len(self.recent[0]) + len(self.old[0])
+
+    def last(self):
+        if self.recent[0]:
+            return tuple(c[-1] for c in self.recent)
+        if self.old[0]:
+            return tuple(c[-1] for c in self.old)
+        return None
+
+    def append(self, sample, recent_points: int, old_points: int, bucket_s: float):
+        for col, v in zip(self.recent, sample):
+            col.append(v)
+        if len(self.recent[0]) > recent_points:
+            self._age(len(self.recent[0]) // 2, old_points, bucket_s)
+
+    def _age(self, n: int, old_points: int, bucket_s: float):
+        """Move the oldest n recent samples into the old tier, one per bucket_s."""
+        last_ts = self.old[0][-1] if self.old[0] else -math.inf
+        ts = self.recent[0]
+        for i in range(n):
+            if ts[i] - last_ts >= bucket_s:
+                for old, rec in zip(self.old, self.recent):
+                    old.append(rec[i])
+                last_ts = ts[i]
+        for col in self.recent:
+            del col[:n]
+        if len(self.old[0]) > old_points:
+            for j, col in enumerate(self.old):
+                self.old[j] = col[::2]
+
+    def samples(self):
+        for tier in (self.old, self.recent):
+            yield from zip(*tier)
+
+
+class TrackStore:
+    """
+    record() samples in memory (cheap enough for every poll), flush() appends
+    the batch to disk in one write. Thread-safe: the sync worker records,
+    the Tk thread reads. As in json_store, flush() takes the bytes to write
+    under the lock and does the file I/O after releasing it, so a read never
+    waits on an fsync or a compaction.
+    """
+
+    def __init__(self, path: Path = TRACKS_FILE, recent_points: int = TRACK_RECENT_POINTS,
+                 old_points: int = TRACK_OLD_POINTS, bucket_s: float = TRACK_DOWNSAMPLE_S):
+        self.path = Path(path)
+        self.recent_points = recent_points
+        self.old_points = old_points
+        self.bucket_s = bucket_s
+        self._tracks: dict[str, _Track] = {}
+        self._slots: dict[str, int] = {}
+        self._pending: list[bytes] = []
+        self._new_ids: list[str] = []
+        self._jobs: list[tuple] = []        # ("ids" | "log" | "compact", bytes), in the order taken
+        self._size: Optional[int] = None    # tracks.bin bytes, on disk + queued
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()    # one writer at a time
+        self._loaded = False
+
+    @property
+    def ids_path(self) -> Path:
+        return self.path.with_suffix(".ids")
+
+    # ---------- load / persist ----------
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                raw_ids = self.ids_path.read_bytes()
+                data = self.path.read_bytes()
+            except OSError:
+                return
+            # a crash mid-append can leave a partial id line or record: cut them off
+            # so the next append doesn't get glued onto them
+            ids_end = raw_ids.rfind(b"\n") + 1
+            whole = len(data) - len(data) % _RECORD.size
+            for path, end, size in ((self.ids_path, ids_end, len(raw_ids)), (self.path, whole, len(data))):
+                if end < size:
+                    try:
+                        with path.open("r+b") as fh:
+                            fh.truncate(end)
+                    except OSError:
+                        pass
+            ids = raw_ids[:ids_end].decode("utf-8", errors="replace").splitlines()
+            self._slots = {dev_id: i for i, dev_id in enumerate(ids)}
+            self._size = whole
+            for slot, *sample in _RECORD.iter_unpack(memoryview(data)[:whole]):
+                if slot < len(ids):
+                    self._track(ids[slot]).append(sample, self.recent_points, self.old_points, self.bucket_s)
+
+    def flush(self):
+        """Append samples recorded since the last flush; compact when the log has grown too big."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, new_ids = self._pending, self._new_ids
+            self._pending, self._new_ids = [], []
+            if new_ids:
+                self._jobs.append(("ids", "".join(i + "\n" for i in new_ids).encode("utf-8")))
+            if self._size is None:
+                try:
+                    self._size = self.path.stat().st_size
+                except OSError:
+                    self._size = 0
+            self._size += len(pending) * _RECORD.size
+            held = sum(len(t) for t in self._tracks.values()) * _RECORD.size
+            if self._size > 4 * max(held, COMPACT_MIN_BYTES):
+                # rendered from memory, which already holds `pending`; keeps every
+                # device's slot (its id is queued above if new), so a crash leaves
+                # either the old or the new log next to valid ids
+                body = b"".join(_RECORD.pack(self._slots[dev_id], *s)
+                                for dev_id, t in self._tracks.items() for s in t.samples())
+                self._jobs.append(("compact", body))
+                self._size = len(body)
+            else:
+                self._jobs.append(("log", b"".join(pending)))
+        self._write()
+
+    def _write(self):
+        """Write the queued jobs, in order (whichever flush() gets here first writes them all)."""
+        with self._io_lock:
+            with self._lock:
+                jobs, self._jobs = self._jobs, []
+            if jobs:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            for kind, data in jobs:
+                if kind == "compact":
+                    tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                    with tmp.open("wb") as fh:
+                        fh.write(data)
+                        fh.flush()
+                        os.fsync(fh.fileno())
+                    os.replace(tmp, self.path)
+                    continue
+                with (self.ids_path if kind == "ids" else self.path).open("ab") as fh:
+                    fh.write(data)
+                    fh.flush()
+                    os.fsync(fh.fileno())
+
+    # ---------- recording ----------
+
+    def _track(self, device_id: str) -> _Track:
+        t = self._tracks.get(device_id)
+        if t is None:
+            t = self._tracks[device_id] = _Track()
+        return t
+
+    def record(self, device_id: str, ts: float, lat: float, lon: float,
+               alt: float = math.nan, spd: float = math.nan) -> bool:
+        """Add one sample; skipped if it isn't newer, or the device hasn't moved within bucket_s."""
+        with self._lock:
+            t = self._track(device_id)
+            last = t.last()
+            if last is not None:
+                if ts <= last[0]:
+                    return False
+                # stored as float32, so compare at ~1 m rather than exactly
+                moved = abs(lat - last[1]) > 1e-5 or abs(lon - last[2]) > 1e-5
+                if not moved and ts - last[0] < self.bucket_s:
+                    return False
+            sample = (ts, lat, lon, alt, spd)
+            t.append(sample, self.recent_points, self.old_points, self.bucket_s)
+            slot = self._slots.get(device_id)
+            if slot is None:
+                slot = self._slots[device_id] = len(self._slots)
+                self._new_ids.append(device_id)
+            self._pending.append(_RECORD.pack(slot, *sample))
+            return True
+
+    def record_payloads(self, payloads, results) -> list[str]:
+        """Record the position of each API payload against its upsert result's device id."""
+        recorded = []
+        for p, res in zip(payloads, results):
+            dev_id = res.get("id")
+            # no_change = same timestamp and position as last time
+            if res.get("action") in ("error", "no_change") or not dev_id:
+                continue
+            pos = (p or {}).get("position") or {}
+            lat, lon = utils.to_float(pos.get("lat")), utils.to_float(pos.get("lon"))
+            when = utils.parse_iso_datetime(p.get("timestamp"))
+            if lat is None or lon is None or when is None:
+                continue
+            alt, spd = utils.to_float(pos.get("alt")), utils.to_float(pos.get("spd"))
+            if self.record(dev_id, when.timestamp(), lat, lon,
+                           math.nan if alt is None else alt, math.nan if spd is None else spd):
+                recorded.append(dev_id)
+        return recorded
+
+    def remove(self, device_id: str):
+        """Forget a device's track (dropped from disk at the next compaction)."""
+        with self._lock:
+            self._tracks.pop(device_id, None)
+
+    # ---------- reads ----------
+
+    def track(self, device_id: str, since: Optional[float] = None) -> list[tuple]:
+        """(ts, lat, lon, alt, spd) samples, oldest first."""
+        with self._lock:
+            t = self._tracks.get(device_id)
+            if t is None:
+                return []
+            return [s for s in t.samples() if since is None or s[0] >= since]
+
+    def path_points(self, device_id: str, max_points: int = 200) -> list[tuple]:
+        """The most recent (lat, lon) points, for drawing a polyline."""
+        with self._lock:
+            t = self._tracks.get(device_id)
+            if t is None:
+                return []
+            lat, lon = t.recent[1], t.recent[2]
+            pts = list(zip(lat[-max_points:], lon[-max_points:]))
+            if len(pts) < max_points and t.old[0]:
+                k = max_points - len(pts)
+                pts = list(zip(t.old[1][-k:], t.old[2][-k:])) + pts
+            return pts
+
+    def __len__(self):
+        return len(self._tracks)
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+# the app imports its modules top-level (import app_config, services.*), as when run from this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
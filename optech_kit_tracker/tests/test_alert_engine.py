@@ -0,0 +1,73 @@
+# tests/test_alert_engine.py
+from datetime import datetime, timezone
+
+from models.registry import DeviceRegistry
+from services.alert_engine import AlertEngine
+
+T0 = datetime(2025, 8, 21, 14, 0, tzinfo=timezone.utc).timestamp()
+FENCE = [(44.0, 23.0), (44.0, 24.0), (45.0, 24.0), (45.0, 23.0)]
+
+
+def _payload(serial="000001", **kw) -> dict:
+    p = {"type": "beacon", "model": "BE300A", "serial": serial, "op": "TOUCHDOWN",
+         "position": {"lat": 44.5, "lon": 23.5}, "timestamp": "2025-08-21T14:00:00.000Z",
+         "online": True, "tampered": False, "battery": 80, "payload": {"type": ""}}
+    p.update(kw)
+    return p
+
+
+def _engine(*rules, debounce_ms=30_000) -> AlertEngine:
+    return AlertEngine(rules=rules, debounce_ms=debounce_ms, fences=lambda: {"TOUCHDOWN": FENCE})
+
+
+def _engine_reg(*rules):
+    return DeviceRegistry(), _engine(*rules)
+
+
+def _poll(engine, registry, now, **kw) -> list[str]:
+    res = registry.upsert(_payload(**kw))
+    return [a["rule"] for a in engine.evaluate(registry, [res], now=now)]
+
+
+TAMPER = {"name": "tamper", "field": "tamper_status", "equals": "TAMPERED"}
+
+
+def test_flapping_inside_the_debounce_window_raises_once():
+    reg, eng = _engine_reg(TAMPER)
+    assert _poll(eng, reg, T0) == []                        # first sight is the baseline
+    assert _poll(eng, reg, T0 + 1, tampered=True) == ["tamper"]
+    for i in range(2, 12):
+        assert _poll(eng, reg, T0 + i, tampered=(i % 2 == 1)) == []
+    assert len(eng.history) == 1
+
+
+def test_sustained_retrip_is_raised_once_the_window_ends():
+    reg, eng = _engine_reg(TAMPER)
+    _poll(eng, reg, T0)
+    assert _poll(eng, reg, T0 + 1, tampered=True) == ["tamper"]
+    assert _poll(eng, reg, T0 + 2, tampered=False) == []
+    assert _poll(eng, reg, T0 + 3, tampered=True) == []     # debounced
+    # no further changes: the device just stays tampered
+    assert eng.evaluate(reg, [], now=T0 + 20) == []
+    assert [a["rule"] for a in eng.evaluate(reg, [], now=T0 + 31)] == ["tamper"]
+    assert eng.evaluate(reg, [], now=T0 + 100) == []        # raised once, not again while it holds
+
+
+def test_geofence_exit_and_reentry():
+    reg, eng = _engine_reg({"name": "geofence_exit", "geofence": True})
+    _poll(eng, reg, T0)
+    assert _poll(eng, reg, T0 + 1, position={"lat": 46.0, "lon": 23.5}) == ["geofence_exit"]
+    assert _poll(eng, reg, T0 + 2, position={"lat": 46.1, "lon": 23.5}) == []   # still outside
+    assert _poll(eng, reg, T0 + 3, position={"lat": 44.5, "lon": 23.6}) == []   # back inside
+    assert _poll(eng, reg, T0 + 40, position={"lat": 44.5, "lon": 25.0}) == ["geofence_exit"]
+
+
+def test_stale_device_is_raised_when_its_deadline_comes_due():
+    reg, eng = _engine_reg({"name": "stale", "field": "last_seen", "older_than_s": 60})
+    _poll(eng, reg, T0)
+    assert eng.evaluate(reg, [], now=T0 + 59) == []
+    assert [a["rule"] for a in eng.evaluate(reg, [], now=T0 + 61)] == ["stale"]
+    # a fresh report clears it and sets a new deadline
+    assert _poll(eng, reg, T0 + 70, timestamp="2025-08-21T14:01:10.000Z") == []
+    assert eng.evaluate(reg, [], now=T0 + 120) == []
+    assert [a["rule"] for a in eng.evaluate(reg, [], now=T0 + 131)] == ["stale"]
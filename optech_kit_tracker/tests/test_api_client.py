@@ -0,0 +1,74 @@
+# tests/test_api_client.py
+"""
+api_client against a local stand-in server (bench.standin_api):
+
+    cd optech_kit_tracker
+    py -m pytest tests
+"""
+import pytest
+
+import app_config
+from bench.standin_api import StandinAPI
+from models.registry import DeviceRegistry
+from services import api_client
+
+
+def _payload(serial: str, ts: str) -> dict:
+    """One device report as the tracker API sends it (see bench/fleet.py)."""
+    return {"type": "beacon", "model": "BE300A", "serial": serial, "op": "TOUCHDOWN",
+            "description": "beacon on Op TOUCHDOWN",
+            "position": {"lat": 44.5, "lon": 23.5, "alt": 0, "spd": 0.0},
+            "timestamp": ts, "mobile": True, "online": True, "tampered": False, "battery": 80,
+            "payload": {"type": ""}}
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "CONFIG_FILE", tmp_path / "config.json")
+    server = StandinAPI().start()
+    app_config.save_config({"api_url": server.url, "api_token": "test"})
+    api_client.reset_fetch_state()
+    yield server
+    server.stop()
+
+
+def test_unchanged_fleet_is_a_304_no_op(api):
+    api.set_payloads([_payload("A1", "2024-05-01T10:00:00Z"), _payload("A2", "2024-05-01T10:00:00Z")])
+    assert len(api_client.fetch_payloads(delta=False)) == 2
+
+    assert api_client.fetch_payloads(delta=False) == []
+    assert api.requests == 2
+    assert api_client.endpoint_status()[0]["error"] is None
+
+    api.set_payloads([_payload("A1", "2024-05-01T10:05:00Z")])
+    assert [p["serial"] for p in api_client.fetch_payloads(delta=False)] == ["A1"]
+
+
+def test_delta_fetch_drops_already_seen_records(api):
+    api.set_payloads([_payload("A1", "2024-05-01T10:00:00Z"), _payload("A2", "2024-05-01T10:01:00Z")])
+    assert len(api_client.fetch_payloads(delta=True)) == 2
+
+    # the stand-in ignores ?since=, so the client has to drop what it has seen
+    api.set_payloads([_payload("A1", "2024-05-01T10:00:00Z"), _payload("A2", "2024-05-01T10:01:00Z"),
+                      _payload("A3", "2024-05-01T10:02:00Z")])
+    got = api_client.fetch_payloads(delta=True)
+    assert "since=" in api.last_path
+    assert [p["serial"] for p in got] == ["A3"]
+    assert got[0]["source"] == "default"
+    assert DeviceRegistry().upsert(got[0])["action"] == "created"
+
+
+def test_dead_endpoint_backs_off(api):
+    app_config.save_config({"api_url": api.url, "api_token": "test",
+                            "endpoints": [{"name": "dead", "url": "http://127.0.0.1:1", "timeout_s": 1}]})
+    api.set_payloads([_payload("A1", "2024-05-01T10:00:00Z")])
+
+    assert [p["source"] for p in api_client.fetch_payloads(delta=False)] == ["default"]
+    status = {s["name"]: s for s in api_client.endpoint_status()}
+    assert status["default"]["error"] is None
+    assert status["dead"]["error"] and status["dead"]["failures"] == 1
+    assert status["dead"]["retry_in_s"] > 0
+
+    # backed off: the next poll doesn't try it again
+    api_client.fetch_payloads(delta=False)
+    assert {s["name"]: s for s in api_client.endpoint_status()}["dead"]["failures"] == 1
@@ -0,0 +1,82 @@
+# tests/test_capture_pool.py
+import itertools
+import threading
+import time
+
+import pytest
+
+from services.capture_pool import CapturePool
+
+_frames = itertools.count(1)
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in: numbered frames, or failing reads."""
+
+    def __init__(self, fail=False, release_gate=None):
+        self.fail = fail
+        self.release_gate = release_gate
+        self.reads = 0
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 0.0
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        self.reads += 1
+        if self.fail:
+            return False, None
+        time.sleep(0.005)
+        return True, {"n": next(_frames)}
+
+    def release(self):
+        if self.release_gate is not None:
+            self.release_gate.wait(5)
+
+
+def _pool(idle_timeout_s=60, **kw):
+    opened = []
+
+    def open_capture(url):
+        opened.append(FakeCapture(**kw))
+        return opened[-1]
+    return CapturePool(idle_timeout_s=idle_timeout_s, open_capture=open_capture), opened
+
+
+def test_frames_come_from_one_long_lived_capture():
+    pool, opened = _pool()
+    first = pool.snapshot("rtsp://cam/1", timeout_s=2)
+    time.sleep(0.05)
+    second = pool.snapshot("rtsp://cam/1", timeout_s=2)
+    assert second["n"] > first["n"] and len(opened) == 1
+    pool.close()
+
+
+def test_worker_that_went_idle_never_hands_out_its_last_frame():
+    gate = threading.Event()
+    pool, opened = _pool(idle_timeout_s=0.05, release_gate=gate)
+    stale = pool.snapshot("rtsp://cam/1", timeout_s=2)
+    time.sleep(0.2)
+    # the worker has left its loop but is still releasing the capture (thread alive)
+    [worker] = pool._workers.values()
+    assert worker.alive and worker.done
+    assert worker.latest(0.01) is None
+
+    gate.set()
+    fresh = pool.snapshot("rtsp://cam/1", timeout_s=2)
+    assert fresh is not stale and fresh["n"] > stale["n"]
+    assert len(opened) == 2
+    pool.close()
+
+
+def test_failed_reads_back_off_instead_of_spinning():
+    pool, opened = _pool(fail=True)
+    with pytest.raises(RuntimeError, match="Timed out"):
+        pool.snapshot("rtsp://cam/1", timeout_s=0.3)
+    assert 0 < opened[0].reads < 50
+    pool.close()
@@ -0,0 +1,112 @@
+# tests/test_device_index.py
+import random
+
+import pytest
+
+from models.device_index import DeviceIndex, FACET_FIELDS, TEXT_FIELDS
+
+POOLS = {
+    "kit_id": ["TOUCHDOWN", "touchdown", "Snake_Eater", "NIGHTJAR", None, ""],
+    "device_type": ["uav", "UAV", "beacon", "signal_collect", None],
+    "model": ["AVENGER", "BE300A", "snooper", None],
+    "connectivity": ["ONLINE", "OFFLINE", "UNKNOWN", None],
+    "tamper_status": ["OK", "TAMPERED", "unknown", None],
+}
+BATTERY = [None, "", "n/a", 0, 5, 14.5, 15, "15", 50, 99, 100]
+WORDS = ["Avenger", "beacon", "snooper", "alpha", "Ölkanne", "x"]
+
+
+def _device(rnd, i) -> dict:
+    d = {"id": f"dv_{i:04d}", "battery_pct": rnd.choice(BATTERY),
+         "serial_number": f"{rnd.randrange(10**6):06d}" if rnd.random() < 0.9 else None}
+    for f, pool in POOLS.items():
+        d[f] = rnd.choice(pool)
+    d["device_name"] = " ".join(rnd.sample(WORDS, 2)) + f" ({d['serial_number']})"
+    if rnd.random() < 0.3:
+        d["name"] = rnd.choice(WORDS)
+    return d
+
+
+def _norm(v) -> str:
+    return "" if v is None else str(v).strip().lower()
+
+
+def _num(v):
+    try:
+        return None if v is None or v == "" else float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _brute(devices: dict, text="", battery_min=None, battery_max=None, **facets) -> set:
+    out = set()
+    lo, hi = _num(battery_min), _num(battery_max)
+    q = _norm(text)
+    for dev_id, d in devices.items():
+        if any(v not in (None, "") and _norm(d.get(f)) != _norm(v) for f, v in facets.items()):
+            continue
+        if lo is not None or hi is not None:
+            b = _num(d.get("battery_pct"))
+            if b is None or (lo is not None and b < lo) or (hi is not None and b > hi):
+                continue
+        if q and not any(q in _norm(d.get(f)) for f in TEXT_FIELDS):
+            continue
+        out.add(dev_id)
+    return out
+
+
+def _random_query(rnd, devices) -> dict:
+    crit = {}
+    for f in rnd.sample(FACET_FIELDS, rnd.randrange(3)):
+        crit[f] = rnd.choice(POOLS[f])
+    if rnd.random() < 0.4:
+        crit["battery_min"] = rnd.choice([None, "", 0, 10, 15, "20"])
+    if rnd.random() < 0.4:
+        crit["battery_max"] = rnd.choice([None, 14.5, 15, 60, "100"])
+    if rnd.random() < 0.6:
+        if devices and rnd.random() < 0.7:
+            d = rnd.choice(list(devices.values()))
+            src = _norm(d.get(rnd.choice(TEXT_FIELDS)))
+            start = rnd.randrange(max(1, len(src)))
+            crit["text"] = src[start:start + rnd.randrange(1, 6)].upper()
+        else:
+            crit["text"] = rnd.choice(["", "av", "zzz", " alpha ", "ölk", "0"])
+    return crit
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_queries_match_a_brute_force_scan(seed):
+    rnd = random.Random(seed)
+    devices = {d["id"]: d for d in (_device(rnd, i) for i in range(300))}
+    index = DeviceIndex(devices.values())
+
+    for step in range(400):
+        # churn: refresh, re-add or remove a few devices, as DeviceRegistry does
+        r = rnd.random()
+        if r < 0.3:
+            d = rnd.choice(list(devices.values()))
+            d.update({k: v for k, v in _device(rnd, 0).items() if k != "id" and rnd.random() < 0.5})
+            index.update(d)
+        elif r < 0.4 and devices:
+            dev_id = rnd.choice(list(devices))
+            del devices[dev_id]
+            index.remove(dev_id)
+        elif r < 0.5:
+            d = _device(rnd, 1000 + step)
+            devices[d["id"]] = d
+            index.update(d)
+
+        crit = _random_query(rnd, devices)
+        expected = _brute(devices, **crit)
+        assert index.query(**crit) == expected, crit
+        sample = rnd.sample(list(devices), min(5, len(devices)))
+        assert {i for i in sample if index.matches(i, **crit)} == expected & set(sample)
+
+    assert len(index) == len(devices)
+    for f in FACET_FIELDS:
+        assert {_norm(v) for v in index.values(f)} == {_norm(d[f]) for d in devices.values()} - {""}
+
+
+def test_unknown_facet_is_an_error():
+    with pytest.raises(ValueError):
+        DeviceIndex().query(colour="red")
@@ -0,0 +1,122 @@
+# tests/test_geo_index.py
+import math
+import random
+
+import pytest
+
+from models.geo_index import GeoIndex, EARTH_RADIUS_KM
+
+
+def _km(lat1, lon1, lat2, lon2) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _inside(lat, lon, ring) -> bool:
+    """Scalar even-odd test, one edge at a time."""
+    inside = False
+    for (y1, x1), (y2, x2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (x2 - x1) * (lat - y1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _device(rnd, i) -> dict:
+    r = rnd.random()
+    if r < 0.05:
+        lat, lon = None, rnd.uniform(20, 26)          # no position
+    elif r < 0.08:
+        lat, lon = 123.0, 23.0                        # out of range
+    elif r < 0.12:
+        lat, lon = rnd.uniform(-10, 10), rnd.choice([-179.9, 179.9])   # near the antimeridian
+    else:
+        lat, lon = rnd.uniform(42, 46), rnd.uniform(21, 25)
+    return {"id": f"dv_{i:04d}", "lat": lat, "lon": None if lon is None else str(lon) if r > 0.9 else lon}
+
+
+def _positions(devices: dict) -> dict:
+    out = {}
+    for dev_id, d in devices.items():
+        lat, lon = d["lat"], d["lon"]
+        if lat is None or lon is None:
+            continue
+        lat, lon = float(lat), float(lon)
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            out[dev_id] = (lat, lon)
+    return out
+
+
+def _ring(rnd) -> list:
+    """A random star-shaped (often concave) ring around the fleet's area."""
+    clat, clon, n = rnd.uniform(43, 45), rnd.uniform(22, 24), rnd.randrange(3, 12)
+    angles = sorted(rnd.uniform(0, 2 * math.pi) for _ in range(n))
+    return [(clat + r * math.sin(a), clon + r * math.cos(a))
+            for a, r in ((a, rnd.uniform(0.3, 2.5)) for a in angles)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_queries_match_a_brute_force_scan(seed):
+    rnd = random.Random(seed)
+    devices = {d["id"]: d for d in (_device(rnd, i) for i in range(400))}
+    geo = GeoIndex(devices.values())
+
+    for step in range(100):
+        # churn: move, remove or add devices (removal moves the last row into the gap)
+        for _ in range(5):
+            r = rnd.random()
+            if r < 0.5:
+                d = rnd.choice(list(devices.values()))
+                d.update(lat=_device(rnd, 0)["lat"], lon=_device(rnd, 0)["lon"])
+                geo.update(d)
+            elif r < 0.75 and devices:
+                dev_id = rnd.choice(list(devices))
+                del devices[dev_id]
+                geo.remove(dev_id)
+            else:
+                d = _device(rnd, 1000 + step * 5 + _)
+                devices[d["id"]] = d
+                geo.update(d)
+        pos = _positions(devices)
+        assert len(geo) == len(pos)
+        among = set(rnd.sample(list(devices), len(devices) // 3)) if rnd.random() < 0.3 else None
+        scope = {i: p for i, p in pos.items() if among is None or i in among}
+
+        lat, lon, km = rnd.uniform(42, 46), rnd.uniform(21, 25), rnd.uniform(1, 300)
+        got = geo.within_radius(lat, lon, km, among=among)
+        near_edge = {i for i, p in scope.items() if abs(_km(lat, lon, *p) - km) < 1e-6}
+        assert got - near_edge == {i for i, p in scope.items() if _km(lat, lon, *p) <= km} - near_edge
+
+        lat_min, lon_min = rnd.uniform(41, 45), rnd.uniform(20, 24)
+        lat_max, lon_max = lat_min + rnd.uniform(0, 3), lon_min + rnd.uniform(0, 3)
+        assert geo.within_bbox(lat_min, lat_max, lon_min, lon_max, among=among) == {
+            i for i, (a, b) in scope.items() if lat_min <= a <= lat_max and lon_min <= b <= lon_max}
+        # a box across the antimeridian
+        assert geo.within_bbox(-10, 10, 179, -179, among=among) == {
+            i for i, (a, b) in scope.items() if -10 <= a <= 10 and (b >= 179 or b <= -179)}
+
+        ring = _ring(rnd)
+        inside = {i for i, p in scope.items() if _inside(*p, ring)}
+        assert geo.in_polygon(ring, among=among) == inside
+        assert geo.in_polygon(ring + ring[:1], among=among) == inside      # closed ring
+        assert geo.outside_polygon(ring, among=among) == set(scope) - inside
+        probe = rnd.choice(list(devices))
+        assert geo.contains(probe, ring) == (None if probe not in pos else _inside(*pos[probe], ring))
+
+        k = rnd.randrange(0, 12)
+        exclude = set(rnd.sample(list(scope), min(2, len(scope))))
+        got = geo.nearest(lat, lon, k, among=among, exclude=exclude)
+        want = sorted((_km(lat, lon, *p), i) for i, p in scope.items() if i not in exclude)[:k]
+        assert [i for i, _ in got] == [i for _, i in want]
+        assert [d for _, d in got] == pytest.approx([d for d, _ in want], abs=1e-6)
+
+
+def test_rectangle_polygon_agrees_with_bbox():
+    rnd = random.Random(7)
+    devices = [_device(rnd, i) for i in range(500)]
+    geo = GeoIndex(devices)
+    box = [(43.0, 22.0), (43.0, 24.0), (45.0, 24.0), (45.0, 22.0)]
+    # ray casting counts the lower/left edges as inside, the upper/right ones as outside
+    assert geo.in_polygon(box) == geo.within_bbox(43.0, 45.0, 22.0, 24.0) - {
+        i for i, (a, b) in _positions({d["id"]: d for d in devices}).items() if a == 45.0 or b == 24.0}
@@ -0,0 +1,103 @@
+# tests/test_image_assembler.py
+import base64
+import io
+import threading
+import zlib
+
+import pytest
+
+from models.registry import DeviceRegistry
+from services import image_assembler
+from services.image_assembler import ImageAssembler
+from services.image_cache import ImageCache
+from services.sync_worker import SyncWorker
+from storage import json_store
+
+
+def _fragments(data: bytes, n: int, image_id="IMG00001", checksum=None, start=1) -> list[dict]:
+    size = -(-len(data) // n)
+    crc = f"{zlib.crc32(data) & 0xFFFFFFFF:08x}" if checksum is None else checksum
+    return [{"type": "image_fragment", "id": image_id, "fragment": start + i, "total_fragments": n,
+             "format": "bmp", "checksum": crc, "data": base64.b64encode(data[i * size:(i + 1) * size]).decode()}
+            for i in range(n)]
+
+
+def test_out_of_order_fragments_are_written_in_order(tmp_path):
+    data = bytes(range(256)) * 40
+    asm = ImageAssembler(out_dir=tmp_path)
+    frags = _fragments(data, 7, start=0)
+    done = [asm.add_fragment("dev1", f) for f in [frags[i] for i in (3, 0, 6, 1, 5, 2, 4)]]
+    assert done[:-1] == [None] * 6
+    assert done[-1]["path"].read_bytes() == data
+    assert asm.buffered_bytes() == 0
+    assert asm.progress("dev1") == ("IMG00001", 7, 7)
+
+
+def test_crc_mismatch_writes_nothing(tmp_path):
+    asm = ImageAssembler(out_dir=tmp_path)
+    for f in _fragments(b"x" * 1000, 4, checksum="deadbeef"):
+        assert asm.add_fragment("dev1", f) is None
+    assert asm.stats["bad_checksum"] == 1
+    assert list(tmp_path.iterdir()) == []
+    assert asm.buffered_bytes() == 0
+
+
+def test_partials_expire_after_ttl_and_budget(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(image_assembler.time, "monotonic", lambda: clock[0])
+    asm = ImageAssembler(out_dir=tmp_path, max_bytes=10_000, ttl_s=60)
+    asm.add_fragment("dev1", _fragments(b"a" * 3000, 3, image_id="A")[0])
+    clock[0] += 61
+    asm.add_fragment("dev2", _fragments(b"b" * 3000, 3, image_id="B")[0])
+    assert asm.stats["evicted"] == 1 and asm.buffered_bytes() == 1000   # dev1's partial went stale
+
+    # over budget: the least recently fed partial goes first
+    big = _fragments(b"c" * 30_000, 3, image_id="C")
+    asm.add_fragment("dev3", big[0])
+    assert asm.stats["evicted"] == 2 and asm.buffered_bytes() == 10_000
+    assert asm.add_fragment("dev3", big[1]) is None
+    assert asm.buffered_bytes() == 20_000                                # the one being fed is kept
+
+
+def test_missing_image_lookups_are_cached_until_one_is_written(tmp_path, monkeypatch):
+    asm = ImageAssembler(out_dir=tmp_path)
+    globs = []
+    real_glob = type(tmp_path).glob
+    monkeypatch.setattr(type(tmp_path), "glob", lambda self, pat: globs.append(pat) or real_glob(self, pat))
+    for _ in range(5):
+        assert asm.latest("dev1") is None
+    assert len(globs) == 1
+
+    for f in _fragments(b"img" * 100, 2):
+        img = asm.add_fragment("dev1", f)
+    assert asm.latest("dev1") == img
+    # a new assembler (next run) finds it on disk
+    assert ImageAssembler(out_dir=tmp_path).latest("dev1")["image_id"] == "IMG00001"
+
+
+def test_worker_thumbnails_completed_images_on_its_own_thread(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(json_store, "DATA_FILE", tmp_path / "devices.json")
+    monkeypatch.setitem(json_store._SEQ, "last", None)
+    json_store.init_store()
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), "red").save(buf, "BMP")
+
+    cache = ImageCache(root=tmp_path / "cache")
+    threads = []
+    real_put = cache.put_file
+    monkeypatch.setattr(cache, "put_file", lambda *a: threads.append(threading.current_thread()) or real_put(*a))
+    payloads = [{"type": "uav", "model": "AVENGER", "serial": "000001", "op": "TOUCHDOWN",
+                 "timestamp": f"2025-08-21T14:00:0{i}.000Z", "payload": f}
+                for i, f in enumerate(_fragments(buf.getvalue(), 3))]
+    worker = SyncWorker(DeviceRegistry(), threading.RLock(), 1000, json_store.stage_upserts,
+                        fetch=lambda: payloads, images=ImageAssembler(out_dir=tmp_path / "images"),
+                        cache=cache, status=None)
+    t = threading.Thread(target=lambda: threads.append(worker.sync_once()))
+    t.start(); t.join()
+
+    msg = threads.pop()
+    assert threads == [t]
+    [img] = msg["images"]
+    assert img["cached"]["thumb_path"].exists()
+    assert cache.thumbnail(img["device_id"]).size[0] <= 240
@@ -0,0 +1,96 @@
+# tests/test_json_store.py
+import json
+
+import pytest
+
+from bench.fleet import make_fleet, advance
+from models.registry import DeviceRegistry
+from storage import json_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_store, "DATA_FILE", tmp_path / "devices.json")
+    monkeypatch.setitem(json_store._SEQ, "last", None)
+    json_store.init_store()
+    yield json_store
+    json_store._flush()
+
+
+def _fresh_process(store):
+    """Forget what this process knows about the files, as after a restart."""
+    store._SEQ["last"] = None
+    store.init_store()
+
+
+def _by_id(devices) -> dict:
+    return {d["id"]: json.loads(json.dumps(d, default=list)) for d in devices}
+
+
+def _journal_lines(store) -> list[dict]:
+    path = store._journal_file()
+    return [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines()] if path.exists() else []
+
+
+def test_resending_an_unchanged_payload_journals_nothing(store):
+    p = make_fleet(1)[0]
+    for _ in range(3):
+        store.upsert_devices_from_api([p])
+    assert [r["op"] for r in _journal_lines(store)] == ["put"]
+    assert len(store.load_data()[0]["event_log"]) == 1
+
+
+def test_journal_size_is_counted_in_bytes(store):
+    reg = DeviceRegistry(store.load_data())
+    store.upsert_devices_from_api([dict(make_fleet(1)[0], description="Øresund – ☂" * 50)], reg)
+    assert store._SIZES["journal"] == store._journal_file().stat().st_size
+
+
+def test_replay_across_snapshots_and_compaction(store, monkeypatch):
+    monkeypatch.setattr(store, "JOURNAL_MIN_COMPACT_BYTES", 20_000)
+    fleet = make_fleet(40)
+    reg = DeviceRegistry(store.load_data())
+    compacted = 0
+    for step in range(1, 30):
+        fleet = advance(fleet, step, change_ratio=0.5)
+        before = store._file_size(store._journal_file())
+        store.upsert_devices_from_api(fleet, reg)
+        compacted += store._file_size(store._journal_file()) < before
+        if step == 10:
+            store.save_data(reg.devices)
+    assert compacted, "the journal never outgrew the threshold"
+
+    _fresh_process(store)
+    assert _by_id(store.load_data()) == _by_id(reg.devices)
+    # sequence numbers keep going after a restart
+    last = max(r["seq"] for r in _journal_lines(store)) if _journal_lines(store) else 0
+    store.upsert_devices_from_api(advance(fleet, 99, change_ratio=1.0), reg)
+    assert min(r["seq"] for r in _journal_lines(store) if r["seq"] > last) == last + 1
+    _fresh_process(store)
+    assert _by_id(store.load_data()) == _by_id(reg.devices)
+
+
+def test_snapshot_newer_than_an_unemptied_journal_is_not_applied_twice(store):
+    fleet = make_fleet(10)
+    reg = DeviceRegistry(store.load_data())
+    store.upsert_devices_from_api(fleet, reg)
+    store.save_data(reg.devices)
+    # a journal of field updates ("put" records would replay harmlessly)
+    for step in range(1, 6):
+        fleet = advance(fleet, step, change_ratio=1.0)
+        store.upsert_devices_from_api(fleet, reg)
+    journal = store._journal_file().read_bytes()
+    assert {r["op"] for r in _journal_lines(store)} == {"set"}
+
+    # crash after the snapshot was replaced but before the journal was emptied
+    store.save_data(reg.devices)
+    store._journal_file().write_bytes(journal)
+
+    _fresh_process(store)
+    assert _by_id(store.load_data()) == _by_id(reg.devices)
+
+    # and new records appended after it are still replayed
+    fleet = advance(fleet, 6, change_ratio=1.0)
+    store.upsert_devices_from_api(fleet, reg)
+    _fresh_process(store)
+    assert _by_id(store.load_data()) == _by_id(reg.devices)
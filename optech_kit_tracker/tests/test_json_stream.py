@@ -0,0 +1,79 @@
+# tests/test_json_stream.py
+import itertools
+import json
+
+import pytest
+
+from services import json_stream
+from services.json_stream import JSONStream
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class _Counted:
+    """Chunk source that records how many chunks were pulled."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.pulled = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self._chunks)
+        self.pulled += 1
+        return chunk
+
+
+def test_values_survive_any_chunk_boundary():
+    docs = [{"serial": "A1", "position": {"lat": 44.5, "lon": 23.25}, "battery": 12.5e-1},
+            {"serial": "Bé", "payload": [1, -2.0, None, True, "x\ny"]}]
+    pretty = json.dumps(docs, indent=2)
+    lines = "\n".join(json.dumps(d) for d in docs) + "\n"
+    for text in (pretty, lines):
+        for size in (1, 2, 3, 7, 64):
+            assert list(JSONStream(_chunks(text, size)).values()) == docs
+
+
+def test_results_skips_to_the_key():
+    text = json.dumps({"count": 2, "results": [{"serial": "A"}, {"serial": "B"}], "next": None}, indent=1)
+    assert list(JSONStream(_chunks(text, 5)).results()) == [{"serial": "A"}, {"serial": "B"}]
+
+
+def test_malformed_line_raises_without_reading_the_rest(monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 16)
+    good = json.dumps({"serial": "A"}) + "\n"
+    src = _Counted(itertools.chain([good, '{"serial": B}\n'], itertools.repeat(good)))
+    values = JSONStream(src).values()
+    assert next(values) == {"serial": "A"}
+    with pytest.raises(ValueError):
+        next(values)
+    assert src.pulled < 10
+
+
+def test_malformed_pretty_array_raises_at_the_bad_line(monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 16)
+    text = '[\n  {"serial": "A"},\n  {"serial": "B" "x"},\n' + '  {"serial": "C"},\n' * 1000 + "]"
+    src = _Counted(_chunks(text, 16))
+    values = JSONStream(src).values()
+    assert next(values) == {"serial": "A"}
+    with pytest.raises(ValueError):
+        next(values)
+    assert src.pulled < 10
+
+
+def test_unbounded_value_raises(monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 1024)
+    monkeypatch.setattr(json_stream, "MAX_VALUE_CHARS", 4096)
+    src = _Counted(itertools.chain(['{"serial": "'], itertools.repeat("x" * 1024)))
+    with pytest.raises(ValueError, match="exceeds"):
+        list(JSONStream(src).values())
+    assert src.pulled < 20
+
+
+def test_truncated_input_still_raises_at_eof():
+    with pytest.raises(ValueError):
+        list(JSONStream(_chunks('[{"serial": "A"}, {"ser', 4)).values())
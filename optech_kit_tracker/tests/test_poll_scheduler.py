@@ -0,0 +1,68 @@
+# tests/test_poll_scheduler.py
+import threading
+
+from services import poll_scheduler
+from services.poll_scheduler import PollScheduler
+from services.sync_worker import SyncWorker
+
+
+def _sched(**kw) -> PollScheduler:
+    kw.setdefault("jitter", 0)
+    return PollScheduler(base_ms=1000, fast_ms=500, idle_max_ms=5000, error_max_ms=16_000, alert_hold_s=60, **kw)
+
+
+def test_failures_back_off_to_the_cap():
+    s = _sched()
+    delays = [s.next_delay_ms(True, False) for _ in range(6)]
+    assert delays == [2000, 4000, 8000, 16_000, 16_000, 16_000]
+    for _ in range(5000):
+        s.next_delay_ms(True, False)
+    assert s.failures == 4 and s.interval_ms == 16_000
+    assert s.next_delay_ms(False, False) == 1500        # one good poll resets the backoff
+    assert s.failures == 0
+
+
+def test_changes_poll_fast_then_decay_to_idle():
+    s = _sched()
+    assert s.next_delay_ms(False, True) == 500
+    quiet = [s.next_delay_ms(False, False) for _ in range(6)]
+    assert quiet == [1500, 2250, 3375, 5000, 5000, 5000]
+    for _ in range(5000):
+        s.next_delay_ms(False, False)
+    assert s.interval_ms == 5000
+    assert s.next_delay_ms(False, True) == 500
+
+
+def test_alerts_hold_the_fast_cadence(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(poll_scheduler.time, "monotonic", lambda: clock[0])
+    s = _sched()
+    s.alerts_raised()
+    clock[0] += 59
+    assert s.next_delay_ms(False, False) == 500
+    clock[0] += 2
+    assert s.next_delay_ms(False, False) == 1500
+
+
+def test_jitter_stays_within_bounds():
+    s = _sched(jitter=0.2)
+    delays = [s.next_delay_ms(False, True) for _ in range(2000)]
+    assert min(delays) >= 400 and max(delays) <= 600
+    assert len(set(delays)) > 50
+
+
+def test_worker_backs_off_when_a_poll_keeps_raising():
+    worker = SyncWorker(None, threading.RLock(), 1, stage=None, status=None)
+    worker.scheduler = PollScheduler(base_ms=1, fast_ms=1, error_max_ms=16, jitter=0)
+
+    def boom(manual=False):
+        raise RuntimeError("bad change-set")
+    worker.sync_once = boom
+    worker.start()
+    try:
+        msgs = [worker.results.get(timeout=5) for _ in range(6)]
+    finally:
+        worker.stop()
+    assert all(m["poll"]["failed"] and "bad change-set" in m["error"] for m in msgs)
+    assert [m["poll"]["next_ms"] for m in msgs] == [2, 4, 8, 16, 16, 16]
+    assert [m["poll"]["failures"] for m in msgs] == [1, 2, 3, 4, 4, 4]
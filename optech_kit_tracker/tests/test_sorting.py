@@ -0,0 +1,57 @@
+# tests/test_sorting.py
+import pytest
+
+import app_config
+from bench import tk_stubs
+from gui.virtual_table import VirtualTreeview
+from storage import json_store
+from storage.track_store import TrackStore
+
+
+@pytest.fixture
+def handlers(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "CONFIG_FILE", tmp_path / "config.json")
+    monkeypatch.setattr(json_store, "DATA_FILE", tmp_path / "devices.json")
+    monkeypatch.setitem(json_store._SEQ, "last", None)
+    from gui import handlers
+    monkeypatch.setattr(handlers, "tracks", TrackStore(tmp_path / "tracks.bin"))
+    monkeypatch.setattr(handlers, "_sort_column", None)
+    json_store.init_store()
+    json_store.upsert_devices_from_api([_payload("A", 50, "2025-08-21T14:00:00Z"),
+                                        _payload("B", None, "2025-08-21T15:00:00Z"),
+                                        _payload("C", 10, None),
+                                        _payload("D", 90, "2025-08-21T13:00:00Z"),
+                                        _payload("E", None, None)])
+    handlers.init_handlers(tk_stubs.RootStub(), VirtualTreeview(tk_stubs.TreeviewStub()), tk_stubs.WidgetStub(),
+                           tk_stubs.WidgetStub(), tk_stubs.WidgetStub(), tk_stubs.WidgetStub(),
+                           tk_stubs.VarStub(), tk_stubs.VarStub(), _map_widget=tk_stubs.MapWidgetStub())
+    return handlers
+
+
+def _payload(serial, battery, ts) -> dict:
+    p = {"type": "beacon", "model": "BE300A", "serial": serial, "op": "TOUCHDOWN",
+         "position": {"lat": 44.5, "lon": 23.5}, "online": True, "tampered": False, "payload": {"type": ""}}
+    if battery is not None:
+        p["battery"] = battery
+    if ts is not None:
+        p["timestamp"] = ts
+    return p
+
+
+def _serials(handlers) -> list[str]:
+    return [handlers.registry.get(i)["serial_number"] for i in handlers.tatree.get_children()]
+
+
+@pytest.mark.parametrize("column, ascending, blanks", [
+    ("battery", ["C", "A", "D"], {"B", "E"}),
+    ("last_seen", ["D", "A", "B"], {"C", "E"}),
+])
+def test_blank_values_sort_last_in_both_directions(handlers, column, ascending, blanks):
+    handlers.sort_by_column(column)
+    order = _serials(handlers)
+    assert order[:3] == ascending and set(order[3:]) == blanks
+
+    handlers.sort_by_column(column)          # second click: descending
+    order = _serials(handlers)
+    assert order[:3] == ascending[::-1] and set(order[3:]) == blanks
+    assert handlers.tatree.heading(column, "text").endswith("▼")
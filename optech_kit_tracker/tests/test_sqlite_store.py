@@ -0,0 +1,81 @@
+# tests/test_sqlite_store.py
+import json
+import sqlite3
+
+import pytest
+
+from app_config import EVENT_HISTORY_DEPTH
+from bench.fleet import make_fleet, advance
+from models.registry import DeviceRegistry
+from storage import json_store, sqlite_store
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_store, "DATA_FILE", tmp_path / "devices.json")
+    monkeypatch.setitem(json_store._SEQ, "last", None)
+    monkeypatch.setattr(sqlite_store, "DB_FILE", tmp_path / "devices.db")
+    json_store.init_store()
+    yield json_store, sqlite_store
+    sqlite_store._flush()
+
+
+def _reopen():
+    """Drop this thread's connection, as after a restart."""
+    sqlite_store._local.conn.close()
+    sqlite_store._local.conn = None
+
+
+def _rows(table: str) -> int:
+    with sqlite3.connect(str(sqlite_store.DB_FILE)) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _by_id(devices) -> dict:
+    return {d["id"]: json.loads(json.dumps(d, default=list)) for d in devices}
+
+
+def test_json_store_is_migrated_once(stores):
+    js, sq = stores
+    js.upsert_devices_from_api(make_fleet(20))
+    sq.init_store()
+    assert _by_id(sq.load_data()) == _by_id(js.load_data())
+
+    # later changes to the JSON store aren't pulled across again
+    js.upsert_devices_from_api(make_fleet(25)[20:])
+    _reopen()
+    sq.init_store()
+    assert sq.migrate_from_json() == 0
+    assert len(sq.load_data()) == 20
+
+    assert sq.migrate_from_json(force=True) == 25
+    assert _by_id(sq.load_data()) == _by_id(js.load_data())
+
+
+def test_emptied_db_stays_empty_after_restart(stores):
+    js, sq = stores
+    js.upsert_devices_from_api(make_fleet(5))
+    sq.init_store()
+    devices = sq.load_data()
+    sq.save_changes([], deleted_ids=[d["id"] for d in devices])
+    assert sq.load_data() == []
+
+    _reopen()
+    sq.init_store()
+    assert sq.load_data() == [] and _rows("events") == 0
+
+
+def test_events_are_trimmed_and_unchanged_devices_write_nothing(stores):
+    js, sq = stores
+    sq.init_store()
+    fleet = make_fleet(3)
+    reg = DeviceRegistry(sq.load_data())
+    for step in range(1, EVENT_HISTORY_DEPTH + 10):
+        fleet = advance(fleet, step, change_ratio=1.0)
+        sq.upsert_devices_from_api(fleet, reg)
+    assert _rows("events") == 3 * EVENT_HISTORY_DEPTH
+
+    sq.upsert_devices_from_api(fleet, reg)   # same payloads again: no_change
+    assert _rows("events") == 3 * EVENT_HISTORY_DEPTH
+    _reopen()
+    assert _by_id(sq.load_data()) == _by_id(reg.devices)
@@ -0,0 +1,83 @@
+# tests/test_track_store.py
+import pytest
+
+from storage import track_store
+from storage.track_store import TrackStore
+
+
+def _store(path, **kw) -> TrackStore:
+    s = TrackStore(path, recent_points=16, old_points=16, bucket_s=0, **kw)
+    s.load()
+    return s
+
+
+def _walk(store, dev_id, n, t0=0.0):
+    for i in range(n):
+        assert store.record(dev_id, t0 + i, 44.0 + i * 0.001, 23.0, 100.0, 5.0)
+
+
+def test_reload_cuts_off_a_torn_tail(tmp_path):
+    path = tmp_path / "tracks.bin"
+    s = _store(path)
+    _walk(s, "dev1", 5)
+    s.flush()
+    before = s.track("dev1")
+    with path.open("ab") as fh:
+        fh.write(b"\x01\x02\x03")         # crash mid-record
+    with s.ids_path.open("ab") as fh:
+        fh.write(b"dev-parti")            # crash mid-id
+
+    s = _store(path)
+    assert s.track("dev1") == before
+    _walk(s, "dev1", 3, t0=10)
+    _walk(s, "dev2", 2, t0=10)
+    s.flush()
+
+    s = _store(path)
+    assert len(s.track("dev1")) == 8
+    assert s.ids_path.read_text(encoding="utf-8").splitlines() == ["dev1", "dev2"]
+    assert s.path_points("dev2") == [(pytest.approx(44.0), 23.0), (pytest.approx(44.001), 23.0)]
+
+
+def test_removed_device_keeps_its_slot_and_is_dropped_at_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(track_store, "COMPACT_MIN_BYTES", 500)
+    path = tmp_path / "tracks.bin"
+    s = _store(path)
+    _walk(s, "dev1", 5)
+    _walk(s, "dev2", 5)
+    s.flush()
+    s.remove("dev1")
+    _walk(s, "dev1", 2, t0=100)          # back again: same slot, tracks.ids doesn't grow
+    assert s.ids_path.read_text(encoding="utf-8").splitlines() == ["dev1", "dev2"]
+
+    # keep walking dev2 until the log is compacted
+    size = path.stat().st_size
+    for k in range(1, 20):
+        _walk(s, "dev2", 10, t0=100 * k)
+        s.flush()
+        if path.stat().st_size < size:
+            break
+        size = path.stat().st_size
+    else:
+        pytest.fail("never compacted")
+
+    reloaded = _store(path)
+    assert reloaded.track("dev1") == s.track("dev1")
+    assert [t for t, *_ in reloaded.track("dev1")] == [100.0, 101.0]
+    assert reloaded.track("dev2") == s.track("dev2")
+    assert not path.with_suffix(".bin.tmp").exists()
+
+
+def test_disk_io_happens_outside_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(track_store, "COMPACT_MIN_BYTES", 200)
+    s = _store(tmp_path / "tracks.bin")
+    held = []
+    real_fsync = track_store.os.fsync
+    monkeypatch.setattr(track_store.os, "fsync", lambda fd: held.append(s._lock.locked()) or real_fsync(fd))
+    sizes = []
+    for k in range(30):
+        _walk(s, f"dev{k % 3}", 10, t0=100 * k)
+        s.flush()
+        sizes.append(s.path.stat().st_size)
+    assert any(b < a for a, b in zip(sizes, sizes[1:])), "never compacted"
+    assert held and not any(held)
@@ -0,0 +1,66 @@
+# tests/test_virtual_table.py
+from bench.tk_stubs import TreeviewStub
+from gui.virtual_table import VirtualTreeview
+
+CTRL = 0x0004
+
+
+def _table(n=2000):
+    tree = TreeviewStub()
+    vt = VirtualTreeview(tree)
+    for i in range(n):
+        vt.insert("", "end", iid=f"r{i}", values=(i,))
+    tree.update_idletasks()
+    return tree, vt
+
+
+def _click(tree, iid, state=0):
+    """What Tk does for a click in an "extended" tree: Ctrl toggles, a plain click replaces."""
+    tree.event_generate("<ButtonPress-1>", state=state)
+    sel = tree.selection()
+    if state & CTRL:
+        tree.selection_set(*[i for i in sel if i != iid], *(() if iid in sel else (iid,)))
+    else:
+        tree.selection_set(iid)
+    tree.event_generate("<<TreeviewSelect>>")
+
+
+def test_selection_survives_scrolling_across_unmaterialised_rows():
+    tree, vt = _table()
+    assert len(tree.get_children()) < 200                 # only a window of rows is in the tree
+    vt.selection_set("r0", "r1", "r1999")                 # r1999 isn't materialised
+    assert vt.selection() == ("r0", "r1", "r1999")
+    assert set(tree.selection()) == {"r0", "r1"}
+
+    vt.yview("moveto", 1.0)
+    assert "r1999" in tree.get_children() and "r0" not in tree.get_children()
+    assert tree.selection() == ("r1999",)
+    tree.event_generate("<<TreeviewSelect>>")             # fired as r0/r1 left the tree
+    assert vt.selection() == ("r0", "r1", "r1999")
+
+    _click(tree, "r1990", state=CTRL)                     # extend: off-screen rows stay selected
+    assert vt.selection() == ("r0", "r1", "r1999", "r1990")
+    _click(tree, "r1999", state=CTRL)                     # Ctrl-click toggles one off
+    assert vt.selection() == ("r0", "r1", "r1990")
+
+    vt.yview("moveto", 0.0)
+    assert set(tree.selection()) == {"r0", "r1"}
+    assert vt.selection() == ("r0", "r1", "r1990")
+
+    _click(tree, "r5")                                    # plain click replaces everything
+    assert vt.selection() == ("r5",)
+
+
+def test_deleted_and_filtered_rows_leave_the_selection():
+    tree, vt = _table()
+    notified = []
+    vt.bind("<<TreeviewSelect>>", lambda e: notified.append(vt.selection()))
+    vt.selection_set("r2", "r3", "r1500")
+    vt.delete("r3")
+    assert vt.selection() == ("r2", "r1500")
+
+    vt.set_filter({"r1500", "r1501"})
+    assert vt.selection() == ("r1500",)
+    assert tree.selection() == ("r1500",)
+    tree.update_idletasks()
+    assert notified and notified[-1] == ("r1500",)
@@ -1,5 +1,6 @@
 from typing import List
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+import re
 import uuid
 
 def today_iso_date() -> str:
@@ -24,3 +25,21 @@ def to_float(val, default=None):
         return float(val)
     except (TypeError, ValueError):
         return default
+
+def parse_iso_datetime(val, default=None):
+    """Parse an API timestamp like '2025-08-21T14:37:03.866Z' into an aware datetime."""
+    if not val or not isinstance(val, str):
+        return default
+    try:
+        dt = datetime.fromisoformat(val.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return default
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+def safe_filename(name, max_len: int = 64) -> str:
+    """Make an id/label usable as (part of) a file name."""
+    return _UNSAFE_FILENAME.sub("_", str(name))[:max_len] or "_"